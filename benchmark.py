@@ -0,0 +1,561 @@
+# Import block
+import argparse
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from robol_lang import *
+from robol_lang.interfaces import Robol
+
+
+def generate(blocks: int) -> str:
+    """ Writes a program with a let and a loop of five statements for
+    every block.
+    """
+
+    lines = ["size(1000*1000)", "let i = 0", "start(0, 0)"]
+
+    for n in range(blocks):
+        lines += [
+            f"let a{n} = {n}",
+            "do {",
+            "    step + 1 * 2 i",
+            "    turn clockwise",
+            "    step - 3 1",
+            "    turn counterclockwise",
+            "    i++",
+            "} while < i 0",
+        ]
+
+    lines.append("stop")
+
+    return "\n".join(lines)
+
+
+# Each generator below writes a program of a given size, and finds how many
+# statements it runs, which is what the ops per second of execute count.
+# Every program keeps the robot close to where it starts, so it never
+# oversteps the grid however large it is.
+
+
+def straight(n: int) -> Tuple[str, int]:
+    """ Writes a program of n steps and turns without any loops."""
+
+    lines = ["size(1000*1000)", "start(10, 10)"]
+    body = ["step 1", "turn clockwise"]
+
+    for i in range(n):
+        lines.append(body[i % 2])
+
+    lines.append("stop")
+
+    return "\n".join(lines), n + 2
+
+
+def nested(depth: int) -> Tuple[str, int]:
+    """ Writes a program of depth loops inside each other, that each run
+    once.
+    """
+
+    lines = ["size(1000*1000)", "let i = 0", "start(10, 10)"]
+    lines += ["do {", "    step 1"] * depth
+    lines += ["    turn clockwise", "} while < i 0"] * depth
+    lines.append("stop")
+
+    return "\n".join(lines), 2 * depth + 3
+
+
+def counter(n: int) -> Tuple[str, int]:
+    """ Writes a program with a loop that runs n times."""
+
+    lines = [
+        "size(1000*1000)",
+        "let i = 0",
+        "start(10, 10)",
+        "do {",
+        "    step 1",
+        "    turn clockwise",
+        "    turn clockwise",
+        "    step 1",
+        "    turn counterclockwise",
+        "    turn counterclockwise",
+        "    i++",
+        f"}} while < i {n}",
+        "stop",
+    ]
+
+    return "\n".join(lines), 7 * n + 3
+
+
+def _tree(width: int, depth: int = 0) -> str:
+    """ Writes an expression with width leaves, all of which are i."""
+
+    if width == 1:
+        return "i"
+
+    op = "+-*"[depth % 3]
+    half = width // 2
+
+    return f"{op} {_tree(half, depth + 1)} {_tree(width - half, depth + 1)}"
+
+
+def wide(width: int) -> Tuple[str, int]:
+    """ Writes a program that steps by an expression with width leaves a
+    thousand times.
+
+    i is 0 whenever the expression is evaluated, so the robot never moves.
+    """
+
+    lines = [
+        "size(1000*1000)",
+        "let i = 0",
+        "let j = 0",
+        "start(10, 10)",
+        "do {",
+        f"    step {_tree(width)}",
+        "    j++",
+        "} while < j 1000",
+        "stop",
+    ]
+
+    return "\n".join(lines), 2 * 1000 + 4
+
+
+# Phases that took less than this many seconds in the baseline are too
+# short to compare.
+NOISE = 0.005
+
+# The generators, and the size each one is run at by default.
+GENERATORS: Dict[str, Tuple[Callable[[int], Tuple[str, int]], int]] = {
+    "straight": (straight, 10000),
+    "nested": (nested, 200),
+    "counter": (counter, 100000),
+    "wide": (wide, 1000),
+}
+
+
+def count_nodes(node: Robol, kinds: Dict[str, int] = None) -> int:
+    """ Counts a node and every node in it, and each kind of node in kinds
+    if it is given.
+    """
+
+    count = 1
+
+    if kinds is not None:
+        name = type(node).__name__
+        kinds[name] = kinds.get(name, 0) + 1
+
+    for name in type(node).__slots__:
+        value = getattr(node, name, None)
+        for child in value if isinstance(value, list) else [value]:
+            if isinstance(child, Robol):
+                count += count_nodes(child, kinds)
+
+    return count
+
+
+def program_nodes(program: Program, kinds: Dict[str, int] = None) -> int:
+    """ Counts the nodes of a program, and each kind of node in kinds if it
+    is given.
+    """
+
+    return count_nodes(program.grid, kinds) + sum(
+        count_nodes(interpretable, kinds)
+        for interpretable in program.robot.interpretables
+    )
+
+
+def _execute(program: Program, engine: Engine) -> None:
+    """ Runs a parsed program from the start with an engine."""
+
+    program.engine = engine
+    program.robot.orientation = Orientation.EAST
+    program.interpret()
+
+
+def _time(run: Callable[[], object], repeat: int) -> Tuple[List, object]:
+    """ Times a function a number of times, after running it once first
+    so that caches are warm and nothing is done for the first time. The
+    garbage collector is off while a run is timed, like timeit does, so
+    that a collection does not land in one run but not another.
+
+    Returns:
+        The time of each run, and what the function returned the last time.
+    """
+
+    run()
+    times = []
+
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            out = run()
+            times.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    return times, out
+
+
+def _peak(run: Callable[[], object]) -> Tuple[int, object]:
+    """ Finds how much memory a function allocates at most while it runs.
+
+    Returns:
+        The peak in bytes, and what the function returned.
+    """
+
+    tracemalloc.start()
+    try:
+        out = run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak, out
+
+
+def bench(name: str, size: int, engine: Engine, repeat: int) -> Dict:
+    """ Benchmarks a generated program.
+
+    Tokenizing, parsing and executing are timed on their own, repeat
+    times after a warm-up run, and both the median and the fastest of the
+    runs are kept. Executing includes whatever the engine does before it
+    runs the program, such as compiling it. The peak memory of each phase
+    is measured in a separate run, as tracing the memory slows everything
+    down.
+
+    Args:
+        name (str): The name of the generator.
+
+        size (int): The size of the program.
+
+        engine (Engine): The engine to execute the program with.
+
+        repeat (int): How many times to time each phase.
+
+    Returns:
+        A dictionary with the median and fastest seconds, ops per second
+        and peak bytes of each phase. The ops of tokenize are tokens, of
+        parse nodes, and of execute statements.
+    """
+
+    generator, _ = GENERATORS[name]
+    source, statements = generator(size)
+
+    tokenize_times, tokens = _time(lambda: list(tokenize(source)), repeat)
+    parse_times, program = _time(lambda: parse(tokens), repeat)
+    execute_times, _ = _time(lambda: _execute(program, engine), repeat)
+
+    tokenize_peak, _ = _peak(lambda: list(tokenize(source)))
+    parse_peak, _ = _peak(lambda: parse(tokens))
+    execute_peak, _ = _peak(lambda: _execute(program, engine))
+
+    ops = {
+        "tokenize": len(tokens),
+        "parse": program_nodes(program),
+        "execute": statements,
+    }
+    times = {
+        "tokenize": tokenize_times,
+        "parse": parse_times,
+        "execute": execute_times,
+    }
+    peaks = {
+        "tokenize": tokenize_peak,
+        "parse": parse_peak,
+        "execute": execute_peak,
+    }
+
+    results = {}
+
+    for phase in times:
+        seconds = statistics.median(times[phase])
+        results[phase] = {
+            "seconds": seconds,
+            "best_seconds": min(times[phase]),
+            "ops": ops[phase],
+            "ops_per_second": ops[phase] / seconds,
+            "peak_bytes": peaks[phase],
+        }
+
+    return results
+
+
+def _slower(phases: Dict, baseline: Dict, tolerance: float) -> List:
+    """ Finds the phases of a benchmark that are slower than the baseline.
+
+    Returns:
+        The name of each such phase, with how many times slower it is.
+    """
+
+    found = []
+
+    for phase, result in phases.items():
+        before = baseline[phase]["seconds"]
+        if before < NOISE:
+            continue
+
+        ratio = result["best_seconds"] / before
+
+        if ratio > 1 + tolerance:
+            found.append((phase, ratio))
+
+    return found
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float,
+            again: Callable[[str], Dict] = None) -> int:
+    """ Prints how the results compare to a baseline.
+
+    A phase only counts as a regression when even its fastest run is
+    slower than the median of the baseline, as a machine that is busy with
+    something else can only make a run slower, not faster. A machine can be
+    busy for seconds at a time, though, so a benchmark with a phase that
+    seems to have regressed is run again, and the faster of the two runs
+    of each phase is kept.
+
+    Args:
+        results (Dict): The results, by benchmark and phase.
+
+        baseline (Dict): The results of an earlier run.
+
+        tolerance (float): How much slower a phase may be than the
+        baseline, as a fraction, before it counts as a regression. Phases
+        that are shorter than NOISE are not compared.
+
+        again (Callable): Runs a benchmark again by its key, or None to
+        not run anything again.
+
+    Returns:
+        How many phases regressed.
+    """
+
+    regressions = 0
+
+    for key, phases in results.items():
+        if key not in baseline:
+            continue
+
+        if again is not None and _slower(phases, baseline[key], tolerance):
+            for phase, result in again(key).items():
+                if result["best_seconds"] < phases[phase]["best_seconds"]:
+                    phases[phase] = result
+
+        for phase, ratio in _slower(phases, baseline[key], tolerance):
+            regressions += 1
+            print(f"REGRESSION {key} {phase}: "
+                  f"{baseline[key][phase]['seconds']:.4f}s -> "
+                  f"{phases[phase]['best_seconds']:.4f}s ({ratio:.2f}x)")
+
+    return regressions
+
+
+def run(args: argparse.Namespace) -> int:
+    """ Runs the generated benchmarks, and saves or compares a baseline."""
+
+    results = {}
+
+    print(f"{'benchmark':<20}{'phase':<10}{'seconds':>10}{'ops/s':>14}"
+          f"{'peak MiB':>10}")
+
+    for name in args.generators:
+        size = max(1, int(GENERATORS[name][1] * args.scale))
+
+        for engine in args.engines:
+            key = f"{name}/{engine}"
+
+            try:
+                results[key] = bench(
+                    name, size, Engine[engine.upper()], args.repeat
+                )
+            except Exception as e:
+                # Such as a program that is nested too deeply for the
+                # python engine.
+                print(f"{key:<20}{e}")
+                continue
+
+            for phase, result in results[key].items():
+                print(f"{key:<20}{phase:<10}{result['seconds']:>10.4f}"
+                      f"{result['ops_per_second']:>14,.0f}"
+                      f"{result['peak_bytes'] / 2**20:>10.2f}")
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "scale": args.scale,
+                "results": results,
+            }, f, indent=4)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+        if baseline["scale"] != args.scale:
+            print("The baseline was run at another scale", file=sys.stderr)
+            return 1
+
+        def again(key: str) -> Dict:
+            name, engine = key.split("/")
+            size = max(1, int(GENERATORS[name][1] * args.scale))
+            return bench(name, size, Engine[engine.upper()], args.repeat)
+
+        if compare(results, baseline["results"], args.tolerance, again):
+            return 1
+
+    return 0
+
+
+def samples() -> Dict[str, Tuple[type, tuple]]:
+    """ Finds the class of each kind of node, and what to make one with."""
+
+    return {
+        "NumberExp": (NumberExp, (1,)),
+        "Identifier": (Identifier, ("i",)),
+        "ArithmeticExp": (ArithmeticExp, (BinaryOp.PLUS, None, None)),
+        "BoolExp": (BoolExp, (None,)),
+        "Assignment": (Assignment, (None, Assign.INC)),
+        "Turn": (Turn, (Direction.CLOCKWISE,)),
+        "Step": (Step, (None,)),
+        "Stop": (Stop, ()),
+        "Loop": (Loop, ()),
+        "Binding": (Binding, (None, None)),
+        "Start": (Start, (None, None)),
+        "Grid": (Grid, (None, None)),
+    }
+
+
+def unslotted(cls: type) -> type:
+    """ Makes a class that sets the same attributes as a node class, but in
+    a __dict__, the way the nodes did before they had __slots__.
+    """
+
+    return type(cls.__name__, (), {"__init__": cls.__init__})
+
+
+def measure(make: Callable, n: int) -> float:
+    """ Finds how many bytes each of n things that make makes takes."""
+
+    tracemalloc.start()
+    things = [make() for _ in range(n)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # The list itself takes a pointer per thing.
+    return (size - sys.getsizeof(things)) / n
+
+
+def memory(blocks: int) -> None:
+    """ Prints how much memory the nodes of a parsed program take, and how
+    much they would take with a __dict__ instead of __slots__.
+    """
+
+    print(f"{'node':<16}{'bytes':>8}{'__dict__':>10}")
+
+    slotted: Dict[str, float] = {}
+    extra: Dict[str, float] = {}
+
+    for name, (cls, args) in samples().items():
+        slotted[name] = measure(lambda: cls(*args), 10000)
+        plain = unslotted(cls)
+        extra[name] = measure(lambda: plain(*args), 10000) - slotted[name]
+        print(f"{name:<16}{slotted[name]:>8.1f}"
+              f"{slotted[name] + extra[name]:>10.1f}")
+
+    tokens = list(tokenize(generate(blocks)))
+
+    tracemalloc.start()
+    program = parse(tokens)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    kinds: Dict[str, int] = {}
+    nodes = program_nodes(program, kinds)
+    unslotted_size = size + sum(
+        count * extra[name] for name, count in kinds.items()
+    )
+
+    print()
+    print(f"Parsed {nodes} nodes into {size / 2**20:.1f} MiB "
+          f"({size / nodes:.1f} bytes per node, peak {peak / 2**20:.1f} MiB)")
+    print(f"With a __dict__ in every node, that would be about "
+          f"{unslotted_size / 2**20:.1f} MiB "
+          f"({unslotted_size / nodes:.1f} bytes per node)")
+
+
+if __name__ == "__main__":
+
+    arg_parser = argparse.ArgumentParser(description="Benchmark robol.")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser(
+        "run", help="Time tokenizing, parsing and executing large programs."
+    )
+    run_parser.add_argument(
+        "--generators",
+        nargs="+",
+        choices=list(GENERATORS),
+        default=list(GENERATORS),
+        help="The programs to benchmark.",
+    )
+    run_parser.add_argument(
+        "--engines",
+        nargs="+",
+        choices=[engine.name.lower() for engine in Engine],
+        default=[engine.name.lower() for engine in Engine],
+        help="The engines to execute the programs with.",
+    )
+    run_parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="How much larger than the default to make the programs.",
+    )
+    run_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="How many times to time each phase, after a warm-up run.",
+    )
+    run_parser.add_argument(
+        "--save",
+        metavar="PATH",
+        help="Write the results to a baseline JSON file.",
+    )
+    run_parser.add_argument(
+        "--compare",
+        metavar="PATH",
+        help="Compare the results to a baseline JSON file.",
+    )
+    run_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="How much slower than the baseline counts as a regression.",
+    )
+
+    memory_parser = commands.add_parser(
+        "memory", help="Measure how much memory the nodes take."
+    )
+    memory_parser.add_argument(
+        "blocks",
+        type=int,
+        nargs="?",
+        default=10000,
+        help="How many blocks of a let and a loop the large program has.",
+    )
+
+    args = arg_parser.parse_args()
+
+    match args.command:
+        case "memory":
+            memory(args.blocks)
+        case _:
+            sys.exit(run(args))
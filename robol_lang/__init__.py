@@ -1,5 +1,23 @@
-from robol_lang.enums import Assign, BinaryOp, Direction, Orientation
+from robol_lang.enums import Assign, BinaryOp, Direction, Engine, EventKind, Opcode, Orientation, TokenKind, Verdict
 from robol_lang.robol import Program, Robot, Grid, Start, Binding
 from robol_lang.statements import Assignment, Loop, Stop, Turn, Step 
-from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier
-
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.limits import Limits, RunAborted, BudgetExceeded, DeadlineExceeded, Cancelled
+from robol_lang.sinks import Sink, NullSink, HumanSink, JsonSink, TeeSink
+from robol_lang.trajectory import Trajectory, load_trajectory
+from robol_lang.coverage import Coverage
+from robol_lang.machine import Machine, fingerprint
+from robol_lang.stream import Event, run_iter, run_async
+from robol_lang.profiler import NodeStats, Profiler
+from robol_lang.tokenizer import Token, tokenize, tokenize_file
+from robol_lang.parser import Parser, parse
+from robol_lang.compiler import compile_expression, compile_program
+from robol_lang.bytecode import Code, assemble, disassemble, execute
+from robol_lang.resolver import Resolver, resolve
+from robol_lang.optimizer import Optimizer, Report, optimize
+from robol_lang.summary import LoopSummary, summarize, summarize_loops
+from robol_lang.hoist import Hoister, hoist_invariants
+from robol_lang.bounds import BoundsChecker, BoundsReport, Interval, check_bounds
+from robol_lang.vector import Lanes, run_lanes
+from robol_lang.codegen import generate_source, compile_to_code, load_function, load_file
+from robol_lang.cache import ProgramCache, encode, decode
@@ -0,0 +1,217 @@
+from __future__ import annotations
+import glob
+import json
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, Iterator, List, TextIO
+
+from robol_lang.enums import Engine
+from robol_lang.limits import Limits
+from robol_lang.parser import parse
+from robol_lang.tokenizer import tokenize_file
+
+if TYPE_CHECKING:
+    from robol_lang.robol import Program, Robot
+
+
+def collect(target: str) -> List[str]:
+    """ Finds the programs to run.
+
+    Args:
+        target (str): A directory, whose .robol files are run, a manifest
+        file that lists one program per line, or a glob.
+
+    Returns:
+        The paths of the programs, in the order they should be run.
+    """
+
+    if os.path.isdir(target):
+        return sorted(glob.glob(os.path.join(glob.escape(target), "*.robol")))
+
+    if os.path.isfile(target) and not target.endswith(".robol"):
+        # Paths in a manifest are relative to the manifest itself. Empty
+        # lines and lines that start with # are skipped.
+        base = os.path.dirname(target)
+        with open(target) as f:
+            return [
+                os.path.join(base, line.strip())
+                for line in f
+                if line.strip() and not line.lstrip().startswith("#")
+            ]
+
+    return sorted(glob.glob(target, recursive=True))
+
+
+def _result(path: str, robot: Robot = None, error: str = None,
+            seconds: float = None) -> Dict:
+    """ Describes how a program ended, with None for what is not known,
+    so that every result has the same keys.
+    """
+
+    return {
+        "file": path,
+        "east": None if robot is None else robot.position["east"],
+        "north": None if robot is None else robot.position["north"],
+        "orientation": None if robot is None else robot.orientation.name,
+        "bindings": None if robot is None else robot.named_bindings(),
+        "error": error,
+        "seconds": seconds,
+    }
+
+
+def run_program(path: str, program: Program, timeout: float = None)\
+        -> Dict:
+    """ Runs a parsed program and describes how it ended.
+
+    This is what the workers of a batch run, so the program is sent to
+    them already parsed. The timeout is the deadline of the Limits of the
+    run, so it is checked as loop iterations start.
+
+    Args:
+        path (str): The path of the program.
+
+        program (Program): The parsed program.
+
+        timeout (float): How many seconds the program may run for, or None.
+
+    Returns:
+        A dictionary with the path, the position, orientation and bindings
+        of the robot, the error the program raised, if any, and how long it
+        ran for.
+    """
+
+    error = None
+    limits = None if timeout is None else Limits(seconds=timeout)
+    start = time.perf_counter()
+
+    try:
+        program.interpret(limits)
+    except Exception as e:
+        error = str(e)
+
+    return _result(
+        path, program.robot, error, time.perf_counter() - start
+    )
+
+
+def _run_alone(path: str, program: Program, timeout: float = None) -> Dict:
+    """ Runs a parsed program in a process of its own, and reports it as
+    failed if the process crashes.
+    """
+
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        try:
+            return pool.submit(run_program, path, program, timeout).result()
+        except BrokenProcessPool:
+            return _result(
+                path, error="The process running the program crashed"
+            )
+
+
+def run_batch(paths: List[str], engine: Engine = Engine.TREE,
+              jobs: int = None, timeout: float = None) -> Iterator[Dict]:
+    """ Runs programs over a pool of processes.
+
+    Every program is tokenized and parsed here, and only the parsed program
+    is sent to a worker, so the workers never parse anything. A program
+    that cannot be parsed is reported without being sent. The results of
+    the programs that have finished are given while the rest are still
+    being parsed and sent.
+
+    A worker that crashes breaks the whole pool, and every program that had
+    been sent to it fails along with the one that crashed. Those programs
+    are run again at the end, each in a process of its own, so that only
+    the one that crashed is reported as failed.
+
+    Args:
+        paths (List): The paths of the programs.
+
+        engine (Engine): The engine that runs the programs.
+
+        jobs (int): How many processes to run the programs in. Defaults to
+        the number of CPUs.
+
+        timeout (float): How many seconds each program may run for, or None.
+
+    Returns:
+        An iterator over the result of each program, as described by
+        run_program, in the order the programs finish. A program that
+        cannot be parsed, or that crashes, only has its path and error.
+    """
+
+    finished = queue.SimpleQueue()
+    running = {}
+    crashed = []
+
+    def results(wait: bool) -> Iterator[Dict]:
+        """ Gives the results of the programs that have finished, or of
+        every program that has been sent if wait.
+        """
+
+        while running and (wait or not finished.empty()):
+            future = finished.get()
+            path, program = running.pop(future)
+
+            try:
+                yield future.result()
+            except BrokenProcessPool:
+                crashed.append((path, program))
+            except Exception as e:
+                yield _result(path, error=str(e))
+
+    pool = ProcessPoolExecutor(max_workers=jobs)
+
+    try:
+        for path in paths:
+            try:
+                program = parse(tokenize_file(path))
+            except Exception as e:
+                yield _result(path, error=str(e))
+                continue
+
+            program.engine = engine
+
+            try:
+                future = pool.submit(run_program, path, program, timeout)
+            except BrokenProcessPool:
+                pool.shutdown()
+                pool = ProcessPoolExecutor(max_workers=jobs)
+                future = pool.submit(run_program, path, program, timeout)
+
+            running[future] = (path, program)
+            future.add_done_callback(finished.put)
+
+            yield from results(False)
+
+        yield from results(True)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    for path, program in crashed:
+        yield _run_alone(path, program, timeout)
+
+
+def write_results(results: Iterator[Dict], file: TextIO) -> int:
+    """ Writes results as JSON, one result per line, as soon as they come.
+
+    Args:
+        results (Iterator): The results.
+
+        file (TextIO): Where to write them.
+
+    Returns:
+        How many of the results are errors.
+    """
+
+    errors = 0
+
+    for result in results:
+        if result["error"] is not None:
+            errors += 1
+
+        print(json.dumps(result), file=file, flush=True)
+
+    return errors
@@ -0,0 +1,786 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+from robol_lang.compiler import compile_expression
+from robol_lang.enums import Assign, BinaryOp, Direction, Verdict, UNITS
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.resolver import resolve
+from robol_lang.robol import INF, Robot, Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+from robol_lang.summary import summarize
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program
+
+
+# How many statements the analysis may look at before it gives up.
+_BUDGET = 200_000
+
+# How many iterations of loops the analysis may run one at a time, in all and
+# every time a loop starts.
+_UNROLL = 5_000
+_UNROLL_LOOP = 64
+
+# How many times the iterations of a loop are joined before they are widened.
+_WIDEN_AFTER = 3
+
+# How many times the widened iterations of a loop are narrowed again.
+_NARROW = 2
+
+
+class _GiveUp(Exception):
+    """ Raised when the analysis has looked at too many statements."""
+
+
+class Interval:
+    """ Class that holds every value an int can have as a range.
+
+    Attributes:
+        lo (int): The smallest value, or -inf.
+
+        hi (int): The largest value, or inf.
+    """
+
+    __slots__ = ("lo", "hi")
+
+    def __init__(self, lo: int, hi: int) -> None:
+        """ Sets attributes."""
+
+        self.lo = lo
+        self.hi = hi
+
+    @property
+    def exact(self) -> bool:
+        """ Whether the interval only holds one value."""
+
+        return self.lo == self.hi
+
+    def __add__(self, other: Interval) -> Interval:
+        return Interval(self.lo + other.lo, self.hi + other.hi)
+
+    def __sub__(self, other: Interval) -> Interval:
+        return Interval(self.lo - other.hi, self.hi - other.lo)
+
+    def __mul__(self, other: Interval) -> Interval:
+        # 0 times inf is nan for floats, but 0 for the ints they stand for.
+        products = [
+            0 if a == 0 or b == 0 else a * b
+            for a in (self.lo, self.hi)
+            for b in (other.lo, other.hi)
+        ]
+
+        return Interval(min(products), max(products))
+
+    def __neg__(self) -> Interval:
+        return Interval(-self.hi, -self.lo)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Interval)\
+            and self.lo == other.lo and self.hi == other.hi
+
+    def __repr__(self) -> str:
+        return f"Interval({self.lo}, {self.hi})"
+
+    def scale(self, factor: int) -> Interval:
+        """ Multiplies the interval by -1, 0 or 1."""
+
+        if factor == 0:
+            return Interval(0, 0)
+
+        return self if factor > 0 else -self
+
+    def join(self, other: Interval) -> Interval:
+        """ Finds the smallest interval that holds both intervals."""
+
+        return Interval(min(self.lo, other.lo), max(self.hi, other.hi))
+
+    def widen(self, other: Interval) -> Interval:
+        """ Joins the intervals, but lets any end that grew go to infinity,
+        so that a loop is only iterated over a few times.
+        """
+
+        return Interval(
+            self.lo if other.lo >= self.lo else -INF,
+            self.hi if other.hi <= self.hi else INF,
+        )
+
+    def meet(self, lo: int, hi: int) -> Interval | None:
+        """ Finds the part of the interval between lo and hi, or None if
+        there is none.
+        """
+
+        lo = max(self.lo, lo)
+        hi = min(self.hi, hi)
+
+        return Interval(lo, hi) if lo <= hi else None
+
+
+_FALSE = Interval(0, 0)
+_TRUE = Interval(1, 1)
+_EITHER = Interval(0, 1)
+
+
+class _State:
+    """ Class that holds every state the robot can be in at a statement.
+
+    Attributes:
+        east (Interval): How far east the robot can be.
+
+        north (Interval): How far north the robot can be.
+
+        headings (FrozenSet): The headings the robot can have.
+
+        bindings (List): The values each slot can have, or None if the slot
+        has not been bound.
+    """
+
+    __slots__ = ("east", "north", "headings", "bindings")
+
+    def __init__(self, east: Interval, north: Interval, headings: frozenset,
+                 bindings: List) -> None:
+        """ Sets attributes."""
+
+        self.east = east
+        self.north = north
+        self.headings = headings
+        self.bindings = bindings
+
+    def copy(self) -> _State:
+        return _State(
+            self.east, self.north, self.headings, list(self.bindings)
+        )
+
+    def exact(self, slots: Tuple[int, ...]) -> bool:
+        """ Finds if there is only one position, heading, and value of each
+        of some slots the robot can have.
+        """
+
+        bindings = self.bindings
+
+        return self.east.exact and self.north.exact\
+            and len(self.headings) == 1\
+            and all(
+                bindings[slot] is None or bindings[slot].exact
+                for slot in slots
+            )
+
+    def key(self, slots: Tuple[int, ...]) -> Tuple:
+        """ Finds a tuple that is the same for two states that are exact in
+        some slots only if they are the same in them.
+        """
+
+        bindings = self.bindings
+
+        return (
+            self.east.lo, self.north.lo, self.headings,
+            tuple(
+                None if bindings[slot] is None else bindings[slot].lo
+                for slot in slots
+            ),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _State)\
+            and self.east == other.east and self.north == other.north\
+            and self.headings == other.headings\
+            and self.bindings == other.bindings
+
+    def _combine(self, other: _State, how: str) -> _State:
+        """ Joins or widens every part of the states."""
+
+        bindings = [
+            b if a is None else a if b is None else getattr(a, how)(b)
+            for a, b in zip(self.bindings, other.bindings)
+        ]
+
+        return _State(
+            getattr(self.east, how)(other.east),
+            getattr(self.north, how)(other.north),
+            self.headings | other.headings,
+            bindings,
+        )
+
+    def join(self, other: _State | None) -> _State:
+        """ Finds a state that holds both states."""
+
+        return self if other is None else self._combine(other, "join")
+
+    def widen(self, other: _State | None) -> _State:
+        """ Joins the states, with every interval that grew widened."""
+
+        return self if other is None else self._combine(other, "widen")
+
+
+def _join(a: _State | None, b: _State | None) -> _State | None:
+    """ Joins two states, either of which can be unreachable."""
+
+    return b if a is None else a.join(b)
+
+
+def _slots(node: Robol, found: Set[int]) -> None:
+    """ Finds the slots a node, and everything in it, reads or writes."""
+
+    match node:
+        case Identifier():
+            found.add(node.slot)
+        case NumberExp():
+            pass
+        case BoolExp():
+            _slots(node.a_exp, found)
+        case Invariant():
+            _slots(node.exp, found)
+        case ArithmeticExp():
+            _slots(node.left, found)
+            _slots(node.right, found)
+        case Assignment():
+            found.add(node.identifier.slot)
+        case Binding():
+            found.add(node.ident.slot)
+            _slots(node.exp, found)
+        case Start():
+            _slots(node.east, found)
+            _slots(node.north, found)
+        case Step():
+            _slots(node.exp, found)
+        case Loop():
+            _slots(node.condition, found)
+            for interpretable in node.interpretables:
+                _slots(interpretable, found)
+
+
+def _strip(exp: Expression) -> Expression:
+    """ Finds the expression inside an Invariant or BoolExp."""
+
+    while type(exp) is Invariant or type(exp) is BoolExp:
+        exp = exp.exp if type(exp) is Invariant else exp.a_exp
+
+    return exp
+
+
+class BoundsReport:
+    """ Class that holds what the analysis of a program found.
+
+    Attributes:
+        verdict (Verdict): Whether the program stays inside the grid.
+
+        statement (Step): The Step that is sure to overstep the grid, when
+        the verdict is OUT_OF_BOUNDS, or None.
+
+        risky (List): The Steps that may overstep the grid, when the verdict
+        is UNKNOWN, in the order they were found. It is empty when the
+        analysis gave up before it was done.
+    """
+
+    def __init__(self, verdict: Verdict, statement: Step = None,
+                 risky: List[Step] = None) -> None:
+        """ Sets attributes."""
+
+        self.verdict = verdict
+        self.statement = statement
+        self.risky = [] if risky is None else risky
+
+    def message(self, positions: Dict[Robol, Tuple[int, int]] = None) -> str:
+        """ Describes the verdict.
+
+        Args:
+            positions (Dict): The line and column of each statement, from
+            a program that has been parsed with positions, or None.
+
+        Returns:
+            The description.
+        """
+
+        def where(step: Step) -> str:
+            if positions and step in positions:
+                line, column = positions[step]
+                return f"the step at line {line}, column {column}"
+            return "a step"
+
+        match self.verdict:
+            case Verdict.IN_BOUNDS:
+                return "The program is proven to stay inside the grid"
+            case Verdict.OUT_OF_BOUNDS:
+                return "The program is proven to overstep the grid at "\
+                    + where(self.statement)
+
+        if not self.risky:
+            return "The program is too large to prove anything about"
+
+        return "The program may overstep the grid at "\
+            + ", ".join(where(step) for step in self.risky)
+
+
+class BoundsChecker:
+    """ Class that works out where a robot can be at every statement of a
+    program, without running it.
+
+    Every binding, and the east and north of the robot, is kept as the
+    interval of values it can have, and the orientation as the set of
+    headings it can have. The statements change these the way they would
+    change the values, so that the robot is somewhere in the intervals
+    whenever a statement runs. A Step whose furthest reach along its heading
+    is inside the grid is safe, one whose nearest reach is outside always
+    oversteps, and any other may overstep. After a Step, the robot is known
+    to be inside the edge it did not cross.
+
+    While the position, the heading and every binding a loop uses only have
+    one value, the analysis follows the loop exactly, and either skips it
+    with its LoopSummary or runs it an iteration at a time, so that a Step
+    that is sure to be reached and sure to overstep is found. A loop that
+    comes back to where it started an iteration before, with the same
+    bindings, never ends. Once the analysis is no longer exact, a loop is
+    analyzed by joining the states of its iterations until they stop
+    growing, widening any interval that keeps growing to infinity, and then
+    narrowing it again with the condition of the loop. The analysis can
+    then no longer tell if the loop ends, so nothing after it is sure to be
+    reached.
+
+    Attributes:
+        edges (Tuple): How far the robot may come in each heading, counted
+        along the unit of the heading.
+
+        certain (bool): Whether the statement being analyzed is sure to be
+        reached, unless the robot oversteps the grid before it.
+
+        recording (bool): Whether Steps that may overstep are recorded, which
+        they are not in the iterations of a loop before its states settle.
+
+        risky (List): The Steps found so far that may overstep the grid.
+
+        failure (Step): The Step that is sure to overstep the grid, or None.
+
+        budget (int): How many more statements may be analyzed.
+
+        unroll (int): How many more iterations may be run one at a time.
+
+        slots (Dict): The slots each loop reads or writes, by loop.
+    """
+
+    def __init__(self, grid_east: int, grid_north: int,
+                 budget: int = _BUDGET, unroll: int = _UNROLL) -> None:
+        """ Sets attributes."""
+
+        self.edges = (grid_east, 0, 0, grid_north)
+        self.certain = True
+        self.recording = True
+        self.risky: List[Step] = []
+        self.failure: Step = None
+        self.budget = budget
+        self.unroll = unroll
+        self.slots: Dict[Loop, Tuple[int, ...]] = {}
+
+    def expression(self, exp: Expression, state: _State) -> Interval:
+        """ Finds the values an expression can have.
+
+        Args:
+            exp (Expression): The expression.
+
+            state (_State): The state it is evaluated in.
+
+        Returns:
+            The interval of values.
+        """
+
+        kind = type(exp)
+
+        if kind is NumberExp:
+            return Interval(exp.val, exp.val)
+        if kind is Identifier:
+            value = state.bindings[exp.slot]
+            return Interval(-INF, INF) if value is None else value
+        if kind is BoolExp:
+            return self.expression(exp.a_exp, state)
+        if kind is Invariant:
+            return self.expression(exp.exp, state)
+        if kind is not ArithmeticExp:
+            raise Exception(f"Cannot analyze {kind.__name__}")
+
+        left = self.expression(exp.left, state)
+        right = self.expression(exp.right, state)
+
+        match exp.op:
+            case BinaryOp.PLUS:
+                return left + right
+            case BinaryOp.MINUS:
+                return left - right
+            case BinaryOp.MULT:
+                return left * right
+            case BinaryOp.LESS:
+                left, right = right, left
+            case BinaryOp.EQUALS:
+                if left.exact and right.exact:
+                    return _TRUE if left.lo == right.lo else _FALSE
+                if left.hi < right.lo or right.hi < left.lo:
+                    return _FALSE
+                return _EITHER
+
+        # left > right
+        if left.lo > right.hi:
+            return _TRUE
+        if left.hi <= right.lo:
+            return _FALSE
+
+        return _EITHER
+
+    def _refine(self, exp: Expression, state: _State, truth: bool)\
+            -> _State | None:
+        """ Narrows the bindings in a condition to the values where the
+        condition is true, or false.
+
+        Args:
+            exp (Expression): The condition.
+
+            state (_State): The state it is evaluated in.
+
+            truth (bool): Whether the condition is to be true.
+
+        Returns:
+            The narrowed state, or None if the condition can never be what
+            it is to be.
+        """
+
+        value = self.expression(exp, state)
+
+        if truth and value == _FALSE or not truth and value.meet(0, 0) is None:
+            return None
+
+        exp = _strip(exp)
+
+        if type(exp) is not ArithmeticExp:
+            return state
+
+        op = exp.op
+        left = exp.left
+        if type(left) is Invariant:
+            left = left.exp
+        right = exp.right
+        if type(right) is Invariant:
+            right = right.exp
+
+        if op is BinaryOp.GREATER:
+            op = BinaryOp.LESS
+            left, right = right, left
+        elif op is not BinaryOp.LESS and not (op is BinaryOp.EQUALS and truth):
+            return state
+
+        a = self.expression(left, state)
+        b = self.expression(right, state)
+
+        if op is BinaryOp.EQUALS:
+            # a == b, so both are where they overlap.
+            a = b = a.meet(b.lo, b.hi)
+        elif truth:
+            # a < b
+            a, b = a.meet(-INF, b.hi - 1), b.meet(a.lo + 1, INF)
+        else:
+            # a >= b
+            a, b = a.meet(b.lo, INF), b.meet(-INF, a.hi)
+
+        if a is None or b is None:
+            return None
+
+        state = state.copy()
+
+        for side, value in ((left, a), (right, b)):
+            if type(side) is Identifier:
+                state.bindings[side.slot] = value
+
+        return state
+
+    def _step(self, node: Step, state: _State) -> _State | None:
+        """ Checks a Step, and moves the robot."""
+
+        n = self.expression(node.exp, state)
+        survivors = None
+        always = True
+        sometimes = False
+
+        for heading in sorted(state.headings):
+            dx, dy = UNITS[heading]
+            edge = self.edges[heading]
+
+            # How far along its heading the robot comes, as in Step.
+            reach = state.east.scale(dx) + state.north.scale(dy) + n
+
+            sometimes = sometimes or reach.hi > edge
+
+            if reach.lo <= edge:
+                always = False
+
+                east = state.east + n.scale(dx)
+                north = state.north + n.scale(dy)
+
+                # The robot did not cross the edge it is heading for.
+                if dx > 0:
+                    east = east.meet(-INF, edge)
+                elif dx < 0:
+                    east = east.meet(-edge, INF)
+                elif dy > 0:
+                    north = north.meet(-INF, edge)
+                else:
+                    north = north.meet(-edge, INF)
+
+                moved = _State(
+                    east, north, frozenset((heading,)), state.bindings
+                )
+                survivors = _join(survivors, moved)
+
+        if always:
+            if self.certain and not self.risky:
+                self.failure = node
+            elif self.recording and node not in self.risky:
+                self.risky.append(node)
+            return None
+
+        if sometimes and self.recording and node not in self.risky:
+            self.risky.append(node)
+
+        return survivors
+
+    def _run_summary(self, node: Loop, state: _State, slots: Tuple[int, ...])\
+            -> Tuple[_State, bool] | None:
+        """ Skips the iterations of a loop that its LoopSummary knows to be
+        safe, from a state that is exact in the slots of the loop.
+
+        Returns:
+            The state the summary leaves the robot in, and whether the loop
+            is done, or None if the loop cannot be summarized. A loop that
+            is not done is at the start of the iteration that oversteps, if
+            the summary found one.
+        """
+
+        summary = summarize(node)
+
+        if summary is None:
+            return None
+
+        robot = Robot()
+        robot.position["east"] = state.east.lo
+        robot.position["north"] = state.north.lo
+        robot.heading = next(iter(state.headings))
+        robot.bindings = [None] * len(state.bindings)
+        for slot in slots:
+            if state.bindings[slot] is not None:
+                robot.bindings[slot] = state.bindings[slot].lo
+        robot.grid_east = self.edges[0]
+        robot.grid_north = self.edges[3]
+
+        done = summary.run(robot)
+
+        state = _State(
+            Interval(robot.position["east"], robot.position["east"]),
+            Interval(robot.position["north"], robot.position["north"]),
+            frozenset((robot.heading,)),
+            list(state.bindings),
+        )
+        for slot in slots:
+            value = robot.bindings[slot]
+            if value is not None:
+                state.bindings[slot] = Interval(value, value)
+
+        return state, done
+
+    def _loop(self, node: Loop, state: _State) -> _State | None:
+        """ Analyzes a Loop, whose body runs at least once."""
+
+        slots = self.slots.get(node)
+        if slots is None:
+            found = set()
+            _slots(node, found)
+            slots = self.slots[node] = tuple(sorted(found))
+
+        if state.exact(slots):
+            summarized = self._run_summary(node, state, slots)
+            if summarized is not None:
+                state, done = summarized
+                if done:
+                    return state
+
+            # Run the iterations one at a time while the state stays exact.
+            # A run is decided by its state, so a loop that comes back to a
+            # state it has started an iteration in before never ends.
+            seen = set()
+            for _ in range(min(self.unroll, _UNROLL_LOOP)):
+                key = state.key(slots)
+                if key in seen:
+                    return None
+                seen.add(key)
+
+                self.unroll -= 1
+                after = self.block(node.interpretables, state)
+                if after is None:
+                    return None
+
+                value = self.expression(node.condition, after)
+                if value == _FALSE:
+                    return after
+                if not value.exact or not after.exact(slots):
+                    exits = self._refine(node.condition, after, False)
+                    state = self._refine(node.condition, after, True)
+                    if state is None:
+                        return exits
+                    return _join(exits, self._iterate(node, state))
+
+                state = after
+
+        return self._iterate(node, state)
+
+    def _iterate(self, node: Loop, head: _State) -> _State | None:
+        """ Analyzes the iterations of a Loop from the state at the start of
+        one, until the states settle.
+        """
+
+        condition = node.condition
+
+        def once(start: _State) -> Tuple[_State | None, _State | None]:
+            after = self.block(node.interpretables, start)
+            if after is None:
+                return None, None
+            return (
+                self._refine(condition, after, True),
+                self._refine(condition, after, False),
+            )
+
+        # The first iteration is as sure to run as the loop.
+        again, _ = once(head)
+        self.certain = False
+
+        recording = self.recording
+        self.recording = False
+
+        states = head
+        count = 0
+        while True:
+            joined = states.join(again)
+            if joined == states:
+                break
+            count += 1
+            states = states.widen(joined) if count > _WIDEN_AFTER else joined
+            again, _ = once(states)
+
+        # Narrow what widening let go to infinity.
+        for _ in range(_NARROW):
+            again, _ = once(states)
+            narrowed = head.join(again)
+            if narrowed == states:
+                break
+            states = narrowed
+
+        self.recording = recording
+        _, exits = once(states)
+
+        return exits
+
+    def statement(self, node: Robol, state: _State | None) -> _State | None:
+        """ Analyzes a statement, Binding or Start.
+
+        Args:
+            node (Robol): The node.
+
+            state (_State): The state before the node, or None if the node
+            can never be reached.
+
+        Returns:
+            The state after the node, or None if nothing comes after it.
+        """
+
+        if state is None:
+            return None
+
+        self.budget -= 1
+        if self.budget < 0:
+            raise _GiveUp()
+
+        kind = type(node)
+
+        if kind is Step:
+            return self._step(node, state)
+        if kind is Loop:
+            return self._loop(node, state)
+        if kind is Turn:
+            delta = 1 if node.direction is Direction.CLOCKWISE else -1
+            state = state.copy()
+            state.headings = frozenset(
+                (heading + delta) % 4 for heading in state.headings
+            )
+        elif kind is Assignment:
+            delta = 1 if node.assign is Assign.INC else -1
+            state = state.copy()
+            slot = node.identifier.slot
+            state.bindings[slot] = state.bindings[slot]\
+                + Interval(delta, delta)
+        elif kind is Binding:
+            value = self.expression(node.exp, state)
+            state = state.copy()
+            state.bindings[node.ident.slot] = value
+        elif kind is Start:
+            state = state.copy()
+            state.east = self.expression(node.east, state)
+            state.north = self.expression(node.north, state)
+        elif kind is not Stop:
+            raise Exception(f"Cannot analyze {kind.__name__}")
+
+        return state
+
+    def block(self, interpretables: List, state: _State | None)\
+            -> _State | None:
+        """ Analyzes a list of statements.
+
+        Args:
+            interpretables (List): The statements.
+
+            state (_State): The state before them, or None.
+
+        Returns:
+            The state after them, or None if nothing comes after them.
+        """
+
+        for interpretable in interpretables:
+            state = self.statement(interpretable, state)
+            if state is None:
+                return None
+
+        return state
+
+
+def check_bounds(program: Program) -> BoundsReport:
+    """ Proves whether a program stays inside its grid, without running it.
+
+    The robot starts from where it is now, so a robot that has not been run
+    starts in the south west corner facing east, like it does when it runs.
+
+    Args:
+        program (Program): The program.
+
+    Returns:
+        The BoundsReport. The verdict is IN_BOUNDS if no Step can overstep
+        the grid, OUT_OF_BOUNDS if the run is sure to reach a Step that
+        oversteps the grid, and UNKNOWN otherwise.
+    """
+
+    names = resolve(program)
+    grid_east = compile_expression(program.grid.east)([])
+    grid_north = compile_expression(program.grid.north)([])
+
+    robot = program.robot
+    state = _State(
+        Interval(robot.position["east"], robot.position["east"]),
+        Interval(robot.position["north"], robot.position["north"]),
+        frozenset((robot.heading,)),
+        [None] * len(names),
+    )
+
+    checker = BoundsChecker(grid_east, grid_north)
+
+    try:
+        checker.block(robot.interpretables, state)
+    except _GiveUp:
+        return BoundsReport(Verdict.UNKNOWN)
+
+    if checker.failure is not None:
+        return BoundsReport(Verdict.OUT_OF_BOUNDS, checker.failure)
+    if checker.risky:
+        return BoundsReport(Verdict.UNKNOWN, risky=checker.risky)
+
+    return BoundsReport(Verdict.IN_BOUNDS)
@@ -0,0 +1,594 @@
+from __future__ import annotations
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from robol_lang.compiler import overstep
+from robol_lang.enums import Assign, BinaryOp, Direction, Opcode, ORIENTATIONS
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program, Robot
+
+
+_BINARY = {
+    BinaryOp.PLUS: Opcode.ADD,
+    BinaryOp.MINUS: Opcode.SUB,
+    BinaryOp.MULT: Opcode.MUL,
+    BinaryOp.LESS: Opcode.LT,
+    BinaryOp.GREATER: Opcode.GT,
+    BinaryOp.EQUALS: Opcode.EQ,
+}
+
+# The jumps that compare two registers themselves, for loop conditions that
+# are a single comparison.
+_JUMPS = {
+    BinaryOp.LESS: Opcode.JUMP_LT,
+    BinaryOp.GREATER: Opcode.JUMP_GT,
+    BinaryOp.EQUALS: Opcode.JUMP_EQ,
+}
+
+# What the arguments of each instruction mean, for the disassembler.
+_ARGUMENTS = {
+    Opcode.COPY: ("register", "register"),
+    Opcode.ADD: ("register", "register", "register"),
+    Opcode.SUB: ("register", "register", "register"),
+    Opcode.MUL: ("register", "register", "register"),
+    Opcode.LT: ("register", "register", "register"),
+    Opcode.GT: ("register", "register", "register"),
+    Opcode.EQ: ("register", "register", "register"),
+    Opcode.START: ("register", "register"),
+    Opcode.STEP: ("register",),
+    Opcode.MOVE: ("register",),
+    Opcode.INC: ("register",),
+    Opcode.DEC: ("register",),
+    Opcode.SUMMARY: ("summary",),
+    Opcode.JUMP_IF_TRUE: ("target", "register"),
+    Opcode.JUMP_LT: ("target", "register", "register"),
+    Opcode.JUMP_GT: ("target", "register", "register"),
+    Opcode.JUMP_EQ: ("target", "register", "register"),
+}
+
+
+class Code:
+    """ Class that holds a program lowered to bytecode.
+
+    Every instruction is four ints in ops, the opcode and up to three
+    arguments, which are 0 when the instruction has fewer. Most arguments
+    are registers, which are indexes into the bindings of the robot, so the
+    first registers are the slots of the identifiers. The rest are added to
+    the bindings while the program runs, and hold either a number or what
+    an arithmetic instruction has computed. Numbers are kept in registers,
+    as an int in the array cannot hold every value a robol number can have.
+    Jump targets are indexes of instructions.
+
+    A loop is lowered to a TICK, its body, and a jump back to the start of
+    its body that is taken while its condition holds. A loop condition that
+    is a single comparison is lowered to a jump that compares two registers
+    itself. A summarized loop is preceded by a SUMMARY, which jumps past the
+    loop if the summary finished it.
+
+    Attributes:
+        ops (array): The instructions.
+
+        registers (List): The number in each register after the slots, or
+        None for a register that an instruction computes.
+
+        summaries (List): The summary of each summarized loop, and the
+        target to jump to when it finishes the loop.
+
+        names (List): The identifier of each slot.
+    """
+
+    def __init__(self, names: List[str]) -> None:
+        """ Sets attributes."""
+
+        self.ops = array("i")
+        self.registers: List[int] = []
+        self.summaries: List[list] = []
+        self.names = names
+        self._constants: Dict[int, int] = {}
+        self._temporaries: List[int] = []
+
+    def __len__(self) -> int:
+        """ Finds how many instructions there are."""
+
+        return len(self.ops) // 4
+
+    def emit(self, opcode: Opcode, a: int = 0, b: int = 0, c: int = 0)\
+            -> int:
+        """ Adds an instruction.
+
+        Args:
+            opcode (Opcode): The instruction.
+
+            a (int): Its first argument.
+
+            b (int): Its second argument.
+
+            c (int): Its third argument.
+
+        Returns:
+            The index of the instruction.
+        """
+
+        self.ops.extend((opcode.value, a, b, c))
+
+        return len(self) - 1
+
+    def _register(self, value: int = None) -> int:
+        """ Adds a register after the slots."""
+
+        self.registers.append(value)
+
+        return len(self.names) + len(self.registers) - 1
+
+    def constant(self, value: int) -> int:
+        """ Finds the register that holds a number, adding it if needed."""
+
+        register = self._constants.get(value)
+
+        if register is None:
+            register = self._constants[value] = self._register(value)
+
+        return register
+
+    def temporary(self, height: int) -> int:
+        """ Finds the register that holds what an arithmetic instruction
+        computes for an expression that is height operands deep into the
+        expression being lowered, adding it if needed.
+        """
+
+        while len(self._temporaries) <= height:
+            self._temporaries.append(self._register())
+
+        return self._temporaries[height]
+
+
+def _expression(code: Code, exp: Expression, height: int = 0,
+                target: int = None) -> int:
+    """ Lowers an expression to instructions that compute its value.
+
+    The expression is walked with an explicit stack, so how deep it is
+    nested does not matter. A number or an identifier needs no instruction,
+    as it already is in a register. The left operand of an arithmetic
+    expression is computed into the register of the expression's height,
+    and the right one a height further up, so neither can overwrite the
+    other, and the expressions of a statement can be lowered at different
+    heights so that they can all be read at once.
+
+    Args:
+        code (Code): The bytecode.
+
+        exp (Expression): The expression.
+
+        height (int): The height of the expression.
+
+        target (int): The register to compute the value into, or None to
+        leave it in whichever register is the most convenient.
+
+    Returns:
+        The register that holds the value of the expression.
+    """
+
+    # Each entry is an expression, its height, the register to compute it
+    # into, and whether its operands have been lowered.
+    stack: List[Tuple[Expression, int, int, bool]] = [
+        (exp, height, target, False)
+    ]
+    values: List[int] = []
+
+    while stack:
+        exp, height, into, done = stack.pop()
+
+        if done:
+            right = values.pop()
+            left = values.pop()
+
+            if into is None:
+                into = code.temporary(height)
+
+            code.emit(_BINARY[exp.op], into, left, right)
+            values.append(into)
+            continue
+
+        match exp:
+            case NumberExp():
+                values.append(code.constant(exp.val))
+            case Identifier():
+                values.append(exp.slot)
+            case BoolExp():
+                stack.append((exp.a_exp, height, into, False))
+            case Invariant():
+                stack.append((exp.exp, height, into, False))
+            case ArithmeticExp():
+                if exp.op not in _BINARY:
+                    raise Exception("Something went wrong in ArithmeticExp.")
+
+                stack.append((exp, height, into, True))
+                stack.append((exp.right, height + 1, None, False))
+                stack.append((exp.left, height, None, False))
+            case _:
+                raise Exception(f"Cannot lower {type(exp).__name__}")
+
+    register = values.pop()
+
+    if target is not None and register != target:
+        code.emit(Opcode.COPY, target, register)
+        register = target
+
+    return register
+
+
+def _jump(code: Code, condition: Expression, top: int) -> None:
+    """ Lowers the condition of a loop to a jump back to the top of it."""
+
+    while isinstance(condition, (BoolExp, Invariant)):
+        condition = condition.a_exp if isinstance(condition, BoolExp)\
+            else condition.exp
+
+    if isinstance(condition, ArithmeticExp) and condition.op in _JUMPS:
+        left = _expression(code, condition.left)
+        right = _expression(code, condition.right, 1)
+        code.emit(_JUMPS[condition.op], top, left, right)
+    else:
+        code.emit(Opcode.JUMP_IF_TRUE, top, _expression(code, condition))
+
+
+def _statements(code: Code, nodes: List[Robol], step: Opcode) -> None:
+    """ Lowers statements, Bindings and Starts to instructions.
+
+    The statements are walked with an explicit stack, so how deep the loops
+    are nested does not matter. A Step is lowered to the given opcode, which
+    is STEP, or MOVE if the step is not checked against the grid.
+    """
+
+    # Each entry is a node and whether the body of the loop it is has been
+    # lowered, along with the top of each loop whose body is being lowered.
+    stack: List[Tuple[Robol, bool]] = [
+        (node, False) for node in reversed(nodes)
+    ]
+    loops: List[Tuple[int, list]] = []
+
+    while stack:
+        node, done = stack.pop()
+
+        if done:
+            top, summary = loops.pop()
+            _jump(code, node.condition, top)
+
+            if summary is not None:
+                summary[1] = len(code)
+            continue
+
+        match node:
+            case Binding():
+                _expression(code, node.exp, target=node.ident.slot)
+            case Start():
+                east = _expression(code, node.east)
+                north = _expression(code, node.north, 1)
+                code.emit(Opcode.START, east, north)
+            case Assignment():
+                match node.assign:
+                    case Assign.INC:
+                        code.emit(Opcode.INC, node.identifier.slot)
+                    case Assign.DEC:
+                        code.emit(Opcode.DEC, node.identifier.slot)
+                    case _:
+                        raise Exception("Something went wrong in Assignment")
+            case Loop():
+                summary = None
+                if node.summary is not None:
+                    summary = [node.summary, 0]
+                    code.emit(Opcode.SUMMARY, len(code.summaries))
+                    code.summaries.append(summary)
+
+                loops.append((code.emit(Opcode.TICK) + 1, summary))
+                stack.append((node, True))
+                stack.extend(
+                    (child, False) for child in reversed(node.interpretables)
+                )
+            case Stop():
+                code.emit(Opcode.STOP)
+            case Turn():
+                if node.direction is Direction.CLOCKWISE:
+                    code.emit(Opcode.TURN_CW)
+                else:
+                    code.emit(Opcode.TURN_CCW)
+            case Step():
+                code.emit(step, _expression(code, node.exp))
+            case _:
+                raise Exception(f"Cannot lower {type(node).__name__}")
+
+
+def assemble(program: Program, checked: bool = True) -> Code:
+    """ Lowers a program to bytecode.
+
+    The program has to be resolved first, so that every identifier has a
+    slot, and the names of the slots are in the robot, as Program._link and
+    Program.assemble do. A loop that has a summary is lowered with a
+    SUMMARY, so the loops should be summarized first as well.
+
+    Args:
+        program (Program): The program to lower.
+
+        checked (bool): Whether every Step checks that the robot stays
+        inside the grid. A Step that does not is lowered to MOVE instead of
+        STEP, and only a program that has been proven to stay inside the
+        grid should be lowered without the checks.
+
+    Returns:
+        The Code of the program.
+    """
+
+    code = Code(program.robot.names)
+    step = Opcode.STEP if checked else Opcode.MOVE
+
+    _statements(code, program.robot.interpretables, step)
+
+    return code
+
+
+def disassemble(code: Code) -> str:
+    """ Describes bytecode one instruction per line.
+
+    Every line has the index of the instruction, its opcode, its arguments,
+    and what they are, such as the identifier of a slot or the number in a
+    register. A register that an instruction computes is shown as t and its
+    index. Instructions that are jumped to are marked with >>.
+
+    Args:
+        code (Code): The bytecode.
+
+    Returns:
+        The description.
+    """
+
+    def register(index: int) -> str:
+        if index < len(code.names):
+            return code.names[index]
+
+        value = code.registers[index - len(code.names)]
+
+        return f"t{index}" if value is None else str(value)
+
+    ops = code.ops
+    jumps = {
+        Opcode.JUMP_IF_TRUE.value, Opcode.JUMP_LT.value,
+        Opcode.JUMP_GT.value, Opcode.JUMP_EQ.value,
+    }
+    targets = {ops[i + 1] for i in range(0, len(ops), 4) if ops[i] in jumps}
+    targets.update(target for _, target in code.summaries)
+
+    lines = []
+
+    for index in range(len(code)):
+        opcode = Opcode(ops[4 * index])
+        arguments = ops[4 * index + 1:4 * index + 4]
+        line = f"{'>>' if index in targets else '':>2} {index:>5} "\
+            f"{opcode.name:<13}"
+
+        described = []
+        for kind, argument in zip(_ARGUMENTS.get(opcode, ()), arguments):
+            match kind:
+                case "register":
+                    described.append(f"{argument} ({register(argument)})")
+                case "summary":
+                    described.append(
+                        f"{argument} (to {code.summaries[argument][1]})"
+                    )
+                case "target":
+                    described.append(f"{argument}")
+
+        lines.append((line + ", ".join(described)).rstrip())
+
+    if len(code) in targets:
+        lines.append(f">> {len(code):>5}")
+
+    return "\n".join(lines)
+
+
+def execute(code: Code, robot: Robot) -> None:
+    """ Runs bytecode on a robot.
+
+    This is a single loop over the instructions, and the position,
+    orientation and countdown of the robot are held in locals. They are
+    written back to the robot before it is handed to anything else, such as
+    a sink, a summary or the limits, and when the loop is done, even if the
+    robot oversteps the grid. The registers after the slots are added to the
+    bindings of the robot while it runs, and taken off again afterwards.
+    Loops are only jumps, so nesting them does not use up the Python stack.
+
+    Args:
+        code (Code): The bytecode.
+
+        robot (Robot): The robot, which has to be linked to the program the
+        bytecode was assembled from.
+
+    Returns:
+        None
+    """
+
+    COPY = Opcode.COPY.value
+    ADD = Opcode.ADD.value
+    SUB = Opcode.SUB.value
+    MUL = Opcode.MUL.value
+    LT = Opcode.LT.value
+    GT = Opcode.GT.value
+    EQ = Opcode.EQ.value
+    START = Opcode.START.value
+    STEP = Opcode.STEP.value
+    MOVE = Opcode.MOVE.value
+    TURN_CW = Opcode.TURN_CW.value
+    TURN_CCW = Opcode.TURN_CCW.value
+    INC = Opcode.INC.value
+    DEC = Opcode.DEC.value
+    TICK = Opcode.TICK.value
+    SUMMARY = Opcode.SUMMARY.value
+    JUMP_IF_TRUE = Opcode.JUMP_IF_TRUE.value
+    JUMP_LT = Opcode.JUMP_LT.value
+    JUMP_GT = Opcode.JUMP_GT.value
+    JUMP_EQ = Opcode.JUMP_EQ.value
+    STOP = Opcode.STOP.value
+
+    orientations = ORIENTATIONS
+
+    # One tuple per instruction is quicker to take apart than four ints.
+    ops = iter(code.ops)
+    instructions = list(zip(ops, ops, ops, ops))
+
+    regs = robot.bindings
+    slots = len(regs)
+    regs.extend(code.registers)
+
+    sink = robot.sink
+    listening = sink.listening
+    grid_east = robot.grid_east
+    grid_north = robot.grid_north
+
+    position = robot.position
+    east = position["east"]
+    north = position["north"]
+    heading = robot.heading
+    ticks = robot.ticks
+
+    pc = 0
+    end = len(instructions)
+
+    try:
+        while pc < end:
+            op, a, b, c = instructions[pc]
+            pc += 1
+
+            if op == STEP:
+                n = regs[a]
+
+                if heading == 0:
+                    if east + n > grid_east:
+                        overstep(robot, n, east, north, heading)
+                    east += n
+                elif heading == 1:
+                    if north - n < 0:
+                        overstep(robot, n, east, north, heading)
+                    north -= n
+                elif heading == 2:
+                    if east - n < 0:
+                        overstep(robot, n, east, north, heading)
+                    east -= n
+                else:
+                    if north + n > grid_north:
+                        overstep(robot, n, east, north, heading)
+                    north += n
+
+                if listening:
+                    position["east"] = east
+                    position["north"] = north
+                    sink.step(robot, n, east, north, orientations[heading])
+            elif op == TURN_CW or op == TURN_CCW:
+                heading = (heading + (1 if op == TURN_CW else -1)) % 4
+
+                if listening:
+                    robot.heading = heading
+                    sink.turn(robot, orientations[heading])
+            elif op == JUMP_LT or op == JUMP_GT or op == JUMP_EQ\
+                    or op == JUMP_IF_TRUE:
+                if op == JUMP_LT:
+                    jump = regs[b] < regs[c]
+                elif op == JUMP_GT:
+                    jump = regs[b] > regs[c]
+                elif op == JUMP_EQ:
+                    jump = regs[b] == regs[c]
+                else:
+                    jump = regs[b]
+
+                if jump:
+                    # Jumping back starts another iteration, like TICK.
+                    pc = a
+                    ticks -= 1
+                    if not ticks:
+                        position["east"] = east
+                        position["north"] = north
+                        robot.heading = heading
+                        ticks = robot.limits.check(robot)
+            elif op == INC:
+                regs[a] += 1
+            elif op == DEC:
+                regs[a] -= 1
+            elif op == ADD:
+                regs[a] = regs[b] + regs[c]
+            elif op == SUB:
+                regs[a] = regs[b] - regs[c]
+            elif op == MUL:
+                regs[a] = regs[b] * regs[c]
+            elif op == LT:
+                regs[a] = (regs[b] < regs[c])*1
+            elif op == GT:
+                regs[a] = (regs[b] > regs[c])*1
+            elif op == EQ:
+                regs[a] = (regs[b] == regs[c])*1
+            elif op == COPY:
+                regs[a] = regs[b]
+            elif op == TICK:
+                ticks -= 1
+                if not ticks:
+                    position["east"] = east
+                    position["north"] = north
+                    robot.heading = heading
+                    ticks = robot.limits.check(robot)
+            elif op == MOVE:
+                n = regs[a]
+
+                if heading == 0:
+                    east += n
+                elif heading == 1:
+                    north -= n
+                elif heading == 2:
+                    east -= n
+                else:
+                    north += n
+
+                if listening:
+                    position["east"] = east
+                    position["north"] = north
+                    sink.step(robot, n, east, north, orientations[heading])
+            elif op == START:
+                east = regs[a]
+                north = regs[b]
+
+                if listening:
+                    position["east"] = east
+                    position["north"] = north
+                    sink.start(robot, east, north)
+            elif op == SUMMARY:
+                summary, target = code.summaries[a]
+
+                position["east"] = east
+                position["north"] = north
+                robot.heading = heading
+                robot.ticks = ticks
+
+                try:
+                    if summary.run(robot):
+                        pc = target
+                finally:
+                    # The summary may stop at a limit with the robot moved.
+                    east = position["east"]
+                    north = position["north"]
+                    heading = robot.heading
+                    ticks = robot.ticks
+            elif op == STOP:
+                if listening:
+                    position["east"] = east
+                    position["north"] = north
+                    robot.heading = heading
+                    sink.stop(robot, east, north)
+            else:
+                raise Exception(f"Unknown opcode {op} at {pc - 1}")
+    finally:
+        del regs[slots:]
+        position["east"] = east
+        position["north"] = north
+        robot.heading = heading
+        robot.ticks = ticks
@@ -0,0 +1,411 @@
+from __future__ import annotations
+import hashlib
+import marshal
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from robol_lang.codegen import CACHE_DIR
+from robol_lang.enums import Assign, BinaryOp, Direction
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.parser import parse
+from robol_lang.robol import Program, Robot, Grid, Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+from robol_lang.tokenizer import tokenize
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Robol
+
+
+# The magic string and version that every cached program starts with.
+AST_MAGIC = b"ROBOLAST\x01"
+
+# The kinds of node in the encoding. Every node is two ints, its kind and
+# an argument, and the nodes are in post-order, so that the children of a
+# node come right before it.
+_NUMBER = 1
+_IDENTIFIER = 2
+_ARITHMETIC = 3
+_BOOL = 4
+_BINDING = 5
+_START = 6
+_INC = 7
+_DEC = 8
+_LOOP = 9
+_STOP = 10
+_TURN = 11
+_STEP = 12
+_GRID = 13
+
+_OPS = list(BinaryOp)
+_DIRECTIONS = list(Direction)
+
+
+def source_hash(source: bytes) -> bytes:
+    """ Hashes the source of a program.
+
+    Args:
+        source (bytes): The source.
+
+    Returns:
+        The 32 byte hash.
+    """
+
+    return hashlib.blake2b(source, digest_size=32).digest()
+
+
+def encode(grid: Grid, interpretables: List) -> bytes:
+    """ Writes the nodes of a program in a compact binary format.
+
+    The nodes are walked with an explicit stack, so how deep the program is
+    nested does not matter.
+
+    Args:
+        grid (Grid): The grid of the program.
+
+        interpretables (List): The statements of the program.
+
+    Returns:
+        The encoded nodes, which decode reads back.
+    """
+
+    ops = array("i")
+    constants: Dict[int, int] = {}
+    names: Dict[str, int] = {}
+
+    def constant(value: int) -> int:
+        return constants.setdefault(value, len(constants))
+
+    def name(identifier: str) -> int:
+        return names.setdefault(identifier, len(names))
+
+    # Each entry is a node and whether its children have been written.
+    stack: List[Tuple[Robol, bool]] = [
+        (node, False) for node in reversed(interpretables)
+    ]
+    stack.append((grid, False))
+
+    while stack:
+        node, done = stack.pop()
+
+        if not done:
+            match node:
+                case ArithmeticExp():
+                    children = [node.left, node.right]
+                case BoolExp():
+                    children = [node.a_exp]
+                case Invariant():
+                    children = [node.exp]
+                case Binding() | Step():
+                    children = [node.exp]
+                case Start() | Grid():
+                    children = [node.east, node.north]
+                case Loop():
+                    children = [*node.interpretables, node.condition]
+                case _:
+                    children = []
+
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        match node:
+            case NumberExp():
+                ops.extend((_NUMBER, constant(node.val)))
+            case Identifier():
+                ops.extend((_IDENTIFIER, name(node.identifier)))
+            case ArithmeticExp():
+                ops.extend((_ARITHMETIC, _OPS.index(node.op)))
+            case BoolExp():
+                ops.extend((_BOOL, 0))
+            case Invariant():
+                # Invariant expressions are found again when it is linked.
+                pass
+            case Binding():
+                ops.extend((_BINDING, name(node.ident.identifier)))
+            case Start():
+                ops.extend((_START, 0))
+            case Assignment():
+                kind = _INC if node.assign is Assign.INC else _DEC
+                ops.extend((kind, name(node.identifier.identifier)))
+            case Loop():
+                ops.extend((_LOOP, len(node.interpretables)))
+            case Stop():
+                ops.extend((_STOP, 0))
+            case Turn():
+                ops.extend((_TURN, _DIRECTIONS.index(node.direction)))
+            case Step():
+                ops.extend((_STEP, 0))
+            case Grid():
+                ops.extend((_GRID, 0))
+            case _:
+                raise Exception(f"Cannot encode {type(node).__name__}")
+
+    return AST_MAGIC + marshal.dumps(
+        (ops.tobytes(), list(constants), list(names))
+    )
+
+
+def decode(data: bytes) -> Tuple[Grid, List]:
+    """ Reads nodes written by encode.
+
+    Args:
+        data (bytes): The encoded nodes.
+
+    Returns:
+        The grid and the statements of the program.
+    """
+
+    if not data.startswith(AST_MAGIC):
+        raise Exception("This is not a cached robol program")
+
+    raw, constants, names = marshal.loads(data[len(AST_MAGIC):])
+    ops = array("i")
+    ops.frombytes(raw)
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+
+    for i in range(0, len(ops), 2):
+        kind = ops[i]
+        argument = ops[i + 1]
+
+        if kind == _NUMBER:
+            push(NumberExp(constants[argument]))
+        elif kind == _IDENTIFIER:
+            push(Identifier(names[argument]))
+        elif kind == _ARITHMETIC:
+            right = pop()
+            push(ArithmeticExp(_OPS[argument], pop(), right))
+        elif kind == _BOOL:
+            push(BoolExp(pop()))
+        elif kind == _BINDING:
+            push(Binding(Identifier(names[argument]), pop()))
+        elif kind == _START:
+            north = pop()
+            push(Start(pop(), north))
+        elif kind == _INC:
+            push(Assignment(Identifier(names[argument]), Assign.INC))
+        elif kind == _DEC:
+            push(Assignment(Identifier(names[argument]), Assign.DEC))
+        elif kind == _LOOP:
+            loop = Loop()
+            loop.condition = pop()
+            if argument:
+                loop.interpretables = stack[-argument:]
+                del stack[-argument:]
+            push(loop)
+        elif kind == _STOP:
+            push(Stop())
+        elif kind == _TURN:
+            push(Turn(_DIRECTIONS[argument]))
+        elif kind == _STEP:
+            push(Step(pop()))
+        elif kind == _GRID:
+            north = pop()
+            push(Grid(pop(), north))
+        else:
+            raise Exception("The cached robol program is broken")
+
+    if not stack or type(stack[0]) is not Grid:
+        raise Exception("The cached robol program is broken")
+
+    return stack[0], stack[1:]
+
+
+class ProgramCache:
+    """ Class that keeps parsed programs, so they are not parsed again.
+
+    Programs are kept by a hash of their source, in memory, up to maxsize
+    of them, with the least recently used one dropped first. With persist,
+    they are also written to disk in the format of encode, so that a new
+    process can read them instead of parsing them. A file is only read and
+    hashed again when its mtime or size has changed since it was loaded,
+    and a file whose hash has changed is parsed again.
+
+    Every Program the cache gives out has a Robot of its own, but the nodes
+    are shared with every other Program of the same source. A Program that
+    is optimized, summarizes loops or hoists invariants does so on a copy
+    of the nodes of its own. The cache can be used from several threads at
+    once.
+
+    Attributes:
+        maxsize (int): How many programs to keep in memory.
+
+        persist (bool): Whether to write programs to disk, and read them
+        from disk when they are not in memory.
+
+        cache_dir (str): Where to write them. Defaults to a __robolcache__
+        directory next to each program.
+
+        hits (int): How many programs have been found in memory.
+
+        disk_hits (int): How many programs have been read from disk.
+
+        misses (int): How many programs have been parsed.
+
+        invalidations (int): How many files have changed since they were
+        loaded.
+    """
+
+    def __init__(self, maxsize: int = 128, persist: bool = False,
+                 cache_dir: str | os.PathLike = None) -> None:
+        """ Sets attributes."""
+
+        self.maxsize = maxsize
+        self.persist = persist
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._programs: OrderedDict[bytes, Tuple[Grid, List]] = OrderedDict()
+        self._files: Dict[str, Tuple[int, int, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """ Finds how many programs are kept in memory."""
+
+        return len(self._programs)
+
+    def clear(self) -> None:
+        """ Drops every program kept in memory, and resets the counters.
+
+        Returns:
+            None
+        """
+
+        with self._lock:
+            self._programs.clear()
+            self._files.clear()
+            self.hits = self.disk_hits = self.misses = self.invalidations = 0
+
+    def _program(self, nodes: Tuple[Grid, List]) -> Program:
+        """ Creates a Program with a new Robot from cached nodes."""
+
+        grid, interpretables = nodes
+        robot = Robot()
+        robot.interpretables = interpretables
+
+        return Program(grid, robot)
+
+    def _remember(self, digest: bytes, nodes: Tuple[Grid, List]) -> None:
+        """ Keeps nodes in memory, and drops the least recently used."""
+
+        with self._lock:
+            self._programs[digest] = nodes
+            self._programs.move_to_end(digest)
+
+            while len(self._programs) > self.maxsize:
+                self._programs.popitem(last=False)
+
+    def _lookup(self, digest: bytes) -> Tuple[Grid, List] | None:
+        """ Finds nodes in memory, and marks them as recently used."""
+
+        with self._lock:
+            nodes = self._programs.get(digest)
+            if nodes is not None:
+                self._programs.move_to_end(digest)
+                self.hits += 1
+
+        return nodes
+
+    def _disk_path(self, digest: bytes, path: str = None) -> str | None:
+        """ Finds where nodes are kept on disk, or None if they are not."""
+
+        if not self.persist:
+            return None
+
+        cache_dir = self.cache_dir
+        if cache_dir is None:
+            if path is None:
+                return None
+            cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR)
+
+        return os.path.join(cache_dir, digest.hex() + ".ast")
+
+    def _get(self, digest: bytes, source: bytes, path: str = None)\
+            -> Program:
+        """ Finds the nodes of a source in memory, on disk, or by parsing."""
+
+        nodes = self._lookup(digest)
+        if nodes is not None:
+            return self._program(nodes)
+
+        disk_path = self._disk_path(digest, path)
+
+        if disk_path is not None:
+            try:
+                with open(disk_path, "rb") as f:
+                    nodes = decode(f.read())
+                self.disk_hits += 1
+            except Exception:
+                nodes = None
+
+        if nodes is None:
+            program = parse(tokenize(source))
+            nodes = (program.grid, program.robot.interpretables)
+            self.misses += 1
+
+            if disk_path is not None:
+                try:
+                    os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                    tmp_path = f"{disk_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "wb") as f:
+                        f.write(encode(*nodes))
+                    os.replace(tmp_path, disk_path)
+                except OSError:
+                    pass
+
+        self._remember(digest, nodes)
+
+        return self._program(nodes)
+
+    def parse(self, source: str | bytes) -> Program:
+        """ Parses a source, unless it has been parsed before.
+
+        Args:
+            source (str | bytes): The source of the program.
+
+        Returns:
+            The Program.
+        """
+
+        if isinstance(source, str):
+            source = source.encode()
+
+        return self._get(source_hash(source), source)
+
+    def load(self, path: str | os.PathLike) -> Program:
+        """ Parses a file, unless it has been parsed since it last changed.
+
+        Args:
+            path (str | os.PathLike): The path to the program.
+
+        Returns:
+            The Program.
+        """
+
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        known = self._files.get(path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            nodes = self._lookup(known[2])
+            if nodes is not None:
+                return self._program(nodes)
+
+        with open(path, "rb") as f:
+            source = f.read()
+
+        digest = source_hash(source)
+
+        if known is not None and known[2] != digest:
+            self.invalidations += 1
+
+        self._files[path] = (stat.st_mtime_ns, stat.st_size, digest)
+
+        return self._get(digest, source, path)
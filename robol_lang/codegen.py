@@ -0,0 +1,408 @@
+from __future__ import annotations
+import hashlib
+import marshal
+import os
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+from typing import TYPE_CHECKING, Callable, List
+
+from robol_lang.compiler import compile_expression, overstep
+from robol_lang.enums import Assign, BinaryOp, Direction, ORIENTATIONS
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.optimizer import optimize as optimize_program
+from robol_lang.parser import parse
+from robol_lang.resolver import resolve
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+from robol_lang.tokenizer import tokenize
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program, Robot
+
+
+# Bump this whenever the generated code changes, so old caches are ignored.
+CODEGEN_VERSION = 7
+
+CACHE_DIR = "__robolcache__"
+
+_OPERATORS = {
+    BinaryOp.PLUS: "({} + {})",
+    BinaryOp.MINUS: "({} - {})",
+    BinaryOp.MULT: "({} * {})",
+    BinaryOp.LESS: "(({} < {})*1)",
+    BinaryOp.GREATER: "(({} > {})*1)",
+    BinaryOp.EQUALS: "(({} == {})*1)",
+}
+
+class _Generator:
+    """ Class that writes the Python source of a program.
+
+    The program has to be resolved first. The binding in slot n becomes the
+    local variable vn, and the resolver has already made sure that no
+    variable is read before it is bound.
+
+    Attributes:
+        lines (List): The lines of source written so far.
+    """
+
+    def __init__(self, variables: str = "") -> None:
+        """ Sets attributes."""
+
+        self.lines: List[str] = []
+        self._indent = 2
+        self._variables = variables
+
+    def _emit(self, line: str) -> None:
+        """ Adds a line at the current indentation."""
+
+        self.lines.append("    " * self._indent + line)
+
+    def _sync(self) -> None:
+        """ Writes the local variables back to the robot."""
+
+        self._emit("position['east'] = east")
+        self._emit("position['north'] = north")
+        self._emit("robot.heading = heading")
+        if self._variables:
+            self._emit(f"bindings[:] = {self._variables}")
+
+    def expression(self, exp: Expression) -> str:
+        """ Writes an expression as a Python expression.
+
+        Args:
+            exp (Expression): The expression.
+
+        Returns:
+            The Python source of the expression.
+        """
+
+        match exp:
+            case NumberExp():
+                return repr(exp.val)
+            case Identifier():
+                return f"v{exp.slot}"
+            case BoolExp():
+                return self.expression(exp.a_exp)
+            case Invariant():
+                return self.expression(exp.exp)
+            case ArithmeticExp():
+                template = _OPERATORS.get(exp.op)
+                if template is None:
+                    raise Exception("Something went wrong in ArithmeticExp.")
+
+                return template.format(
+                    self.expression(exp.left), self.expression(exp.right)
+                )
+
+        raise Exception(f"Cannot generate code for {type(exp).__name__}")
+
+    def statement(self, node: Robol, grid_east: int, grid_north: int)\
+            -> None:
+        """ Writes a statement, Binding or Start as Python statements.
+
+        Args:
+            node (Robol): The node.
+
+            grid_east (int): How far east the grid goes, or None if steps
+            are not checked against the grid.
+
+            grid_north (int): How far north the grid goes, or None.
+
+        Returns:
+            None
+        """
+
+        emit = self._emit
+
+        match node:
+            case Binding():
+                emit(f"v{node.ident.slot} = {self.expression(node.exp)}")
+            case Start():
+                emit(f"east = {self.expression(node.east)}")
+                emit(f"north = {self.expression(node.north)}")
+                emit("if listening:")
+                emit("    sink.start(robot, east, north)")
+            case Assignment():
+                match node.assign:
+                    case Assign.INC:
+                        op = "+"
+                    case Assign.DEC:
+                        op = "-"
+                    case _:
+                        raise Exception("Something went wrong in Assignment")
+
+                emit(f"v{node.identifier.slot} {op}= 1")
+            case Loop():
+                emit("while True:")
+                self._indent += 1
+                emit("ticks -= 1")
+                emit("if not ticks:")
+                self._indent += 1
+                self._sync()
+                emit("ticks = robot.limits.check(robot)")
+                self._indent -= 1
+                self.block(node.interpretables, grid_east, grid_north)
+                emit(f"if not {self.expression(node.condition)}:")
+                emit("    break")
+                self._indent -= 1
+            case Stop():
+                emit("if listening:")
+                emit("    sink.stop(robot, east, north)")
+            case Turn():
+                if node.direction is Direction.CLOCKWISE:
+                    emit("heading = (heading + 1) % 4")
+                else:
+                    emit("heading = (heading - 1) % 4")
+                emit("if listening:")
+                emit("    sink.turn(robot, ORIENTATIONS[heading])")
+            case Step() if grid_east is None:
+                emit(f"steps = {self.expression(node.exp)}")
+                emit("if heading == 0:")
+                emit("    east += steps")
+                emit("elif heading == 1:")
+                emit("    north -= steps")
+                emit("elif heading == 2:")
+                emit("    east -= steps")
+                emit("else:")
+                emit("    north += steps")
+                emit("if listening:")
+                emit("    sink.step(robot, steps, east, north, ORIENTATIONS[heading])")
+            case Step():
+                emit(f"steps = {self.expression(node.exp)}")
+                emit("if heading == 0:")
+                emit(f"    if east + steps > {grid_east}:")
+                emit("        overstep(robot, steps, east, north, heading)")
+                emit("    east += steps")
+                emit("elif heading == 1:")
+                emit("    if north - steps < 0:")
+                emit("        overstep(robot, steps, east, north, heading)")
+                emit("    north -= steps")
+                emit("elif heading == 2:")
+                emit("    if east - steps < 0:")
+                emit("        overstep(robot, steps, east, north, heading)")
+                emit("    east -= steps")
+                emit("else:")
+                emit(f"    if north + steps > {grid_north}:")
+                emit("        overstep(robot, steps, east, north, heading)")
+                emit("    north += steps")
+                emit("if listening:")
+                emit("    sink.step(robot, steps, east, north, ORIENTATIONS[heading])")
+            case _:
+                raise Exception(
+                    f"Cannot generate code for {type(node).__name__}"
+                )
+
+    def block(self, interpretables, grid_east: int, grid_north: int) -> None:
+        """ Writes a list of statements.
+
+        Args:
+            interpretables (List): The statements.
+
+            grid_east (int): How far east the grid goes, or None if steps
+            are not checked against the grid.
+
+            grid_north (int): How far north the grid goes, or None.
+
+        Returns:
+            None
+        """
+
+        if not interpretables:
+            self._emit("pass")
+
+        for interpretable in interpretables:
+            self.statement(interpretable, grid_east, grid_north)
+
+
+def generate_source(program: Program, checked: bool = True) -> str:
+    """ Writes a program as the source of a Python function called run.
+
+    The function takes a robot, keeps the position, orientation and bindings
+    in local variables while it runs, and writes them back to the robot when
+    it returns or raises. Loops become while loops, and the grid becomes
+    constants in the bounds checks, which are also given to the robot so
+    that a sink can see how large the grid is. Whether the sink of the robot
+    is listening is looked up once, so events cost nothing when it is not.
+    The locals are also written back before the limits of the run are
+    checked, so that a RunAborted reports the state of the robot. The
+    program is resolved first, so that every identifier has a slot.
+
+    Args:
+        program (Program): The program.
+
+        checked (bool): Whether every Step checks that the robot stays
+        inside the grid. Only a program that has been proven to stay inside
+        it should be generated without the checks.
+
+    Returns:
+        The Python source.
+    """
+
+    names = resolve(program)
+    variables = "".join(f"v{slot}, " for slot in range(len(names)))
+
+    grid_east = compile_expression(program.grid.east)([])
+    grid_north = compile_expression(program.grid.north)([])
+
+    gen = _Generator(variables)
+    if checked:
+        gen.block(program.robot.interpretables, grid_east, grid_north)
+    else:
+        gen.block(program.robot.interpretables, None, None)
+
+    prologue = [
+        "def run(robot):",
+        f"    robot.names = {names!r}",
+        f"    robot.bindings = bindings = [None] * {len(names)}",
+        f"    robot.grid_east = {grid_east}",
+        f"    robot.grid_north = {grid_north}",
+        f"    {variables}= bindings" if names else "    pass",
+        "    position = robot.position",
+        "    east = position['east']",
+        "    north = position['north']",
+        "    heading = robot.heading",
+        "    sink = robot.sink",
+        "    listening = sink.listening",
+        "    ticks = robot.ticks",
+        "    try:",
+    ]
+    epilogue = [
+        "    finally:",
+        "        position['east'] = east",
+        "        position['north'] = north",
+        "        robot.heading = heading",
+        "        robot.ticks = ticks",
+        f"        bindings[:] = {variables}" if names else "        pass",
+    ]
+
+    return "\n".join(prologue + gen.lines + epilogue) + "\n"
+
+
+def compile_to_code(program: Program, filename: str = "<robol>",
+                    checked: bool = True) -> CodeType:
+    """ Compiles a program to a Python code object.
+
+    Args:
+        program (Program): The program.
+
+        filename (str): The file name to show in tracebacks.
+
+        checked (bool): Whether every Step checks that the robot stays
+        inside the grid.
+
+    Returns:
+        The code object of a module that defines the function run.
+    """
+
+    source = generate_source(program, checked)
+
+    try:
+        return compile(source, filename, "exec")
+    except SyntaxError as e:
+        raise Exception(
+            "The program is nested too deeply for the python engine"
+        ) from e
+
+
+def load_function(code: CodeType) -> Callable[[Robot], None]:
+    """ Loads the function run from a code object.
+
+    Args:
+        code (CodeType): A code object from compile_to_code().
+
+    Returns:
+        A function that takes a robot and runs the program on it.
+    """
+
+    namespace = {
+        "ORIENTATIONS": ORIENTATIONS,
+        "overstep": overstep,
+    }
+    exec(code, namespace)
+
+    return namespace["run"]
+
+
+def cache_key(source: bytes, optimize: bool = False) -> str:
+    """ Creates the cache key of a robol program.
+
+    The key includes the Python version and the version of the code
+    generator, because code objects can only be loaded by the Python version
+    that made them.
+
+    Args:
+        source (bytes): The source of the program.
+
+        optimize (bool): Whether the program is optimized before it is
+        compiled.
+
+    Returns:
+        The key as a hex string.
+    """
+
+    h = hashlib.sha256(MAGIC_NUMBER)
+    h.update(CODEGEN_VERSION.to_bytes(4, "little"))
+    h.update(b"O" if optimize else b"-")
+    h.update(source)
+
+    return h.hexdigest()
+
+
+def load_file(path: str | os.PathLike, cache_dir: str | os.PathLike = None,
+              use_cache: bool = True, optimize: bool = False)\
+        -> Callable[[Robot], None]:
+    """ Loads a robol program from a file as a Python function.
+
+    The code object of the program is cached on disk, keyed by a hash of the
+    source. When the same source is loaded again, the code object is read
+    from the cache, and the program is neither tokenized nor parsed.
+
+    Args:
+        path (str | os.PathLike): The path to the robol program.
+
+        cache_dir (str | os.PathLike): Where to keep the cache. Defaults to
+        a __robolcache__ directory next to the program.
+
+        use_cache (bool): Whether to read from and write to the cache.
+
+        optimize (bool): Whether to optimize the program before it is
+        compiled.
+
+    Returns:
+        A function that takes a robot and runs the program on it.
+    """
+
+    with open(path, "rb") as f:
+        source = f.read()
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.fspath(path)), CACHE_DIR)
+    cache_path = os.path.join(cache_dir, cache_key(source, optimize) + ".bin")
+
+    code = None
+
+    if use_cache:
+        try:
+            with open(cache_path, "rb") as f:
+                code = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            code = None
+
+    if not isinstance(code, CodeType):
+        program = parse(tokenize(source))
+        if optimize:
+            optimize_program(program)
+        code = compile_to_code(program, os.fspath(path))
+
+        if use_cache:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    marshal.dump(code, f)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                pass
+
+    return load_function(code)
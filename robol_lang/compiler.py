@@ -0,0 +1,357 @@
+from __future__ import annotations
+from operator import itemgetter
+from typing import TYPE_CHECKING, Callable, List
+
+from robol_lang.enums import Assign, BinaryOp, Direction, ORIENTATIONS, UNITS
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.resolver import resolve
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program, Robot
+
+
+# One factory per combination of operands, in the order:
+# (identifier, number), (number, identifier), (identifier, identifier), and
+# (expression, expression) for everything else.
+_ARITHMETIC = {
+    BinaryOp.PLUS: (
+        lambda a, b: lambda env: env[a] + b,
+        lambda a, b: lambda env: a + env[b],
+        lambda a, b: lambda env: env[a] + env[b],
+        lambda a, b: lambda env: a(env) + b(env),
+    ),
+    BinaryOp.MINUS: (
+        lambda a, b: lambda env: env[a] - b,
+        lambda a, b: lambda env: a - env[b],
+        lambda a, b: lambda env: env[a] - env[b],
+        lambda a, b: lambda env: a(env) - b(env),
+    ),
+    BinaryOp.MULT: (
+        lambda a, b: lambda env: env[a] * b,
+        lambda a, b: lambda env: a * env[b],
+        lambda a, b: lambda env: env[a] * env[b],
+        lambda a, b: lambda env: a(env) * b(env),
+    ),
+    BinaryOp.LESS: (
+        lambda a, b: lambda env: (env[a] < b)*1,
+        lambda a, b: lambda env: (a < env[b])*1,
+        lambda a, b: lambda env: (env[a] < env[b])*1,
+        lambda a, b: lambda env: (a(env) < b(env))*1,
+    ),
+    BinaryOp.GREATER: (
+        lambda a, b: lambda env: (env[a] > b)*1,
+        lambda a, b: lambda env: (a > env[b])*1,
+        lambda a, b: lambda env: (env[a] > env[b])*1,
+        lambda a, b: lambda env: (a(env) > b(env))*1,
+    ),
+    BinaryOp.EQUALS: (
+        lambda a, b: lambda env: (env[a] == b)*1,
+        lambda a, b: lambda env: (a == env[b])*1,
+        lambda a, b: lambda env: (env[a] == env[b])*1,
+        lambda a, b: lambda env: (a(env) == b(env))*1,
+    ),
+}
+
+OVERSTEP = "The bounds of the grid have been overstepped"
+
+
+def overstep(robot: Robot, steps: int, east: int, north: int, heading: int)\
+        -> None:
+    """ Tells the sink of the robot about steps that would overstep the
+    grid, and raises the exception of the overstep.
+
+    Args:
+        robot (Robot): The robot, which has not moved.
+
+        steps (int): The number of steps.
+
+        east (int): How far east the robot is.
+
+        north (int): How far north the robot is.
+
+        heading (int): The heading of the robot.
+
+    Returns:
+        Nothing, as it always raises.
+    """
+
+    if robot.sink.listening:
+        robot.sink.overstep(robot, steps, east, north, ORIENTATIONS[heading])
+
+    raise Exception(OVERSTEP)
+
+
+def compile_expression(exp: Expression) -> Callable[[List], int]:
+    """ Compiles an expression to a closure.
+
+    The closure takes the bindings of a robot and returns the value of the
+    expression directly, instead of pushing it to the stack of the robot.
+    Identifiers are read from their slots, so the program has to be resolved
+    first.
+
+    Args:
+        exp (Expression): The expression to compile.
+
+    Returns:
+        A closure that evaluates the expression.
+    """
+
+    match exp:
+        case NumberExp():
+            val = exp.val
+            return lambda env: val
+        case Identifier():
+            return itemgetter(exp.slot)
+        case BoolExp():
+            a_exp = compile_expression(exp.a_exp)
+            return lambda env: a_exp(env) != 0
+        case Invariant():
+            return compile_expression(exp.exp)
+        case ArithmeticExp():
+            factories = _ARITHMETIC.get(exp.op)
+            if factories is None:
+                raise Exception("Something went wrong in ArithmeticExp.")
+
+            left, right = exp.left, exp.right
+            left_type, right_type = type(left), type(right)
+
+            if left_type is NumberExp and right_type is NumberExp:
+                val = factories[3](
+                    compile_expression(left), compile_expression(right)
+                )(None)
+                return lambda env: val
+            if left_type is Identifier and right_type is NumberExp:
+                return factories[0](left.slot, right.val)
+            if left_type is NumberExp and right_type is Identifier:
+                return factories[1](left.val, right.slot)
+            if left_type is Identifier and right_type is Identifier:
+                return factories[2](left.slot, right.slot)
+
+            return factories[3](
+                compile_expression(left), compile_expression(right)
+            )
+
+    raise Exception(f"Cannot compile {type(exp).__name__}")
+
+
+def _compile_step(exp: Expression, grid_east: int, grid_north: int)\
+        -> Callable[[Robot], None]:
+    """ Compiles a Step with the bounds of the grid baked in.
+
+    Args:
+        exp (Expression): The number of steps to take.
+
+        grid_east (int): How far east the grid goes, or None if the step is
+        not checked against the grid.
+
+        grid_north (int): How far north the grid goes, or None.
+
+    Returns:
+        A closure that moves the robot.
+    """
+
+    exp = compile_expression(exp)
+
+    if grid_east is None:
+        def move(robot: Robot) -> None:
+            n = exp(robot.bindings)
+            heading = robot.heading
+            dx, dy = UNITS[heading]
+            position = robot.position
+            position["east"] += dx * n
+            position["north"] += dy * n
+
+            if robot.sink.listening:
+                robot.sink.step(
+                    robot, n, position["east"], position["north"],
+                    ORIENTATIONS[heading]
+                )
+
+        return move
+
+    edges = (grid_east, 0, 0, grid_north)
+
+    def step(robot: Robot) -> None:
+        n = exp(robot.bindings)
+        heading = robot.heading
+        dx, dy = UNITS[heading]
+        position = robot.position
+        east = position["east"]
+        north = position["north"]
+
+        if dx * east + dy * north + n > edges[heading]:
+            overstep(robot, n, east, north, heading)
+
+        position["east"] = east + dx * n
+        position["north"] = north + dy * n
+
+        if robot.sink.listening:
+            robot.sink.step(
+                robot, n, position["east"], position["north"],
+                ORIENTATIONS[heading]
+            )
+
+    return step
+
+
+def _compile_block(interpretables, grid_east: int, grid_north: int)\
+        -> Callable[[Robot], None]:
+    """ Compiles a list of statements to a single closure.
+
+    Args:
+        interpretables (List): The statements to compile.
+
+        grid_east (int): How far east the grid goes, or None if steps are
+        not checked against the grid.
+
+        grid_north (int): How far north the grid goes, or None.
+
+    Returns:
+        A closure that runs the statements in order.
+    """
+
+    statements = tuple(
+        compile_statement(interpretable, grid_east, grid_north)
+        for interpretable in interpretables
+    )
+
+    if len(statements) == 1:
+        return statements[0]
+
+    def block(robot: Robot) -> None:
+        for statement in statements:
+            statement(robot)
+
+    return block
+
+
+def compile_statement(node: Robol, grid_east: int, grid_north: int)\
+        -> Callable[[Robot], None]:
+    """ Compiles a statement, Binding or Start to a closure.
+
+    Args:
+        node (Robol): The node to compile.
+
+        grid_east (int): How far east the grid goes, or None if steps are
+        not checked against the grid.
+
+        grid_north (int): How far north the grid goes, or None.
+
+    Returns:
+        A closure that takes a robot and runs the node on it.
+    """
+
+    match node:
+        case Binding():
+            slot = node.ident.slot
+            exp = compile_expression(node.exp)
+
+            def binding(robot: Robot) -> None:
+                robot.bindings[slot] = exp(robot.bindings)
+
+            return binding
+        case Start():
+            east = compile_expression(node.east)
+            north = compile_expression(node.north)
+
+            def start(robot: Robot) -> None:
+                robot.position["east"] = east(robot.bindings)
+                robot.position["north"] = north(robot.bindings)
+                if robot.sink.listening:
+                    robot.sink.start(
+                        robot, robot.position["east"], robot.position["north"]
+                    )
+
+            return start
+        case Assignment():
+            slot = node.identifier.slot
+            match node.assign:
+                case Assign.INC:
+                    delta = 1
+                case Assign.DEC:
+                    delta = -1
+                case _:
+                    raise Exception("Something went wrong in Assignment")
+
+            def assignment(robot: Robot) -> None:
+                robot.bindings[slot] += delta
+
+            return assignment
+        case Loop():
+            body = _compile_block(node.interpretables, grid_east, grid_north)
+            condition = compile_expression(node.condition.a_exp)
+            summary = node.summary
+
+            def loop(robot: Robot) -> None:
+                if summary is not None and summary.run(robot):
+                    return
+
+                env = robot.bindings
+                while True:
+                    robot.ticks -= 1
+                    if not robot.ticks:
+                        robot.ticks = robot.limits.check(robot)
+
+                    body(robot)
+                    if not condition(env):
+                        break
+
+            return loop
+        case Stop():
+            def stop(robot: Robot) -> None:
+                if robot.sink.listening:
+                    robot.sink.stop(
+                        robot, robot.position["east"], robot.position["north"]
+                    )
+
+            return stop
+        case Turn():
+            delta = 1 if node.direction is Direction.CLOCKWISE else -1
+
+            def turn(robot: Robot) -> None:
+                robot.heading = (robot.heading + delta) % 4
+                if robot.sink.listening:
+                    robot.sink.turn(robot, ORIENTATIONS[robot.heading])
+
+            return turn
+        case Step():
+            return _compile_step(node.exp, grid_east, grid_north)
+
+    raise Exception(f"Cannot compile {type(node).__name__}")
+
+
+def compile_program(program: Program, checked: bool = True)\
+        -> Callable[[Robot], None]:
+    """ Compiles a program to a tree of closures.
+
+    The program is resolved first, so that every identifier has a slot. The
+    grid only consists of numbers, so its bounds are evaluated once here and
+    baked into every compiled Step.
+
+    Args:
+        program (Program): The program to compile.
+
+        checked (bool): Whether every Step checks that the robot stays
+        inside the grid. Only a program that has been proven to stay inside
+        it should be compiled without the checks.
+
+    Returns:
+        A closure that takes a robot and runs the program on it.
+    """
+
+    resolve(program)
+
+    grid_east = grid_north = None
+    if checked:
+        grid_east = compile_expression(program.grid.east)([])
+        grid_north = compile_expression(program.grid.north)([])
+
+    body = _compile_block(program.robot.interpretables, grid_east, grid_north)
+
+    def run(robot: Robot) -> None:
+        body(robot)
+
+    return run
@@ -0,0 +1,449 @@
+from __future__ import annotations
+import heapq
+import os
+import struct
+import zlib
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING, Dict, Iterator, List, Tuple
+
+from robol_lang.enums import UNITS
+from robol_lang.sinks import Sink
+
+if TYPE_CHECKING:
+    from robol_lang.enums import Orientation
+    from robol_lang.robol import Robot
+
+
+# The first bytes of every PNG file.
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+Runs = Dict[int, List[Tuple[int, int]]]
+
+
+def _merge(intervals: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """ Merges intervals of cells that overlap or touch."""
+
+    intervals.sort()
+    merged = [intervals[0]]
+
+    for lo, hi in intervals[1:]:
+        last_lo, last_hi = merged[-1]
+        if lo <= last_hi + 1:
+            if hi > last_hi:
+                merged[-1] = (last_lo, hi)
+        else:
+            merged.append((lo, hi))
+
+    return merged
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    """ Packs a chunk of a PNG file."""
+
+    crc = zlib.crc32(data, zlib.crc32(kind))
+
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+
+class Coverage(Sink):
+    """ Class that records which cells of the grid a robot has visited.
+
+    A step is recorded as a single run of the cells the robot entered,
+    however many steps it took, so the coverage never holds anything per
+    cell. A step east or west is a run in the row the robot is in, and a
+    step north or south is a run in its column. Runs are counted by where
+    they are, so a loop that walks the same path over and over only adds to
+    the count of each of its runs. The cell a robot starts in is visited as
+    well, and a cell is visited once every time the robot enters it.
+
+    Everything else is worked out from the runs when it is asked for: the
+    runs of each row and column are merged, and the cells that a row and a
+    column both cover are counted with a sweep over the rows, so the time
+    this takes depends on the number of runs and not on the size of the
+    grid. Cells outside the grid, which a robot can only reach by taking a
+    negative number of steps, are left out of the queries.
+
+    Attributes:
+        grid_east (int): How far east the grid goes, or None before the
+        robot has started.
+
+        grid_north (int): How far north the grid goes, or None.
+
+        rows (Dict): How many times each run has been walked east or west,
+        by the north of the run and the east of its first and last cell.
+
+        columns (Dict): How many times each run has been walked north or
+        south, by the east of the run and the north of its first and last
+        cell.
+    """
+
+    def __init__(self) -> None:
+        """ Sets attributes."""
+
+        self.grid_east: int = None
+        self.grid_north: int = None
+        self.rows: Dict[Tuple[int, int, int], int] = {}
+        self.columns: Dict[Tuple[int, int, int], int] = {}
+        self._merged: Tuple[Runs, Runs] = None
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Records the cell the robot starts in."""
+
+        self.grid_east = robot.grid_east
+        self.grid_north = robot.grid_north
+
+        key = (north, east, east)
+        self.rows[key] = self.rows.get(key, 0) + 1
+        self._merged = None
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Records the cells the robot entered, from the one after where
+        it was to where it is.
+        """
+
+        if not steps:
+            return
+
+        dx, dy = UNITS[orientation.value]
+
+        # The first cell entered is one step along from where the robot was,
+        # which is steps back from where it is.
+        back = steps - 1 if steps > 0 else steps + 1
+
+        if dy == 0:
+            first = east - dx * back
+            key = (north, first, east) if first <= east else (north, east, first)
+            self.rows[key] = self.rows.get(key, 0) + 1
+        else:
+            first = north - dy * back
+            key = (east, first, north) if first <= north else (east, north, first)
+            self.columns[key] = self.columns.get(key, 0) + 1
+
+        self._merged = None
+
+    def _clip(self, runs: Dict[Tuple[int, int, int], int], line_end: int,
+              cell_end: int) -> Runs:
+        """ Merges runs by the line they are in, without the cells outside
+        the grid.
+        """
+
+        lines: Runs = {}
+
+        for line, lo, hi in runs:
+            if line_end is not None:
+                if line < 0 or line > line_end:
+                    continue
+                lo = max(lo, 0)
+                hi = min(hi, cell_end)
+                if lo > hi:
+                    continue
+
+            lines.setdefault(line, []).append((lo, hi))
+
+        for line, intervals in lines.items():
+            lines[line] = _merge(intervals)
+
+        return lines
+
+    def _merge_runs(self) -> Tuple[Runs, Runs]:
+        """ Finds the merged runs of every row and column in the grid."""
+
+        if self._merged is None:
+            self._merged = (
+                self._clip(self.rows, self.grid_north, self.grid_east),
+                self._clip(self.columns, self.grid_east, self.grid_north),
+            )
+
+        return self._merged
+
+    @property
+    def visited(self) -> int:
+        """ How many cells of the grid have been visited."""
+
+        rows, columns = self._merge_runs()
+
+        count = sum(hi - lo + 1 for runs in rows.values() for lo, hi in runs)
+        count += sum(
+            hi - lo + 1 for runs in columns.values() for lo, hi in runs
+        )
+
+        if not rows or not columns:
+            return count
+
+        # Subtract the cells that both a row and a column cover. The sweep
+        # goes up the rows, with a Fenwick tree of the columns that cover
+        # the current row.
+        easts = sorted(columns)
+        index = {east: i + 1 for i, east in enumerate(easts)}
+        events = []
+
+        for east, runs in columns.items():
+            for lo, hi in runs:
+                events.append((lo, 0, index[east], 1))
+                events.append((hi + 1, 0, index[east], -1))
+
+        for north, runs in rows.items():
+            for lo, hi in runs:
+                events.append((north, 1, lo, hi))
+
+        events.sort()
+        tree = [0] * (len(easts) + 1)
+
+        def prefix(i: int) -> int:
+            total = 0
+            while i > 0:
+                total += tree[i]
+                i -= i & -i
+            return total
+
+        for _, kind, a, b in events:
+            if kind == 0:
+                while a < len(tree):
+                    tree[a] += b
+                    a += a & -a
+            else:
+                count -= prefix(bisect_right(easts, b))\
+                    - prefix(bisect_left(easts, a))
+
+        return count
+
+    @property
+    def cells(self) -> int:
+        """ How many cells the grid has, as the robot can stand on both
+        edges of it.
+        """
+
+        if self.grid_east is None:
+            return 0
+
+        return (self.grid_east + 1) * (self.grid_north + 1)
+
+    @property
+    def coverage(self) -> float:
+        """ The fraction of the cells of the grid that have been visited."""
+
+        if not self.cells:
+            return 0.0
+
+        return self.visited / self.cells
+
+    @property
+    def total(self) -> int:
+        """ How many times the robot has entered a cell, counting a cell
+        that is entered more than once every time.
+        """
+
+        return sum(
+            (hi - lo + 1) * count
+            for runs in (self.rows, self.columns)
+            for (_, lo, hi), count in runs.items()
+        )
+
+    def visits(self, east: int, north: int) -> int:
+        """ Finds how many times the robot has entered a cell.
+
+        Args:
+            east (int): How far east the cell is.
+
+            north (int): How far north the cell is.
+
+        Returns:
+            The number of visits.
+        """
+
+        count = 0
+
+        for (line, lo, hi), n in self.rows.items():
+            if line == north and lo <= east <= hi:
+                count += n
+
+        for (line, lo, hi), n in self.columns.items():
+            if line == east and lo <= north <= hi:
+                count += n
+
+        return count
+
+    def bounding_box(self) -> Tuple[int, int, int, int] | None:
+        """ Finds the smallest box that holds every visited cell.
+
+        Returns:
+            The east and north of the south west corner and of the north
+            east corner, or None if no cell has been visited.
+        """
+
+        rows, columns = self._merge_runs()
+
+        if not rows and not columns:
+            return None
+
+        easts = [runs[0][0] for runs in rows.values()]
+        easts += [runs[-1][1] for runs in rows.values()]
+        easts += list(columns)
+        norths = list(rows)
+        norths += [runs[0][0] for runs in columns.values()]
+        norths += [runs[-1][1] for runs in columns.values()]
+
+        return min(easts), min(norths), max(easts), max(norths)
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        """ Iterates over the east and north of every visited cell, one row
+        at a time from the south, and from the west within a row.
+        """
+
+        rows, columns = self._merge_runs()
+
+        # Column runs by where they start, and the columns that cover the
+        # current row, by where they end.
+        starts = sorted(
+            (lo, hi, east)
+            for east, runs in columns.items()
+            for lo, hi in runs
+        )
+        norths = sorted(rows)
+        active: List[Tuple[int, int]] = []
+        i = j = 0
+
+        while i < len(starts) or j < len(norths) or active:
+            if active:
+                north = north + 1
+            else:
+                north = min(
+                    starts[i][0] if i < len(starts) else norths[j],
+                    norths[j] if j < len(norths) else starts[i][0],
+                )
+
+            while active and active[0][0] < north:
+                heapq.heappop(active)
+            while i < len(starts) and starts[i][0] == north:
+                heapq.heappush(active, (starts[i][1], starts[i][2]))
+                i += 1
+
+            intervals = [(east, east) for _, east in active]
+            if j < len(norths) and norths[j] == north:
+                intervals += rows[north]
+                j += 1
+
+            if not intervals:
+                continue
+
+            for lo, hi in _merge(intervals):
+                for east in range(lo, hi + 1):
+                    yield east, north
+
+    def raster(self, scale: int = 1, whole: bool = False)\
+            -> Tuple[int, int, bytearray]:
+        """ Draws the visited cells as an 8-bit grayscale image.
+
+        Every pixel is a square of scale by scale cells, and is 255 if any
+        of them has been visited and 0 otherwise. North is up. The runs are
+        drawn directly, so drawing takes time in proportion to the pixels
+        the runs cover, however many cells they hold.
+
+        Args:
+            scale (int): How many cells wide and high a pixel is.
+
+            whole (bool): Whether to draw the whole grid, or only the
+            bounding box of the visited cells.
+
+        Returns:
+            The width, the height, and the pixels, one row after another
+            from the north.
+        """
+
+        if whole and self.grid_east is not None:
+            box = (0, 0, self.grid_east, self.grid_north)
+        else:
+            box = self.bounding_box() or (0, 0, 0, 0)
+
+        west, south, east, north = box
+        width = (east - west) // scale + 1
+        height = (north - south) // scale + 1
+        pixels = bytearray(width * height)
+        rows, columns = self._merge_runs()
+
+        for line, runs in rows.items():
+            if not south <= line <= north:
+                continue
+            offset = (north - line) // scale * width
+            for lo, hi in runs:
+                lo = max(lo, west)
+                hi = min(hi, east)
+                if lo <= hi:
+                    a = offset + (lo - west) // scale
+                    b = offset + (hi - west) // scale + 1
+                    pixels[a:b] = b"\xff" * (b - a)
+
+        for line, runs in columns.items():
+            if not west <= line <= east:
+                continue
+            x = (line - west) // scale
+            for lo, hi in runs:
+                lo = max(lo, south)
+                hi = min(hi, north)
+                if lo <= hi:
+                    top = (north - hi) // scale
+                    bottom = (north - lo) // scale + 1
+                    pixels[top * width + x:bottom * width:width] =\
+                        b"\xff" * (bottom - top)
+
+        return width, height, pixels
+
+    def save_pgm(self, path: str | os.PathLike, scale: int = 1,
+                 whole: bool = False) -> None:
+        """ Writes the raster of the visited cells as a binary PGM image.
+
+        Args:
+            path (str | os.PathLike): Where to write the image.
+
+            scale (int): How many cells wide and high a pixel is.
+
+            whole (bool): Whether to draw the whole grid, or only the
+            bounding box of the visited cells.
+
+        Returns:
+            None
+        """
+
+        width, height, pixels = self.raster(scale, whole)
+
+        with open(path, "wb") as f:
+            f.write(f"P5\n{width} {height}\n255\n".encode("ascii"))
+            f.write(pixels)
+
+    def save_png(self, path: str | os.PathLike, scale: int = 1,
+                 whole: bool = False) -> None:
+        """ Writes the raster of the visited cells as a PNG image.
+
+        The image is written without any imaging library.
+
+        Args:
+            path (str | os.PathLike): Where to write the image.
+
+            scale (int): How many cells wide and high a pixel is.
+
+            whole (bool): Whether to draw the whole grid, or only the
+            bounding box of the visited cells.
+
+        Returns:
+            None
+        """
+
+        width, height, pixels = self.raster(scale, whole)
+
+        # Every row starts with the filter it uses, which is none.
+        compressor = zlib.compressobj(9)
+        data = bytearray()
+        for y in range(height):
+            data += compressor.compress(b"\x00")
+            data += compressor.compress(pixels[y * width:(y + 1) * width])
+        data += compressor.flush()
+
+        # 8-bit grayscale, without interlacing.
+        header = struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)
+
+        with open(path, "wb") as f:
+            f.write(_PNG_SIGNATURE)
+            f.write(_png_chunk(b"IHDR", header))
+            f.write(_png_chunk(b"IDAT", bytes(data)))
+            f.write(_png_chunk(b"IEND", b""))
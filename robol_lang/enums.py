@@ -39,8 +39,85 @@ class Orientation(Enum):
     NORTH = 3
 
     def succ(self):
-        return Orientation((self.value + 1) % 4)
+        return ORIENTATIONS[(self.value + 1) % 4]
 
     def pred(self):
-        return Orientation((self.value - 1) % 4)
+        return ORIENTATIONS[(self.value - 1) % 4]
 
+
+# Every Orientation by its value, which is the heading the robot keeps, so
+# the Orientation of a heading is found without calling Orientation.
+ORIENTATIONS = tuple(Orientation)
+
+# How far east and north one step takes the robot in each heading.
+UNITS = ((1, 0), (0, -1), (-1, 0), (0, 1))
+
+@unique
+class TokenKind(Enum):
+    """ Signifies what kind of token the tokenizer has found."""
+
+    KEYWORD = 1
+    NUMBER = 2
+    IDENTIFIER = 3
+    OPERATOR = 4
+    ASSIGNMENT = 5
+    LBRACE = 6
+    RBRACE = 7
+    GROUP = 8
+
+
+@unique
+class Engine(Enum):
+    """ Signifies which engine a Program should be run with."""
+
+    TREE = 1
+    CLOSURE = 2
+    PYTHON = 3
+    BYTECODE = 4
+
+
+@unique
+class Verdict(Enum):
+    """ Signifies what the bounds of a program have been proven to be."""
+
+    IN_BOUNDS = 1
+    OUT_OF_BOUNDS = 2
+    UNKNOWN = 3
+
+
+@unique
+class EventKind(Enum):
+    """ Signifies which statement an Event was made by."""
+
+    START = 1
+    STEP = 2
+    TURN = 3
+    STOP = 4
+    OVERSTEP = 5
+
+
+@unique
+class Opcode(Enum):
+    """ Signifies an instruction of the bytecode engine."""
+
+    COPY = 1
+    ADD = 2
+    SUB = 3
+    MUL = 4
+    LT = 5
+    GT = 6
+    EQ = 7
+    START = 8
+    STEP = 9
+    MOVE = 10
+    TURN_CW = 11
+    TURN_CCW = 12
+    INC = 13
+    DEC = 14
+    TICK = 15
+    SUMMARY = 16
+    JUMP_IF_TRUE = 17
+    JUMP_LT = 18
+    JUMP_GT = 19
+    JUMP_EQ = 20
+    STOP = 21
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from abc import abstractmethod
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, FrozenSet
 
 from robol_lang.interfaces import Expression
 from robol_lang.enums import BinaryOp
@@ -23,46 +23,34 @@ class ArithmeticExp(Expression):
         right (Expression): The right side of the expression.
     """
 
+    __slots__ = ("op", "left", "right")
+
     def __init__(self, op: BinaryOp, left: Expression, right: Expression)\
             -> None:
-        """ Sets attributes and references."""
+        """ Sets attributes."""
 
         self.op = op
         self.left = left
         self.right = right
-        self.robot: Robot = None
-
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to left and right expressions.
-        
-        Returns:
-            None
-        """
-   
-        self.left.robot = self.robot
-        self.right.robot = self.robot
 
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Interprets left and right and evaluates the expression.
 
         After interpreting the left and right expression, the method matches
         the binary operation and performs it with left and right.
 
+        Args:
+            robot (Robot): The robot that runs the expression.
+
         Returns:
             None
         """
 
-        self._add_references()
-
-        self.left.interpret()
-        left = self.robot.stack.pop()
-        if type(self.left) is Identifier:
-            left = self.robot.bindings[left]
+        self.left.interpret(robot)
+        left = robot.stack.pop()
 
-        self.right.interpret()
-        right = self.robot.stack.pop()
-        if type(self.right) is Identifier:
-            right = self.robot.bindings[right]
+        self.right.interpret(robot)
+        right = robot.stack.pop()
 
         out = None
 
@@ -82,7 +70,7 @@ class ArithmeticExp(Expression):
             case _:
                 raise Exception("Something went wrong in ArithmeticExp.")
 
-        self.robot.stack.append(out)
+        robot.stack.append(out)
 
 
 class BoolExp(Expression):
@@ -92,40 +80,33 @@ class BoolExp(Expression):
         a_exp (ArithmeticExp): The arithmetic expression to evaluate.
     """
 
+    __slots__ = ("a_exp",)
+
     def __init__(self, a_exp: ArithmeticExp) -> None:
-        """ Sets attributes and references."""
+        """ Sets attributes."""
         self.a_exp = a_exp
-        self.robot: Robot = None
-
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to a_exp.
-        
-        Returns:
-            None
-        """
-   
-        self.a_exp.robot = self.robot
     
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Evaluates the expression to be true or false.
         
         If the arithmetic expression is 0, then the boolean expression is false,
         otherwise, it's true. It reminds me of how Scheme evaluates if something
         is true or false.
 
+        Args:
+            robot (Robot): The robot that runs the expression.
+
         Returns:
             None
         """ 
 
-        self._add_references()
-
-        self.a_exp.interpret()
-        ans = self.robot.stack.pop()
+        self.a_exp.interpret(robot)
+        ans = robot.stack.pop()
 
         if ans == 0:
-            self.robot.stack.append(False)
+            robot.stack.append(False)
         else:
-            self.robot.stack.append(True)
+            robot.stack.append(True)
 
 
 class NumberExp(Expression):
@@ -135,20 +116,24 @@ class NumberExp(Expression):
         val (int): The value of the number.
     """
 
+    __slots__ = ("val",)
+
     def __init__(self, val: int) -> None:
         """ Sets attribute."""
 
         self.val = int(val)
-        self.robot = None
 
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Appends the value to the stack of the robot.
 
+        Args:
+            robot (Robot): The robot that runs the expression.
+
         Returns:
             None
         """
 
-        self.robot.stack.append(self.val)
+        robot.stack.append(self.val)
 
 
 class Identifier(Expression):
@@ -156,20 +141,75 @@ class Identifier(Expression):
 
     Attributes:
         identifier (Identifier): The value of the identifier.
+
+        slot (int): The index of the binding in the bindings of the robot.
+        It is set when the program is resolved.
     """
 
+    __slots__ = ("identifier", "slot")
+
     def __init__(self, identifier: str) -> None:
         """ Sets Attribute."""
 
         self.identifier = identifier
-        self.robot = None
+        self.slot: int = None
 
-    def interpret(self) -> None:
-        """ Appends the value to the stack of the robot.
+    def interpret(self, robot: Robot) -> None:
+        """ Appends the bound value to the stack of the robot.
+
+        Args:
+            robot (Robot): The robot that runs the expression.
 
         Returns:
             None
         """
 
-        self.robot.stack.append(self.identifier)
+        robot.stack.append(robot.bindings[self.slot])
+
+
+class Invariant(Expression):
+    """ Class that remembers the value of an expression inside a loop.
+
+    The expression only reads identifiers that no statement of the loop
+    binds, increments or decrements, so its value is the same for as long
+    as the loop runs. It is evaluated the first time it is needed, and the
+    value is kept in the invariants of the robot until the loop starts
+    again. The value is kept in the robot instead of here, so the nodes are
+    not changed by a run.
+
+    Attributes:
+        exp (Expression): The expression.
 
+        slot (int): The index of the value in the invariants of the robot.
+
+        reads (FrozenSet): The identifiers the expression reads.
+    """
+
+    __slots__ = ("exp", "slot", "reads")
+
+    def __init__(self, exp: Expression, slot: int, reads: FrozenSet[str])\
+            -> None:
+        """ Sets attributes."""
+
+        self.exp = exp
+        self.slot = slot
+        self.reads = reads
+
+    def interpret(self, robot: Robot) -> None:
+        """ Appends the value of the expression to the stack of the robot,
+        and only evaluates it if the loop has started since it last was.
+
+        Args:
+            robot (Robot): The robot that runs the expression.
+
+        Returns:
+            None
+        """
+
+        val = robot.invariants[self.slot]
+
+        if val is None:
+            self.exp.interpret(robot)
+            robot.invariants[self.slot] = robot.stack[-1]
+        else:
+            robot.stack.append(val)
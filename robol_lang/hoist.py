@@ -0,0 +1,282 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, Set, Tuple
+
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+
+
+_NOTHING: FrozenSet[str] = frozenset()
+
+
+def reads(exp: Expression) -> FrozenSet[str]:
+    """ Finds the identifiers an expression reads.
+
+    Args:
+        exp (Expression): The expression.
+
+    Returns:
+        The identifiers.
+    """
+
+    match exp:
+        case NumberExp():
+            return _NOTHING
+        case Identifier():
+            return frozenset((exp.identifier,))
+        case BoolExp():
+            return reads(exp.a_exp)
+        case ArithmeticExp():
+            return reads(exp.left) | reads(exp.right)
+        case Invariant():
+            return exp.reads
+
+    raise Exception(f"Cannot analyze {type(exp).__name__}")
+
+
+def writes(interpretables: List, loops: Dict[Loop, Set[str]] = None)\
+        -> Set[str]:
+    """ Finds the identifiers that a list of statements binds, increments or
+    decrements, including in the loops among them.
+
+    Args:
+        interpretables (List): The statements.
+
+        loops (Dict): Where to put the identifiers each loop among the
+        statements writes to, or None.
+
+    Returns:
+        The identifiers.
+    """
+
+    found = set()
+
+    for interpretable in interpretables:
+        kind = type(interpretable)
+
+        if kind is Assignment:
+            found.add(interpretable.identifier.identifier)
+        elif kind is Binding:
+            found.add(interpretable.ident.identifier)
+        elif kind is Loop:
+            inner = writes(interpretable.interpretables, loops)
+            if loops is not None:
+                loops[interpretable] = inner
+            found |= inner
+
+    return found
+
+
+def _strip(exp: Expression) -> Expression:
+    """ Replaces the Invariant expressions in an expression by what they
+    remember.
+    """
+
+    match exp:
+        case Invariant():
+            return exp.exp
+        case BoolExp():
+            exp.a_exp = _strip(exp.a_exp)
+        case ArithmeticExp():
+            exp.left = _strip(exp.left)
+            exp.right = _strip(exp.right)
+
+    return exp
+
+
+class Hoister:
+    """ Class that finds the expressions in loops that do not change while
+    the loop runs.
+
+    Every expression in a loop is tagged with the identifiers it reads, and
+    an arithmetic expression that reads none of the identifiers the loop
+    writes to is replaced by an Invariant, so it is only evaluated once
+    every time the loop starts. Each Invariant belongs to the outermost
+    loop it does not change in, so an expression that only depends on what
+    is bound before a loop nest is evaluated once for the whole nest. Only
+    the largest such expressions are replaced, and not single numbers or
+    identifiers, as reading those is as cheap as reading the Invariant.
+
+    Attributes:
+        written (Dict): The identifiers each loop writes to, by loop.
+
+        count (int): How many Invariant expressions there are so far.
+
+        tags (Dict): The identifiers each expression reads, by expression.
+    """
+
+    def __init__(self, written: Dict[Loop, Set[str]]) -> None:
+        """ Sets attributes."""
+
+        self.written = written
+        self.count = 0
+        self.tags: Dict[Expression, FrozenSet[str]] = {}
+
+    def _reads(self, exp: Expression) -> FrozenSet[str]:
+        """ Tags an expression and everything in it with what they read."""
+
+        kind = type(exp)
+
+        if kind is ArithmeticExp:
+            found = self._reads(exp.left) | self._reads(exp.right)
+        elif kind is NumberExp:
+            found = _NOTHING
+        elif kind is BoolExp:
+            found = self._reads(exp.a_exp)
+        else:
+            found = reads(exp)
+
+        self.tags[exp] = found
+
+        return found
+
+    def expression(self, exp: Expression, loops: List[Tuple[Loop, Set[str]]])\
+            -> Expression:
+        """ Replaces the largest invariant parts of an expression.
+
+        Args:
+            exp (Expression): The expression, which has been tagged.
+
+            loops (List): The loops the expression is in, outermost first,
+            with the identifiers each of them writes to.
+
+        Returns:
+            The expression, or the Invariant that replaces it.
+        """
+
+        if type(exp) is BoolExp:
+            exp.a_exp = self.expression(exp.a_exp, loops)
+            return exp
+
+        if type(exp) is not ArithmeticExp:
+            return exp
+
+        found = self.tags[exp]
+
+        for loop, written in loops:
+            if found.isdisjoint(written):
+                invariant = Invariant(exp, self.count, found)
+                loop.invariants += (self.count,)
+                self.count += 1
+                return invariant
+
+        exp.left = self.expression(exp.left, loops)
+        exp.right = self.expression(exp.right, loops)
+
+        return exp
+
+    def statement(self, node: Robol, loops: List[Tuple[Loop, Set[str]]])\
+            -> None:
+        """ Replaces the invariant expressions of a statement, Binding or
+        Start.
+
+        Args:
+            node (Robol): The node.
+
+            loops (List): The loops the node is in, outermost first, with
+            the identifiers each of them writes to.
+
+        Returns:
+            None
+        """
+
+        kind = type(node)
+
+        if kind is Loop:
+            inner = loops + [(node, self.written[node])]
+            self.block(node.interpretables, inner)
+            self._reads(node.condition)
+            node.condition = self.expression(node.condition, inner)
+        elif not loops:
+            return
+        elif kind is Step or kind is Binding:
+            self._reads(node.exp)
+            node.exp = self.expression(node.exp, loops)
+        elif kind is Start:
+            self._reads(node.east)
+            self._reads(node.north)
+            node.east = self.expression(node.east, loops)
+            node.north = self.expression(node.north, loops)
+
+    def block(self, interpretables: List, loops: List[Tuple[Loop, Set[str]]])\
+            -> None:
+        """ Replaces the invariant expressions of a list of statements.
+
+        Args:
+            interpretables (List): The statements.
+
+            loops (List): The loops the statements are in, outermost first,
+            with the identifiers each of them writes to.
+
+        Returns:
+            None
+        """
+
+        for interpretable in interpretables:
+            self.statement(interpretable, loops)
+
+
+def _strip_block(interpretables: List) -> None:
+    """ Removes every Invariant from a list of statements."""
+
+    for interpretable in interpretables:
+        match interpretable:
+            case Binding() | Step():
+                interpretable.exp = _strip(interpretable.exp)
+            case Start():
+                interpretable.east = _strip(interpretable.east)
+                interpretable.north = _strip(interpretable.north)
+            case Loop():
+                interpretable.invariants = ()
+                interpretable.condition = _strip(interpretable.condition)
+                _strip_block(interpretable.interpretables)
+
+
+def _unhoist(interpretables: List) -> None:
+    """ Removes every Invariant from the loops of a list of statements.
+
+    An Invariant is always in the loop it belongs to, so only the loops
+    that have any are searched for them, and most programs, which have
+    never been hoisted, cost no more than a look at each loop.
+    """
+
+    for interpretable in interpretables:
+        if type(interpretable) is Loop:
+            if interpretable.invariants:
+                _strip_block([interpretable])
+            else:
+                _unhoist(interpretable.interpretables)
+
+
+def hoist_invariants(interpretables: List, enabled: bool = True) -> int:
+    """ Replaces the loop invariant expressions of a list of statements.
+
+    Any Invariant expressions from before are removed first, so the
+    statements can be hoisted again after they have changed.
+
+    Args:
+        interpretables (List): The statements.
+
+        enabled (bool): Whether to replace the expressions, or only to
+        remove the Invariant expressions from before.
+
+    Returns:
+        How many Invariant expressions there are, which is how many values
+        the invariants of a robot that runs the statements have to hold.
+    """
+
+    _unhoist(interpretables)
+
+    if not enabled:
+        return 0
+
+    written = {}
+    writes(interpretables, written)
+
+    hoister = Hoister(written)
+    hoister.block(interpretables, [])
+
+    return hoister.count
@@ -6,10 +6,16 @@ class Robol(ABC):
 
     All the classes that implement neither a Statement nor an Expression,
     implement Robol.
+
+    The nodes of a program declare their attributes in __slots__, so that a
+    node does not carry a __dict__. Large programs have millions of nodes,
+    and a node with slots takes less than half the memory.
     """
 
+    __slots__ = ()
+
     @abstractmethod
-    def interpret(self):
+    def interpret(self, *args):
         pass
 
 
@@ -17,11 +23,13 @@ class Statement(Robol):
     """ An interface for Statements.
 
     Classes that implement the Statement interface, usually modify the state
-    of a Robot instance.
+    of the Robot instance they are given.
     """
-    
+
+    __slots__ = ()
+
     @abstractmethod
-    def interpret(self):
+    def interpret(self, robot):
         pass
 
 
@@ -29,10 +37,12 @@ class Expression(Robol):
     """ An interface for expressions.
 
     Classes that implement the Expression interface, usually evaluate an
-    expression, and then push that value to the stack of a Robot instance.
+    expression, and then push that value to the stack of the Robot instance
+    they are given.
     """
 
+    __slots__ = ()
+
     @abstractmethod
-    def interpret(self):
+    def interpret(self, robot):
         pass
-
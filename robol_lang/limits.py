@@ -0,0 +1,163 @@
+from __future__ import annotations
+import sys
+import time
+from typing import TYPE_CHECKING, Dict
+
+if TYPE_CHECKING:
+    from robol_lang.robol import Robot
+
+
+# The countdown of a robot without limits, which never reaches zero.
+NO_LIMITS = sys.maxsize
+
+
+class RunAborted(Exception):
+    """ Raised when a run is stopped by its Limits before it is done.
+
+    Attributes:
+        position (Dict): The position of the robot when it was stopped.
+
+        orientation (Orientation): The orientation of the robot.
+
+        bindings (Dict): The bindings of the robot by identifier.
+
+        iterations (int): How many loop iterations had been started.
+    """
+
+    def __init__(self, message: str, robot: Robot, iterations: int) -> None:
+        """ Sets attributes."""
+
+        super().__init__(
+            f"{message} at {robot.position['east']}, "
+            f"{robot.position['north']} facing {robot.orientation.name}"
+        )
+
+        self.position: Dict[str, int] = dict(robot.position)
+        self.orientation = robot.orientation
+        self.bindings: Dict[str, int] = robot.named_bindings()
+        self.iterations = iterations
+
+
+class BudgetExceeded(RunAborted):
+    """ Raised when a run starts more loop iterations than its budget."""
+
+
+class DeadlineExceeded(RunAborted):
+    """ Raised when a run is still going after its deadline."""
+
+
+class Cancelled(RunAborted):
+    """ Raised when a run has been cancelled."""
+
+
+class Limits:
+    """ Class that stops a run that takes too long.
+
+    Loops are the only statements that can run for longer than the size of
+    the program, so the limits are checked as loop iterations start. The
+    robot counts down the iterations until the next check, so a check only
+    happens every check_every iterations, or exactly when the budget runs
+    out. A run can be cancelled from another thread, and stops at the next
+    check.
+
+    The same Limits can be used for several runs, one at a time, and its
+    count and deadline are reset when a run starts. A Limits that has been
+    cancelled stays cancelled, even if the run had not started yet, so every
+    run that uses it afterwards is cancelled at its first check.
+
+    Attributes:
+        iterations (int): How many loop iterations a run may start, or None.
+
+        seconds (float): How many seconds a run may take, or None.
+
+        check_every (int): How many loop iterations to start between the
+        checks of the deadline and cancellation.
+
+        done (int): How many loop iterations had been started at the last
+        check.
+
+        cancelled (bool): Whether the run has been cancelled.
+    """
+
+    def __init__(self, iterations: int = None, seconds: float = None,
+                 check_every: int = 1024) -> None:
+        """ Sets attributes."""
+
+        if check_every < 1:
+            raise Exception("The limits have to be checked every 1 or more "
+                            "loop iterations")
+
+        self.iterations = iterations
+        self.seconds = seconds
+        self.check_every = check_every
+        self.done = 0
+        self.cancelled = False
+        self._chunk = 0
+        self._deadline = None
+
+    def cancel(self) -> None:
+        """ Cancels the run. This is safe to call from any thread.
+
+        Returns:
+            None
+        """
+
+        self.cancelled = True
+
+    def _next(self) -> int:
+        """ Finds how many iterations to start before the next check."""
+
+        chunk = self.check_every
+
+        if self.iterations is not None:
+            chunk = min(chunk, self.iterations + 1 - self.done)
+
+        self._chunk = chunk
+
+        return chunk
+
+    def start(self) -> int:
+        """ Resets the limits before a run.
+
+        Returns:
+            How many loop iterations the robot may start before the first
+            check.
+        """
+
+        self.done = 0
+
+        if self.seconds is not None:
+            self._deadline = time.monotonic() + self.seconds
+
+        return self._next()
+
+    def check(self, robot: Robot) -> int:
+        """ Checks the limits, when the countdown of the robot is done.
+
+        Args:
+            robot (Robot): The robot. Its state has to be up to date, as it
+            is reported if a limit has been reached.
+
+        Returns:
+            How many loop iterations the robot may start before the next
+            check.
+        """
+
+        self.done += self._chunk
+
+        if self.iterations is not None and self.done > self.iterations:
+            raise BudgetExceeded(
+                f"The budget of {self.iterations} loop iterations ran out",
+                robot, self.done
+            )
+
+        if self.cancelled:
+            raise Cancelled("The run was cancelled", robot, self.done)
+
+        if self._deadline is not None and time.monotonic() > self._deadline:
+            raise DeadlineExceeded(
+                f"The run took more than {self.seconds} seconds",
+                robot, self.done
+            )
+
+        return self._next()
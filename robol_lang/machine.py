@@ -0,0 +1,316 @@
+from __future__ import annotations
+import hashlib
+from typing import TYPE_CHECKING, List, Tuple
+
+from robol_lang.enums import Orientation
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Robol
+    from robol_lang.robol import Program, Robot
+
+
+# The magic string and version that every snapshot starts with.
+SNAPSHOT_MAGIC = b"ROBOLSNP\x01"
+
+
+def _shape(node: Robol) -> tuple:
+    """ Describes a node and everything in it as nested tuples."""
+
+    match node:
+        case NumberExp():
+            return ("number", node.val)
+        case Identifier():
+            return ("identifier", node.identifier)
+        case BoolExp():
+            return ("bool", _shape(node.a_exp))
+        case Invariant():
+            return _shape(node.exp)
+        case ArithmeticExp():
+            return ("arithmetic", node.op.name, _shape(node.left),
+                    _shape(node.right))
+        case Binding():
+            return ("let", node.ident.identifier, _shape(node.exp))
+        case Start():
+            return ("start", _shape(node.east), _shape(node.north))
+        case Assignment():
+            return ("assign", node.identifier.identifier, node.assign.name)
+        case Loop():
+            return ("loop", tuple(map(_shape, node.interpretables)),
+                    _shape(node.condition))
+        case Stop():
+            return ("stop",)
+        case Turn():
+            return ("turn", node.direction.name)
+        case Step():
+            return ("step", _shape(node.exp))
+
+    raise Exception(f"Cannot describe {type(node).__name__}")
+
+
+def fingerprint(program: Program) -> bytes:
+    """ Hashes the nodes of a program.
+
+    Two programs have the same fingerprint if they consist of the same
+    nodes, so a snapshot of one can be resumed by the other.
+
+    Args:
+        program (Program): The program.
+
+    Returns:
+        The 16 byte hash.
+    """
+
+    shape = (
+        _shape(program.grid.east),
+        _shape(program.grid.north),
+        tuple(map(_shape, program.robot.interpretables)),
+    )
+
+    return hashlib.blake2b(repr(shape).encode(), digest_size=16).digest()
+
+
+def _write_int(out: bytearray, value: int) -> None:
+    """ Writes an int of any size as a zigzag varint."""
+
+    value = value * 2 if value >= 0 else -value * 2 - 1
+
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+
+    out.append(value)
+
+
+def _read_int(data: bytes, offset: int) -> Tuple[int, int]:
+    """ Reads a zigzag varint.
+
+    Returns:
+        The int, and the offset right after it.
+    """
+
+    value = 0
+    shift = 0
+
+    while True:
+        if offset >= len(data):
+            raise Exception("The snapshot has been cut short")
+
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if byte < 0x80:
+            break
+
+    return (value >> 1) ^ -(value & 1), offset
+
+
+class Machine:
+    """ Class that runs the statements of a robot one at a time.
+
+    Instead of each Loop interpreting its own statements, the machine keeps
+    a stack of frames, one for the statements of the robot and one for
+    each loop that is running. A frame is the list of statements, the index
+    of the statement to run next, and the loop the statements belong to, if
+    any. This means the machine can stop between any two statements, and
+    the frames, the position, the orientation and the bindings are all it
+    needs to carry on, so they are all a snapshot holds.
+
+    Attributes:
+        robot (Robot): The robot that runs the statements. It has to be
+        linked to its program.
+
+        frames (List): The frames, with the innermost loop last.
+
+        paused (bool): Whether the machine has been asked to pause.
+    """
+
+    def __init__(self, robot: Robot) -> None:
+        """ Sets attributes."""
+
+        self.robot = robot
+        self.frames: List[list] = [[robot.interpretables, 0, None]]
+        self.paused = False
+
+    @property
+    def done(self) -> bool:
+        """ Whether every statement has run."""
+
+        return not self.frames
+
+    def pause(self) -> None:
+        """ Asks the machine to pause after the statement that is running.
+
+        This is safe to call from any thread.
+
+        Returns:
+            None
+        """
+
+        self.paused = True
+
+    def run(self, statements: int = None) -> bool:
+        """ Runs statements until the program is done or the machine pauses.
+
+        Args:
+            statements (int): How many statements to run at most before
+            pausing, or None to run until the program is done.
+
+        Returns:
+            True if the program is done, and False if the machine paused.
+        """
+
+        robot = self.robot
+        frames = self.frames
+        left = -1 if statements is None else statements
+        self.paused = False
+
+        while frames:
+            frame = frames[-1]
+            block, index, loop = frame
+            end = len(block)
+
+            # Run the statements of the frame up to the next loop.
+            while index < end:
+                if not left or self.paused:
+                    frame[1] = index
+                    return False
+
+                node = block[index]
+                if type(node) is Loop:
+                    break
+
+                node.interpret(robot)
+                index += 1
+                left -= 1
+
+            frame[1] = index
+
+            if index < end:
+                if not left or self.paused:
+                    return False
+
+                left -= 1
+
+                for slot in node.invariants:
+                    robot.invariants[slot] = None
+
+                if node.summary is not None and node.summary.run(robot):
+                    frame[1] = index + 1
+                    continue
+
+                # Enter the first iteration of the loop.
+                loop = node
+                frame = [loop.interpretables, 0, loop]
+                frames.append(frame)
+            elif loop is None:
+                frames.pop()
+                continue
+            else:
+                if not left or self.paused:
+                    return False
+
+                loop.condition.interpret(robot)
+
+                if not robot.stack.pop():
+                    frames.pop()
+                    frames[-1][1] += 1
+                    continue
+
+                frame[1] = 0
+
+            # A new iteration of the loop starts here.
+            robot.ticks -= 1
+            if not robot.ticks:
+                robot.ticks = robot.limits.check(robot)
+
+        return True
+
+    def snapshot(self) -> bytes:
+        """ Serializes the state of the machine and the robot.
+
+        Returns:
+            The snapshot, which has the fingerprint of the program, the
+            position and orientation of the robot, its bindings, and the
+            index of each frame.
+        """
+
+        robot = self.robot
+        out = bytearray(SNAPSHOT_MAGIC)
+        out += fingerprint(robot.program)
+
+        _write_int(out, robot.position["east"])
+        _write_int(out, robot.position["north"])
+        _write_int(out, robot.heading)
+
+        # 0 is an unbound slot, so every bound value is written one higher.
+        _write_int(out, len(robot.bindings))
+        for value in robot.bindings:
+            _write_int(out, 0 if value is None else value + (value >= 0))
+
+        _write_int(out, len(self.frames))
+        for _, index, _ in self.frames:
+            _write_int(out, index)
+
+        return bytes(out)
+
+    @classmethod
+    def restore(cls, robot: Robot, data: bytes) -> Machine:
+        """ Creates a machine that carries on from a snapshot.
+
+        Args:
+            robot (Robot): The robot to restore the state to. It has to be
+            linked to the same program that the snapshot was taken of.
+
+            data (bytes): The snapshot.
+
+        Returns:
+            The machine.
+        """
+
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise Exception("This is not a snapshot of a robol program")
+
+        offset = len(SNAPSHOT_MAGIC)
+        if data[offset:offset + 16] != fingerprint(robot.program):
+            raise Exception("The snapshot was taken of a different program")
+        offset += 16
+
+        east, offset = _read_int(data, offset)
+        north, offset = _read_int(data, offset)
+        orientation, offset = _read_int(data, offset)
+
+        count, offset = _read_int(data, offset)
+        if count != len(robot.bindings):
+            raise Exception("The snapshot was taken of a different program")
+
+        bindings = []
+        for _ in range(count):
+            value, offset = _read_int(data, offset)
+            bindings.append(None if value == 0 else value - (value > 0))
+
+        machine = cls(robot)
+        machine.frames = []
+        block, loop = robot.interpretables, None
+
+        depth, offset = _read_int(data, offset)
+        for level in range(depth):
+            index, offset = _read_int(data, offset)
+            machine.frames.append([block, index, loop])
+
+            if level < depth - 1:
+                loop = block[index]
+                if type(loop) is not Loop:
+                    raise Exception("The snapshot does not fit the program")
+                block = loop.interpretables
+
+        robot.position["east"] = east
+        robot.position["north"] = north
+        robot.orientation = Orientation(orientation)
+        robot.bindings[:] = bindings
+
+        return machine
@@ -0,0 +1,235 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List
+
+from robol_lang.compiler import compile_expression
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.resolver import resolve
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program
+
+
+class Report:
+    """ Class that tells what the optimizer changed.
+
+    Attributes:
+        folded (int): How many arithmetic expressions were replaced by
+        numbers.
+
+        propagated (Dict): How many reads of each identifier were replaced by
+        its value.
+
+        turns (int): How many turns were removed because they cancel out.
+    """
+
+    def __init__(self) -> None:
+        """ Sets attributes."""
+
+        self.folded = 0
+        self.propagated: Dict[str, int] = {}
+        self.turns = 0
+
+    def __str__(self) -> str:
+        """ Lists what was changed, one change per line."""
+
+        lines = [f"Folded {self.folded} arithmetic expressions"]
+
+        for name, count in self.propagated.items():
+            lines.append(f"Replaced {count} reads of {name} with its value")
+
+        lines.append(f"Removed {self.turns} turns that cancel out")
+
+        return "\n".join(lines)
+
+
+class Optimizer:
+    """ Class that simplifies the nodes of a program.
+
+    It folds arithmetic expressions that only consist of numbers, replaces
+    reads of identifiers that are bound to a number once and never
+    incremented or decremented with that number, and removes a turn that is
+    directly followed by a turn the other way.
+
+    Attributes:
+        constants (Dict): The value of each identifier that never changes.
+
+        report (Report): What has been changed so far.
+    """
+
+    def __init__(self, constants: Dict[str, int]) -> None:
+        """ Sets attributes."""
+
+        self.constants = constants
+        self.report = Report()
+
+    def expression(self, exp: Expression) -> Expression:
+        """ Simplifies an expression.
+
+        Args:
+            exp (Expression): The expression.
+
+        Returns:
+            The simplified expression, which may be exp itself.
+        """
+
+        match exp:
+            case Identifier() if exp.identifier in self.constants:
+                name = exp.identifier
+                self.report.propagated[name] =\
+                        self.report.propagated.get(name, 0) + 1
+                return NumberExp(self.constants[name])
+            case BoolExp():
+                exp.a_exp = self.expression(exp.a_exp)
+            case Invariant():
+                exp.exp = self.expression(exp.exp)
+            case ArithmeticExp():
+                exp.left = self.expression(exp.left)
+                exp.right = self.expression(exp.right)
+
+                if type(exp.left) is NumberExp and type(exp.right) is NumberExp:
+                    self.report.folded += 1
+                    return NumberExp(compile_expression(exp)([]))
+
+        return exp
+
+    def statement(self, node: Robol) -> None:
+        """ Simplifies the expressions of a statement, Binding or Start.
+
+        Args:
+            node (Robol): The node.
+
+        Returns:
+            None
+        """
+
+        match node:
+            case Binding():
+                node.exp = self.expression(node.exp)
+            case Start():
+                node.east = self.expression(node.east)
+                node.north = self.expression(node.north)
+            case Step():
+                node.exp = self.expression(node.exp)
+            case Loop():
+                node.interpretables = self.block(node.interpretables)
+                node.condition = self.expression(node.condition)
+
+    def block(self, interpretables: List) -> List:
+        """ Simplifies a list of statements.
+
+        Args:
+            interpretables (List): The statements.
+
+        Returns:
+            The simplified list of statements.
+        """
+
+        out = []
+
+        for interpretable in interpretables:
+            if (
+                type(interpretable) is Turn
+                and out
+                and type(out[-1]) is Turn
+                and out[-1].direction is not interpretable.direction
+            ):
+                out.pop()
+                self.report.turns += 2
+                continue
+
+            self.statement(interpretable)
+            out.append(interpretable)
+
+        return out
+
+
+def _count_writes(interpretables: List, bindings: Dict, assignments: Dict)\
+        -> None:
+    """ Counts the bindings and assignments of each identifier.
+
+    Args:
+        interpretables (List): The statements to count in.
+
+        bindings (Dict): The number of bindings of each identifier.
+
+        assignments (Dict): The number of assignments of each identifier.
+
+    Returns:
+        None
+    """
+
+    for interpretable in interpretables:
+        match interpretable:
+            case Binding():
+                name = interpretable.ident.identifier
+                bindings[name] = bindings.get(name, 0) + 1
+            case Assignment():
+                name = interpretable.identifier.identifier
+                assignments[name] = assignments.get(name, 0) + 1
+            case Loop():
+                _count_writes(interpretable.interpretables, bindings, assignments)
+
+
+def _constants(interpretables: List, bindings: Dict, assignments: Dict,
+               constants: Dict) -> None:
+    """ Finds the identifiers that are bound to a number and never change.
+
+    Args:
+        interpretables (List): The statements to search.
+
+        bindings (Dict): The number of bindings of each identifier.
+
+        assignments (Dict): The number of assignments of each identifier.
+
+        constants (Dict): Where the value of each constant is put.
+
+    Returns:
+        None
+    """
+
+    for interpretable in interpretables:
+        match interpretable:
+            case Binding() if type(interpretable.exp) is NumberExp:
+                name = interpretable.ident.identifier
+                if bindings[name] == 1 and name not in assignments:
+                    constants[name] = interpretable.exp.val
+            case Loop():
+                _constants(
+                    interpretable.interpretables, bindings, assignments,
+                    constants
+                )
+
+
+def optimize(program: Program) -> Report:
+    """ Simplifies the nodes of a program.
+
+    The program is resolved first, so reads of unbound identifiers are still
+    reported instead of being replaced. The bindings themselves are kept, so
+    the robot ends up with the same bindings as without the optimizer. The
+    nodes may be shared with other programs, such as those of a
+    ProgramCache, so the program simplifies a copy of its own.
+
+    Args:
+        program (Program): The program.
+
+    Returns:
+        A Report of what was changed.
+    """
+
+    resolve(program)
+    program._own_nodes()
+
+    bindings = {}
+    assignments = {}
+    constants = {}
+
+    _count_writes(program.robot.interpretables, bindings, assignments)
+    _constants(program.robot.interpretables, bindings, assignments, constants)
+
+    optimizer = Optimizer(constants)
+    program.robot.interpretables = optimizer.block(program.robot.interpretables)
+
+    return optimizer.report
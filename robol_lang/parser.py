@@ -0,0 +1,276 @@
+from __future__ import annotations
+from typing import Iterable, List
+
+from robol_lang.enums import Assign, BinaryOp, Direction, TokenKind
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier
+from robol_lang.robol import Program, Robot, Grid, Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+from robol_lang.tokenizer import Token
+
+
+_OPERATORS = {
+    "+": BinaryOp.PLUS,
+    "-": BinaryOp.MINUS,
+    "*": BinaryOp.MULT,
+    "<": BinaryOp.LESS,
+    ">": BinaryOp.GREATER,
+    "=": BinaryOp.EQUALS,
+}
+
+
+class Parser:
+    """ Class that builds a Program from a list of tokens.
+
+    The parser walks the tokens once with a cursor. Nested loops and nested
+    expressions are kept track of with explicit stacks instead of recursion,
+    so neither the length of a program nor how deep it is nested is limited
+    by the recursion limit of Python.
+
+    Attributes:
+        tokens (List): The tokens of the program.
+
+        cursor (int): The index of the next token to be read.
+
+        positions (bool): Whether to keep the line and column of every
+        statement in the program, which the profiler reports.
+    """
+
+    def __init__(self, tokens: Iterable[Token], positions: bool = False)\
+            -> None:
+        """ Sets attributes."""
+
+        self.tokens: List[Token] = (
+            tokens if isinstance(tokens, list) else list(tokens)
+        )
+        self.cursor = 0
+        self.positions = positions
+        self._pending: List[str] = []
+        self._last: Token = None
+
+    def _error(self, message: str, token: Token = None) -> Exception:
+        """ Creates an exception that points at a token.
+
+        Args:
+            message (str): What went wrong.
+
+            token (Token): The token where it went wrong.
+
+        Returns:
+            The exception to raise.
+        """
+
+        token = token or self._last
+
+        if token is None:
+            return Exception(message)
+
+        return Exception(f"{message} at line {token.line}, column {token.col}")
+
+    def _next(self) -> Token:
+        """ Reads the next token and moves the cursor past it.
+
+        Returns:
+            The next token.
+        """
+
+        if self.cursor >= len(self.tokens):
+            raise self._error("Unexpected end of program")
+
+        token = self.tokens[self.cursor]
+        self.cursor += 1
+        self._last = token
+
+        return token
+
+    def _expect(self, kind: TokenKind, text: str = None) -> Token:
+        """ Reads the next token and checks that it is what it should be.
+
+        Args:
+            kind (TokenKind): The kind the token should have.
+
+            text (str): The text the token should have, if any.
+
+        Returns:
+            The token.
+        """
+
+        token = self._next()
+
+        if token.kind is not kind or (text is not None and token.text != text):
+            raise self._error(
+                f"Expected {text or kind.name.lower()}, got {token.text!r}",
+                token,
+            )
+
+        return token
+
+    def _next_exp_text(self) -> str:
+        """ Reads the text of the next part of an expression.
+
+        Parentheses only group tokens in robol, so the text inside them is
+        split up and read as if the parentheses were not there.
+
+        Returns:
+            The text of the next part of the expression.
+        """
+
+        while True:
+            if self._pending:
+                return self._pending.pop()
+
+            token = self._next()
+
+            if token.kind is not TokenKind.GROUP:
+                return token.text
+
+            self._pending = token.text.split()[::-1]
+
+    def _atom(self, text: str) -> NumberExp | Identifier:
+        """ Creates a NumberExp or an Identifier from a text.
+
+        Args:
+            text (str): The text of a number or an identifier.
+
+        Returns:
+            A NumberExp if the text is a number, otherwise an Identifier.
+        """
+
+        digits = text[1:] if text[:1] in ("+", "-") else text
+
+        if digits.isdigit():
+            return NumberExp(int(text))
+
+        return Identifier(text)
+
+    def _expression(self) -> ArithmeticExp | NumberExp | Identifier:
+        """ Builds an expression written in prefix notation.
+
+        Each operator waits on the stack until both of its operands have been
+        built, and is then combined with them into an ArithmeticExp.
+
+        Returns:
+            The expression.
+        """
+
+        stack = []
+
+        while True:
+            text = self._next_exp_text()
+            op = _OPERATORS.get(text)
+
+            if op is not None:
+                stack.append([op, None])
+                continue
+
+            node = self._atom(text)
+
+            while stack:
+                if stack[-1][1] is None:
+                    stack[-1][1] = node
+                    break
+
+                op, left = stack.pop()
+                node = ArithmeticExp(op, left, node)
+            else:
+                if self._pending:
+                    raise self._error("Unexpected tokens in parentheses")
+
+                return node
+
+    def parse(self) -> Program:
+        """ Builds the program from the tokens.
+
+        Returns:
+            A Program with a Robot that holds the statements of the program,
+            and the line and column of each statement if they are kept.
+        """
+
+        grid = None
+        robot = Robot()
+        blocks = [robot.interpretables]
+        loops = []
+        positions = {}
+
+        while self.cursor < len(self.tokens):
+            token = self._next()
+            block = blocks[-1]
+            size = len(block)
+
+            match token.kind, token.text:
+                case TokenKind.KEYWORD, "size":
+                    dims = self._expect(TokenKind.GROUP).text.split("*")
+                    if len(dims) != 2:
+                        raise self._error("Expected size(east*north)")
+                    grid = Grid(NumberExp(dims[0]), NumberExp(dims[1]))
+                case TokenKind.KEYWORD, "let":
+                    binder = self._expect(TokenKind.IDENTIFIER).text
+                    self._expect(TokenKind.OPERATOR, "=")
+                    val = self._expect(TokenKind.NUMBER).text
+                    block.append(Binding(Identifier(binder), NumberExp(val)))
+                case TokenKind.KEYWORD, "start":
+                    nums = self._expect(TokenKind.GROUP).text.split(",")
+                    if len(nums) != 2:
+                        raise self._error("Expected start(east,north)")
+                    block.append(Start(
+                        self._atom(nums[0].strip()),
+                        self._atom(nums[1].strip()),
+                    ))
+                case TokenKind.KEYWORD, "turn":
+                    d = self._expect(TokenKind.KEYWORD).text
+                    if d == "clockwise":
+                        block.append(Turn(Direction.CLOCKWISE))
+                    elif d == "counterclockwise":
+                        block.append(Turn(Direction.COUNTERCLOCKWISE))
+                    else:
+                        raise self._error(f"Expected a direction, got {d!r}")
+                case TokenKind.KEYWORD, "step":
+                    block.append(Step(self._expression()))
+                case TokenKind.KEYWORD, "do":
+                    self._expect(TokenKind.LBRACE)
+                    loop = Loop()
+                    block.append(loop)
+                    blocks.append(loop.interpretables)
+                    loops.append(loop)
+                case TokenKind.RBRACE, _ if loops:
+                    self._expect(TokenKind.KEYWORD, "while")
+                    loops.pop().condition = BoolExp(self._expression())
+                    blocks.pop()
+                case TokenKind.KEYWORD, "stop":
+                    block.append(Stop())
+                case TokenKind.ASSIGNMENT, s:
+                    assign = Assign.INC if s.endswith("++") else Assign.DEC
+                    block.append(Assignment(Identifier(s[:-2]), assign))
+                case _:
+                    raise self._error(f"Unexpected token {token.text!r}", token)
+
+            # A statement is added to the block by the token it starts with,
+            # so that is where it is in the source.
+            if self.positions and len(block) > size:
+                positions[block[-1]] = (token.line, token.col)
+
+        if loops:
+            raise self._error("Missing } at the end of the program")
+        if grid is None:
+            raise Exception("The program has no size")
+
+        program = Program(grid, robot)
+        program.positions = positions
+
+        return program
+
+
+def parse(tokens: Iterable[Token], positions: bool = False) -> Program:
+    """ Builds a Program from tokens.
+
+    Args:
+        tokens (Iterable): The tokens of the program, e.g. from tokenize().
+
+        positions (bool): Whether to keep the line and column of every
+        statement. They take about as much memory as the statements
+        themselves, so they are only kept when asked for.
+
+    Returns:
+        The Program.
+    """
+
+    return Parser(tokens, positions).parse()
@@ -0,0 +1,288 @@
+from __future__ import annotations
+import marshal
+import os
+import time
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from robol_lang.enums import Assign, Direction
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Robol
+    from robol_lang.robol import Robot
+
+
+def _label(node: Robol) -> str:
+    """ Describes a statement in a few words."""
+
+    match node:
+        case Binding():
+            return f"let {node.ident.identifier}"
+        case Start():
+            return "start"
+        case Assignment():
+            op = "++" if node.assign is Assign.INC else "--"
+            return f"{node.identifier.identifier}{op}"
+        case Loop():
+            return "do"
+        case Stop():
+            return "stop"
+        case Turn():
+            if node.direction is Direction.CLOCKWISE:
+                return "turn clockwise"
+            return "turn counterclockwise"
+        case Step():
+            return "step"
+
+    return type(node).__name__
+
+
+class NodeStats:
+    """ Class that holds what the profiler found out about one statement.
+
+    Attributes:
+        node (Robol): The statement.
+
+        parent (NodeStats): The stats of the loop the statement is in, or
+        None.
+
+        label (str): What the statement is, in a few words.
+
+        line (int): The line the statement is on, or None if the program
+        was not parsed from source.
+
+        col (int): The column the statement starts on, or None.
+
+        index (int): How many other statements had run before this one
+        first did, which tells statements without a position apart.
+
+        count (int): How many times the statement has run.
+
+        iterations (int): How many iterations a loop has started. Iterations
+        that a summary skips are not counted.
+
+        total (int): How many nanoseconds the statement has taken, including
+        the statements inside it.
+
+        inner (int): How many of those nanoseconds were taken by the
+        statements inside it.
+    """
+
+    def __init__(self, node: Robol, parent: NodeStats,
+                 position: Tuple[int, int], index: int) -> None:
+        """ Sets attributes."""
+
+        self.node = node
+        self.parent = parent
+        self.label = _label(node)
+        self.line, self.col = position or (None, None)
+        self.index = index
+        self.count = 0
+        self.iterations = 0
+        self.total = 0
+        self.inner = 0
+
+    @property
+    def own(self) -> int:
+        """ How many nanoseconds the statement took by itself."""
+
+        return self.total - self.inner
+
+    @property
+    def where(self) -> str:
+        """ The line and column of the statement, as line:col."""
+
+        if self.line is None:
+            return f"#{self.index}"
+
+        return f"{self.line}:{self.col}"
+
+    @property
+    def name(self) -> str:
+        """ The label and position of the statement."""
+
+        return f"{self.label} ({self.where})"
+
+
+class Profiler:
+    """ Class that counts and times every statement of a program.
+
+    The profiler runs the program itself, the same way Engine.TREE does,
+    but times every statement it runs, so it is only used when a Program
+    is interpreted with one, and costs nothing otherwise. A Loop is timed
+    as a whole, and the time of the statements inside it is subtracted to
+    find how long its condition and iterations took by themselves.
+    Expressions are counted as part of the statement they are in.
+
+    The stats add up over every run the profiler is used for.
+
+    Attributes:
+        filename (str): The name of the program in the dumps.
+
+        stats (Dict): The stats of every statement that has run, by node.
+    """
+
+    def __init__(self, filename: str = "<robol>") -> None:
+        """ Sets attributes."""
+
+        self.filename = filename
+        self.stats: Dict[Robol, NodeStats] = {}
+        self._positions: Dict[Robol, Tuple[int, int]] = {}
+
+    def run(self, robot: Robot) -> None:
+        """ Runs the statements of a linked robot and profiles them.
+
+        Args:
+            robot (Robot): The robot.
+
+        Returns:
+            None
+        """
+
+        self._positions = robot.program.positions
+        self._block(robot.interpretables, robot, None)
+
+    def _block(self, interpretables: List, robot: Robot, parent: NodeStats)\
+            -> None:
+        """ Runs and times a list of statements."""
+
+        clock = time.perf_counter_ns
+
+        for node in interpretables:
+            stats = self.stats.get(node)
+            if stats is None:
+                stats = self.stats[node] = NodeStats(
+                    node, parent, self._positions.get(node), len(self.stats)
+                )
+
+            start = clock()
+
+            try:
+                if type(node) is Loop:
+                    self._loop(node, robot, stats)
+                else:
+                    node.interpret(robot)
+            finally:
+                # A statement that raises has still run, and taken time.
+                elapsed = clock() - start
+                stats.count += 1
+                stats.total += elapsed
+                if parent is not None:
+                    parent.inner += elapsed
+
+    def _loop(self, loop: Loop, robot: Robot, stats: NodeStats) -> None:
+        """ Runs a loop like Loop.interpret, and counts its iterations."""
+
+        for slot in loop.invariants:
+            robot.invariants[slot] = None
+
+        if loop.summary is not None and loop.summary.run(robot):
+            return
+
+        while True:
+            robot.ticks -= 1
+            if not robot.ticks:
+                robot.ticks = robot.limits.check(robot)
+
+            stats.iterations += 1
+            self._block(loop.interpretables, robot, stats)
+
+            loop.condition.interpret(robot)
+            if not robot.stack.pop():
+                break
+
+    def sorted(self) -> List[NodeStats]:
+        """ Sorts the stats by how long each statement took by itself.
+
+        Returns:
+            The stats, slowest first.
+        """
+
+        return sorted(self.stats.values(), key=lambda s: s.own, reverse=True)
+
+    def report(self, limit: int = None) -> str:
+        """ Describes the statements that took the longest.
+
+        Args:
+            limit (int): How many statements to describe, or None for all.
+
+        Returns:
+            A table with a row per statement, slowest first.
+        """
+
+        lines = [
+            f"{'count':>10} {'iterations':>10} {'total ms':>10} "
+            f"{'self ms':>10}  {'line:col':<10} statement"
+        ]
+
+        for stats in self.sorted()[:limit]:
+            iterations = stats.iterations if type(stats.node) is Loop else ""
+            lines.append(
+                f"{stats.count:>10} {iterations:>10} "
+                f"{stats.total / 1e6:>10.3f} {stats.own / 1e6:>10.3f}  "
+                f"{stats.where:<10} {stats.label}"
+            )
+
+        return "\n".join(lines)
+
+    def _key(self, stats: NodeStats) -> Tuple[str, int, str]:
+        """ Finds the key of a statement in a pstats dump."""
+
+        return (self.filename, stats.line or 0, stats.name)
+
+    def dump_stats(self, path: str | os.PathLike) -> None:
+        """ Writes the stats in the format of pstats.
+
+        Every statement is a function, which is called by the loop it is in,
+        so the file can be read with pstats.Stats, or any tool that reads
+        the output of cProfile.
+
+        Args:
+            path (str | os.PathLike): Where to write the stats.
+
+        Returns:
+            None
+        """
+
+        stats = {}
+
+        for s in self.stats.values():
+            callers = {}
+            if s.parent is not None:
+                callers[self._key(s.parent)] = (
+                    s.count, s.count, s.own / 1e9, s.total / 1e9
+                )
+
+            stats[self._key(s)] = (
+                s.count, s.count, s.own / 1e9, s.total / 1e9, callers
+            )
+
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+    def dump_folded(self, path: str | os.PathLike) -> None:
+        """ Writes the stats as folded stacks, for flame graphs.
+
+        Every line is the loops a statement is in and the statement itself,
+        separated by semicolons, and how many microseconds the statement
+        took by itself, which is what flamegraph.pl and speedscope read.
+
+        Args:
+            path (str | os.PathLike): Where to write the stacks.
+
+        Returns:
+            None
+        """
+
+        with open(path, "w") as f:
+            for s in self.stats.values():
+                stack = []
+                frame = s
+                while frame is not None:
+                    stack.append(frame.name)
+                    frame = frame.parent
+
+                micros = s.own // 1000
+                if micros > 0:
+                    print(f"{';'.join(reversed(stack))} {micros}", file=f)
@@ -0,0 +1,175 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.robol import Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program
+
+
+class Resolver:
+    """ Class that gives every identifier of a program a slot.
+
+    Each distinct identifier gets an index into the bindings list of the
+    robot, and every Identifier node is given the slot of its identifier, so
+    nothing is looked up by name while the program runs.
+
+    Robol has no branches other than loops, and the body of a loop always
+    runs at least once, so every statement runs in the order it is written
+    in. An identifier that is read before the first binding of it in the
+    program would therefore always be unbound when it is read, and is
+    reported here instead of when the program runs.
+
+    Attributes:
+        names (List): The identifier of each slot.
+
+        slots (Dict): The slot of each identifier.
+
+        bound (Set): The identifiers that have been bound so far.
+    """
+
+    def __init__(self) -> None:
+        """ Sets attributes."""
+
+        self.names: List[str] = []
+        self.slots: Dict[str, int] = {}
+        self.bound: Set[str] = set()
+
+    def _slot(self, ident: Identifier) -> int:
+        """ Gives an identifier its slot, adding a new slot if needed."""
+
+        slot = self.slots.get(ident.identifier)
+
+        if slot is None:
+            slot = len(self.names)
+            self.slots[ident.identifier] = slot
+            self.names.append(ident.identifier)
+
+        ident.slot = slot
+
+        return slot
+
+    def _read(self, ident: Identifier) -> None:
+        """ Resolves an identifier that is read."""
+
+        if ident.identifier not in self.bound:
+            raise Exception(f"The identifier {ident.identifier!r} is not bound")
+
+        self._slot(ident)
+
+    def walk(self, nodes: List[Robol]) -> None:
+        """ Resolves the identifiers of statements and expressions, in the
+        order they run in.
+
+        The nodes are walked with an explicit stack, so how deep the program
+        is nested does not matter.
+
+        Args:
+            nodes (List): The statements or expressions.
+
+        Returns:
+            None
+        """
+
+        # Each entry is a node and whether its children have been resolved.
+        stack: List[Tuple[Robol, bool]] = [
+            (node, False) for node in reversed(nodes)
+        ]
+
+        while stack:
+            node, done = stack.pop()
+
+            if done:
+                # Only a Binding is visited again, once its value is resolved.
+                self._slot(node.ident)
+                self.bound.add(node.ident.identifier)
+                continue
+
+            match node:
+                case Identifier():
+                    self._read(node)
+                    children = []
+                case BoolExp():
+                    children = [node.a_exp]
+                case Invariant():
+                    children = [node.exp]
+                case ArithmeticExp():
+                    children = [node.left, node.right]
+                case Binding():
+                    stack.append((node, True))
+                    children = [node.exp]
+                case Start():
+                    children = [node.east, node.north]
+                case Assignment():
+                    self._read(node.identifier)
+                    children = []
+                case Loop():
+                    children = [*node.interpretables, node.condition]
+                case Step():
+                    children = [node.exp]
+                case NumberExp() | Turn() | Stop():
+                    children = []
+                case _:
+                    raise Exception(f"Cannot resolve {type(node).__name__}")
+
+            stack.extend((child, False) for child in reversed(children))
+
+    def expression(self, exp: Expression) -> None:
+        """ Resolves the identifiers of an expression.
+
+        Args:
+            exp (Expression): The expression.
+
+        Returns:
+            None
+        """
+
+        self.walk([exp])
+
+    def statement(self, node: Robol) -> None:
+        """ Resolves the identifiers of a statement, Binding or Start.
+
+        Args:
+            node (Robol): The node.
+
+        Returns:
+            None
+        """
+
+        self.walk([node])
+
+    def block(self, interpretables) -> None:
+        """ Resolves the identifiers of a list of statements.
+
+        Args:
+            interpretables (List): The statements.
+
+        Returns:
+            None
+        """
+
+        self.walk(interpretables)
+
+
+def resolve(program: Program) -> List[str]:
+    """ Gives every identifier of a program a slot.
+
+    Resolving the same program again gives every identifier the same slot.
+
+    Args:
+        program (Program): The program.
+
+    Returns:
+        The identifier of each slot.
+    """
+
+    resolver = Resolver()
+
+    resolver.expression(program.grid.east)
+    resolver.expression(program.grid.north)
+    resolver.block(program.robot.interpretables)
+
+    return resolver.names
@@ -1,12 +1,25 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from copy import deepcopy
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterator, Tuple
 
 from robol_lang.interfaces import Robol
-from robol_lang.expressions import Identifier
-from robol_lang.enums import Orientation
+from robol_lang.enums import Engine, Orientation, Verdict, ORIENTATIONS
+from robol_lang.limits import NO_LIMITS
+from robol_lang.sinks import NullSink
 
 if TYPE_CHECKING:
+    from robol_lang.bounds import BoundsReport
+    from robol_lang.bytecode import Code
     from robol_lang.interfaces import Expression
+    from robol_lang.expressions import Identifier
+    from robol_lang.limits import Limits
+    from robol_lang.machine import Machine
+    from robol_lang.profiler import Profiler
+    from robol_lang.sinks import Sink
+    from robol_lang.stream import Event
+
+
+INF = float("inf")
 
 
 class Program(Robol):
@@ -19,41 +32,300 @@ class Program(Robol):
         grid (Grid): The grid that the robot will move on.
         
         robot (Robot): The robot itself.
+
+        engine (Engine): The engine that runs the program. Engine.TREE
+        interprets the nodes directly, Engine.CLOSURE compiles them to
+        closures first, Engine.PYTHON compiles them to Python bytecode, and
+        Engine.BYTECODE lowers them to the bytecode of robol_lang.bytecode.
+
+        summarize_loops (bool): Whether counter loops are run without
+        iterating over them. A summarized loop tells the sink nothing about
+        the steps and turns it skips. Every engine but Engine.PYTHON
+        summarizes loops.
+
+        hoist_invariants (bool): Whether the arithmetic expressions in loops
+        that do not change while the loop runs are only evaluated once every
+        time the loop starts. Only Engine.TREE does this, as the other
+        engines evaluate small expressions without walking any nodes.
+
+        positions (Dict): The line and column of each statement, Binding and
+        Start, for a program that has been parsed with positions.
+
+        prove_bounds (bool): Whether the program is analyzed before it runs.
+        A program that is proven to overstep the grid raises the exception
+        of the Step that would overstep without running at all, and one that
+        is proven to stay inside the grid runs without checking its steps.
+
+        bounds (BoundsReport): What the analysis found when the program was
+        last linked, or None if it was not analyzed.
     """
 
-    def __init__(self, grid: Grid, robot: Robot) -> None:
+    def __init__(self, grid: Grid, robot: Robot, engine: Engine = Engine.TREE)\
+            -> None:
         """ Sets attributes."""
 
         self.grid: Grid = grid 
         self.robot: Robot = robot 
+        self.engine: Engine = engine
+        self.summarize_loops: bool = False
+        self.hoist_invariants: bool = False
+        self.positions: Dict[Robol, Tuple[int, int]] = {}
+        self.prove_bounds: bool = False
+        self.bounds: BoundsReport = None
+        self._owns_nodes: bool = False
+
+    @property
+    def proven(self) -> bool:
+        """ Whether the program was proven to stay inside the grid when it
+        was last linked, so that its steps need not be checked.
+        """
 
-    def _add_references(self) -> None:
-        """ Adds references to the grid and robot.
+        return self.bounds is not None\
+            and self.bounds.verdict is Verdict.IN_BOUNDS
 
-        The robot needs a reference to the program, and the grid needs a
-        reference to the robot.
+    def _link(self, limits: Limits = None) -> None:
+        """ Links the program and the robot before a run.
+
+        Every identifier is resolved to a slot in the bindings of the robot,
+        and the loops are summarized and hoisted if the program does either.
+        The robot gets a reference to the program, the limits of the run and
+        the bounds of the grid, which are evaluated once here instead of on
+        every step. Last, the bounds of the program are proven if it proves
+        bounds, which raises if it is sure to overstep the grid.
+
+        Args:
+            limits (Limits): The limits of the run, or None.
 
         Returns:
             None
         """
 
-        self.grid.robot = self.robot
+        from robol_lang.resolver import resolve
+
+        self.robot.names = resolve(self)
+        count = self._rewrite()
+        self.robot.bindings = [None] * len(self.robot.names)
+        self.robot.invariants = [None] * count
         self.robot.program = self
+        self.robot.limits = limits
+        self.robot.ticks = NO_LIMITS if limits is None else limits.start()
+
+        self.grid.interpret(self.robot)
+        self.robot.grid_north = self.robot.stack.pop()
+        self.robot.grid_east = self.robot.stack.pop()
+        self.robot.edges = (
+            self.robot.grid_east, 0, 0, self.robot.grid_north
+        )
+
+        self.bounds = None
+        if self.prove_bounds:
+            from robol_lang.bounds import check_bounds
+
+            self.bounds = check_bounds(self)
+
+            match self.bounds.verdict:
+                case Verdict.OUT_OF_BOUNDS:
+                    raise Exception(
+                        "The bounds of the grid have been overstepped"
+                    )
+                case Verdict.IN_BOUNDS:
+                    # No step can reach an edge that is infinitely far away.
+                    self.robot.edges = (INF, INF, INF, INF)
+
+    def _rewrite(self) -> int:
+        """ Summarizes the loops and hoists their invariant expressions,
+        as far as the program does either, once the identifiers have their
+        slots.
+
+        Both change the nodes, and they may be shared with other programs,
+        such as those of a ProgramCache, which could be in the middle of a
+        run. So the first time the program does either, it copies its nodes
+        and their positions, and from then on only changes the copy.
 
-    def interpret(self) -> None:
-        """ Calls the interpret method of the robot.
+        Returns:
+            How many Invariant expressions there are.
+        """
+
+        from robol_lang.hoist import hoist_invariants
+        from robol_lang.summary import summarize_loops
+
+        if not self._owns_nodes:
+            if not self.summarize_loops and not self.hoist_invariants:
+                return 0
 
-        Before calling the interpret method of the robot, the method adds a
-        reference of the program to the robot, and a reference of the robot
-        to the grid.
+            self._own_nodes()
+
+        summarize_loops(self.robot.interpretables, self.summarize_loops)
+
+        return hoist_invariants(
+            self.robot.interpretables, self.hoist_invariants
+        )
+
+    def _own_nodes(self) -> None:
+        """ Copies the nodes of the program and their positions, unless the
+        program already has a copy of its own, so that they can be changed
+        without changing any other program that has the same nodes.
 
         Returns:
             None
         """
 
-        self._add_references()
+        if self._owns_nodes:
+            return
+
+        self.robot.interpretables, self.positions = deepcopy(
+            (self.robot.interpretables, self.positions)
+        )
+        self._owns_nodes = True
+
+    def compile(self) -> Callable[[Robot], None]:
+        """ Compiles the program to a tree of closures.
+
+        Returns:
+            A closure that takes a robot and runs the program on it.
+        """
+
+        from robol_lang.compiler import compile_program
+
+        return compile_program(self, not self.proven)
+
+    def assemble(self) -> Code:
+        """ Resolves the program and lowers it to bytecode, with its loops
+        summarized if the program summarizes loops.
+
+        Returns:
+            The Code of the program.
+        """
+
+        from robol_lang.bytecode import assemble
+        from robol_lang.resolver import resolve
+
+        self.robot.names = resolve(self)
+        self._rewrite()
 
-        self.robot.interpret()
+        return assemble(self, not self.proven)
+
+    def machine(self, limits: Limits = None) -> Machine:
+        """ Links the program, and creates a Machine that can run it.
+
+        The machine runs the program like Engine.TREE, but can be paused
+        between any two statements, and snapshot.
+
+        Args:
+            limits (Limits): The limits of the run, or None.
+
+        Returns:
+            The Machine.
+        """
+
+        from robol_lang.machine import Machine
+
+        self._link(limits)
+
+        return Machine(self.robot)
+
+    def restore(self, data: bytes, limits: Limits = None) -> Machine:
+        """ Links the program, and creates a Machine from a snapshot.
+
+        Args:
+            data (bytes): A snapshot of a Machine that ran this program, or
+            a program with the same nodes.
+
+            limits (Limits): The limits of the rest of the run, or None.
+
+        Returns:
+            The Machine, which carries on where the snapshot was taken.
+        """
+
+        from robol_lang.machine import Machine
+
+        self._link(limits)
+
+        return Machine.restore(self.robot, data)
+
+    def run_iter(self, limits: Limits = None) -> Iterator[Event]:
+        """ Runs the program, and yields an Event for every Start, Step,
+        Turn and Stop as it runs, and for a Step that oversteps.
+
+        The program is run by a Machine, and only as far as the events that
+        have been asked for.
+
+        Args:
+            limits (Limits): The limits of the run, or None.
+
+        Returns:
+            An iterator over the events.
+        """
+
+        from robol_lang.stream import run_iter
+
+        return run_iter(self, limits)
+
+    def run_async(self, limits: Limits = None, every: int = 64)\
+            -> AsyncIterator[Event]:
+        """ Runs the program like run_iter, but gives the event loop a turn
+        after every so many events.
+
+        Args:
+            limits (Limits): The limits of the run, or None.
+
+            every (int): How many events to yield between each turn of the
+            event loop.
+
+        Returns:
+            An async iterator over the events.
+        """
+
+        from robol_lang.stream import run_async
+
+        return run_async(self, limits, every)
+
+    def interpret(self, limits: Limits = None, profiler: Profiler = None)\
+            -> None:
+        """ Runs the program with the engine of the program.
+
+        The sink of the robot is flushed afterwards, even if the robot
+        oversteps the grid.
+
+        Args:
+            limits (Limits): Stops the run with a RunAborted if it starts
+            too many loop iterations, takes too long or is cancelled.
+
+            profiler (Profiler): Runs the program instead of the engine, and
+            counts and times every statement, or None. Only this check is
+            made when there is no profiler, so profiling costs nothing when
+            it is off.
+
+        Returns:
+            None
+        """
+
+        self._link(limits)
+
+        try:
+            if profiler is not None:
+                profiler.run(self.robot)
+                return
+
+            match self.engine:
+                case Engine.CLOSURE:
+                    self.compile()(self.robot)
+                case Engine.BYTECODE:
+                    from robol_lang.bytecode import assemble, execute
+
+                    # The program was resolved and rewritten when it was
+                    # linked.
+                    execute(assemble(self, not self.proven), self.robot)
+                case Engine.PYTHON:
+                    from robol_lang.codegen import compile_to_code, load_function
+
+                    load_function(
+                        compile_to_code(self, checked=not self.proven)
+                    )(self.robot)
+                case _:
+                    self.robot.interpret()
+        finally:
+            self.robot.sink.flush()
 
 
 class Robot(Robol):
@@ -67,53 +339,102 @@ class Robot(Robol):
         position (Dict): The current position of the robot.
         
         orientation (Orientation): The current orientation of the robot.
+        It is kept as heading, and only made an Orientation when it is read.
+
+        heading (int): The value of the Orientation of the robot, which is
+        what the statements and engines turn and step with.
         
-        bindings (Dict): The bindings of the robot.
+        bindings (List): The bound values of the robot, indexed by the slot
+        of each identifier.
+
+        names (List): The identifier of each slot in bindings.
         
         interpretables (List): A list of interpretable instances.
         
         stack (List): The robot's stack to push and pop values.
         
         program (Program): A reference to the program.
+
+        grid_east (int): How far east the grid goes.
+
+        grid_north (int): How far north the grid goes.
+
+        edges (Tuple): How far the robot may come in each heading, counted
+        along the unit of the heading, so (grid_east, 0, 0, grid_north), or
+        infinitely far if the program has been proven to stay inside the
+        grid.
+
+        sink (Sink): What the robot tells about what it does. Defaults to a
+        NullSink, which ignores everything.
+
+        limits (Limits): The limits of the current run, or None.
+
+        ticks (int): How many more loop iterations the robot may start
+        before the limits are checked.
+
+        invariants (List): The value of each Invariant expression, or None
+        if it has not been evaluated since its loop started.
     """
 
-    def __init__(self):
-        """ Sets attributes and references."""
+    def __init__(self, sink: Sink = None):
+        """ Sets attributes."""
 
         self.position = {
                 "east": 0,
                 "north": 0
                 }
-        self.orientation = Orientation.EAST
-        self.bindings = {}
+        self.heading = Orientation.EAST.value
+        self.bindings = []
+        self.names = []
         self.interpretables = []
         self.stack = []
         self.program = None
+        self.grid_east = None
+        self.grid_north = None
+        self.edges = None
+        self.sink = NullSink() if sink is None else sink
+        self.limits = None
+        self.ticks = NO_LIMITS
+        self.invariants = []
+
+    @property
+    def orientation(self) -> Orientation:
+        """ The orientation of the robot."""
 
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to each statement.
+        return ORIENTATIONS[self.heading]
 
-        Each statement needs a reference to the robot, so to make it easier
-        for a user to input statements, this method handles the references.
+    @orientation.setter
+    def orientation(self, orientation: Orientation) -> None:
+        self.heading = orientation.value
+
+    def named_bindings(self) -> Dict[str, int]:
+        """ Finds the bindings of the robot by identifier.
 
         Returns:
-            None
+            A dictionary with the bound value of each bound identifier.
         """
 
-        for interpretable in self.interpretables:
-            interpretable.robot = self
+        return {
+            name: val
+            for name, val in zip(self.names, self.bindings)
+            if val is not None
+        }
 
     def interpret(self) -> None:
         """ Interprets each interpretable in interpretables.
 
+        Each interpretable is given the robot, so that it knows which robot
+        to read and modify. The statements are run by a Machine, which keeps
+        track of the loops that are running itself, instead of each Loop
+        interpreting its own statements.
+
         Returns:
             None
         """
 
-        self._add_references()
+        from robol_lang.machine import Machine
 
-        for interpretable in self.interpretables:
-            interpretable.interpret()
+        Machine(self).run()
 
 
 class Grid(Robol):
@@ -127,38 +448,30 @@ class Grid(Robol):
         north (Expression): How far north the grid goes.
     """
 
+    __slots__ = ("east", "north")
+
     def __init__(self, east: Expression, north: Expression) -> None:
-        """ Sets attributes and references."""
+        """ Sets attributes."""
 
         self.east = east
         self.north = north
-        self.robot: Robot = None
-
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to the east and west expressions
-        
-        Returns:
-            None
-        """
 
-        self.east.robot = self.robot
-        self.north.robot = self.robot
-
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Interpret both expressions.
 
         The result of the interpretation of the expression will be put on the
         stack and the class that called this interpret method will then be
         able to retrieve them by popping the stack.
 
+        Args:
+            robot (Robot): The robot whose stack the bounds are pushed to.
+
         Returns:
             None
         """
 
-        self._add_references()
-
-        self.east.interpret()
-        self.north.interpret()
+        self.east.interpret(robot)
+        self.north.interpret(robot)
 
 
 class Start(Robol):
@@ -170,50 +483,37 @@ class Start(Robol):
         north (Expression): How far north the robot should start.
     """
 
+    __slots__ = ("east", "north")
+
     def __init__(self, east: Expression, north: Expression):
-        """ Sets attributes and references."""
+        """ Sets attributes."""
 
         self.east = east
         self.north = north
-        self.robot: Robot = None
-
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to the east and west expressions
-        
-        Returns:
-            None
-        """
-
-        self.east.robot = self.robot
-        self.north.robot = self.robot
 
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Interprets east and west.
 
-        This interprets east and west, and inserts the result into the position
-        dictionary of the robot.
+        This interprets east and west, inserts the result into the position
+        dictionary of the robot, and tells the sink of the robot.
+
+        Args:
+            robot (Robot): The robot that runs the statement.
 
         Returns:
             None
         """
 
-        self._add_references()
+        self.east.interpret(robot)
+        robot.position["east"] = robot.stack.pop()
 
-        self.east.interpret()
-        if type(self.east) is Identifier:
-            self.robot.position["east"] =\
-                    self.robot.bindings[self.robot.stack.pop()]
-        else:
-            self.robot.position["east"] = self.robot.stack.pop()
+        self.north.interpret(robot)
+        robot.position["north"] = robot.stack.pop()
 
-        self.north.interpret()
-        if type(self.north) is Identifier:
-            self.robot.position["north"] =\
-                    self.robot.bindings[self.robot.stack.pop()]
-        else:
-            self.robot.position["north"] = self.robot.stack.pop()
-
-        print(f"Start position: ({self.robot.position['east']}, {self.robot.position['north']})")
+        if robot.sink.listening:
+            robot.sink.start(
+                robot, robot.position["east"], robot.position["north"]
+            )
 
 
 class Binding(Robol):
@@ -225,40 +525,26 @@ class Binding(Robol):
         exp (Expression): The expression that will be bound to the identifier.
     """
 
+    __slots__ = ("ident", "exp")
+
     def __init__(self, ident: Identifier, exp: Expression) -> None:
-        """ Sets attributes and references."""
+        """ Sets attributes."""
 
         self.ident = ident
         self.exp = exp
-        self.robot: Robot = None
-
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to ident and exp.
-        
-        Returns:
-            None
-        """
 
-        self.ident.robot = self.robot
-        self.exp.robot = self.robot
-
-    def interpret(self):
+    def interpret(self, robot: Robot) -> None:
         """ Binds a value to an identifier.
 
-        Interprets ident and exp, and inserts the expression into the bindings
-        dictionary of the robot with the identifier as the key.
+        Interprets exp, and inserts the result into the bindings of the robot
+        at the slot of the identifier.
+
+        Args:
+            robot (Robot): The robot that runs the statement.
 
         Returns:
             None
         """
 
-        self._add_references()
-
-        self.ident.interpret()
-        ident = self.robot.stack.pop()
-
-        self.exp.interpret()
-        exp = self.robot.stack.pop()
-
-        self.robot.bindings[ident] = exp
-
+        self.exp.interpret(robot)
+        robot.bindings[self.ident.slot] = robot.stack.pop()
@@ -0,0 +1,293 @@
+from __future__ import annotations
+import json
+from typing import TYPE_CHECKING, List, TextIO
+
+if TYPE_CHECKING:
+    from robol_lang.enums import Orientation
+    from robol_lang.robol import Robot
+
+
+class Sink:
+    """ Class that is told what a robot does while a program runs.
+
+    The engines only build an event when the sink of the robot is listening,
+    so a sink that is not listening costs nothing but that check. The
+    methods here do nothing, so a sink only has to override the events it
+    cares about.
+
+    Attributes:
+        listening (bool): Whether the sink wants to be told anything.
+    """
+
+    listening = True
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Is told that the robot has been put at its starting point.
+
+        Args:
+            robot (Robot): The robot.
+
+            east (int): How far east the robot starts.
+
+            north (int): How far north the robot starts.
+
+        Returns:
+            None
+        """
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Is told that the robot has taken a number of steps.
+
+        A step that would overstep the grid is told to overstep instead,
+        just before the exception is raised.
+
+        Args:
+            robot (Robot): The robot.
+
+            steps (int): The number of steps taken.
+
+            east (int): How far east the robot is after the steps.
+
+            north (int): How far north the robot is after the steps.
+
+            orientation (Orientation): The orientation of the robot.
+
+        Returns:
+            None
+        """
+
+    def overstep(self, robot: Robot, steps: int, east: int, north: int,
+                 orientation: Orientation) -> None:
+        """ Is told that the robot is about to overstep the grid, and has
+        not moved.
+
+        Args:
+            robot (Robot): The robot.
+
+            steps (int): The number of steps that would overstep the grid.
+
+            east (int): How far east the robot is.
+
+            north (int): How far north the robot is.
+
+            orientation (Orientation): The orientation of the robot.
+
+        Returns:
+            None
+        """
+
+    def turn(self, robot: Robot, orientation: Orientation) -> None:
+        """ Is told that the robot has turned.
+
+        Args:
+            robot (Robot): The robot.
+
+            orientation (Orientation): The new orientation of the robot.
+
+        Returns:
+            None
+        """
+
+    def stop(self, robot: Robot, east: int, north: int) -> None:
+        """ Is told that the robot has stopped.
+
+        Args:
+            robot (Robot): The robot.
+
+            east (int): How far east the robot stopped.
+
+            north (int): How far north the robot stopped.
+
+        Returns:
+            None
+        """
+
+    def flush(self) -> None:
+        """ Writes out anything the sink has held back.
+
+        Returns:
+            None
+        """
+
+
+class NullSink(Sink):
+    """ Class that ignores everything a robot does.
+
+    This is the sink a robot has unless it is given another one.
+    """
+
+    listening = False
+
+
+class HumanSink(Sink):
+    """ Class that prints what a robot does as readable text.
+
+    Attributes:
+        file (TextIO): Where to print to. Defaults to stdout.
+    """
+
+    def __init__(self, file: TextIO = None) -> None:
+        """ Sets attributes."""
+
+        self.file = file
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Prints the starting point."""
+
+        print(f"Start position: ({east}, {north})", file=self.file)
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Prints the number of steps."""
+
+        print(f"Steps: {steps}", file=self.file)
+
+    def overstep(self, robot: Robot, steps: int, east: int, north: int,
+                 orientation: Orientation) -> None:
+        """ Prints the number of steps, like any other step."""
+
+        print(f"Steps: {steps}", file=self.file)
+
+    def turn(self, robot: Robot, orientation: Orientation) -> None:
+        """ Prints the new orientation."""
+
+        print(f"Direction: {orientation}", file=self.file)
+
+    def stop(self, robot: Robot, east: int, north: int) -> None:
+        """ Prints the end position."""
+
+        print(f"End position: ({east}, {north})\n\n", file=self.file)
+
+
+class JsonSink(Sink):
+    """ Class that writes what a robot does as JSON, one event per line.
+
+    Every event is an object with an "event" key that is "start", "step",
+    "overstep", "turn" or "stop", and the values it was given. The lines are
+    held back and written in batches, so the file is not written to on
+    every step.
+
+    Attributes:
+        file (TextIO): Where to write to. Defaults to stdout.
+
+        buffer_size (int): How many lines to hold back before writing them.
+
+        lines (List): The lines that have not been written yet.
+    """
+
+    def __init__(self, file: TextIO = None, buffer_size: int = 1024)\
+            -> None:
+        """ Sets attributes."""
+
+        self.file = file
+        self.buffer_size = buffer_size
+        self.lines: List[str] = []
+
+    def _add(self, event: dict) -> None:
+        """ Holds back an event, and writes the batch out if it is full."""
+
+        self.lines.append(json.dumps(event))
+
+        if len(self.lines) >= self.buffer_size:
+            self.flush()
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Adds a start event."""
+
+        self._add({"event": "start", "east": east, "north": north})
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Adds a step event."""
+
+        self._add({
+            "event": "step",
+            "steps": steps,
+            "east": east,
+            "north": north,
+            "orientation": orientation.name,
+        })
+
+    def overstep(self, robot: Robot, steps: int, east: int, north: int,
+                 orientation: Orientation) -> None:
+        """ Adds an overstep event."""
+
+        self._add({
+            "event": "overstep",
+            "steps": steps,
+            "east": east,
+            "north": north,
+            "orientation": orientation.name,
+        })
+
+    def turn(self, robot: Robot, orientation: Orientation) -> None:
+        """ Adds a turn event."""
+
+        self._add({"event": "turn", "orientation": orientation.name})
+
+    def stop(self, robot: Robot, east: int, north: int) -> None:
+        """ Adds a stop event."""
+
+        self._add({"event": "stop", "east": east, "north": north})
+
+    def flush(self) -> None:
+        """ Writes every line that has been held back."""
+
+        if not self.lines:
+            return
+
+        print("\n".join(self.lines), file=self.file, flush=True)
+        self.lines.clear()
+
+
+class TeeSink(Sink):
+    """ Class that tells several sinks about everything a robot does.
+
+    Attributes:
+        sinks (List): The sinks that are listening.
+    """
+
+    def __init__(self, *sinks: Sink) -> None:
+        """ Sets attributes."""
+
+        self.sinks: List[Sink] = [sink for sink in sinks if sink.listening]
+        self.listening = bool(self.sinks)
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Tells every sink where the robot starts."""
+
+        for sink in self.sinks:
+            sink.start(robot, east, north)
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Tells every sink about the steps."""
+
+        for sink in self.sinks:
+            sink.step(robot, steps, east, north, orientation)
+
+    def overstep(self, robot: Robot, steps: int, east: int, north: int,
+                 orientation: Orientation) -> None:
+        """ Tells every sink about the steps that would overstep the grid."""
+
+        for sink in self.sinks:
+            sink.overstep(robot, steps, east, north, orientation)
+
+    def turn(self, robot: Robot, orientation: Orientation) -> None:
+        """ Tells every sink about the turn."""
+
+        for sink in self.sinks:
+            sink.turn(robot, orientation)
+
+    def stop(self, robot: Robot, east: int, north: int) -> None:
+        """ Tells every sink where the robot stopped."""
+
+        for sink in self.sinks:
+            sink.stop(robot, east, north)
+
+    def flush(self) -> None:
+        """ Flushes every sink."""
+
+        for sink in self.sinks:
+            sink.flush()
@@ -2,10 +2,10 @@ from __future__ import annotations
 from typing import TYPE_CHECKING
 
 from robol_lang.interfaces import Statement
-from robol_lang.enums import Assign, Direction, Orientation
-from robol_lang.expressions import Identifier
+from robol_lang.enums import Assign, Direction, ORIENTATIONS, UNITS
 
 if TYPE_CHECKING:
+    from robol_lang.expressions import Identifier
     from robol_lang.interfaces import Expression
     from robol_lang.robol import Robot
 
@@ -15,44 +15,34 @@ class Assignment(Statement):
 
     Attributes:
         identifier (Identifier): The identifier to increment/decrement.
-        
+
         assign (Assign): The enum that decides if the identifier should
         increment or decrement.
     """
 
+    __slots__ = ("identifier", "assign")
+
     def __init__(self, identifier: Identifier, assign: Assign) -> None:
-        """ Sets attributes and references"""
+        """ Sets attributes."""
 
         self.identifier = identifier
         self.assign = assign
-        self.robot: Robot = None
 
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to identifier.
-        
-        Returns:
-            None
-        """
-
-        self.identifier.robot = self.robot
+    def interpret(self, robot: Robot) -> None:
+        """ Increments/decrements the binding of the identifier.
 
-    def interpret(self) -> None:
-        """ Interprets the identifier and increments/decrements the binding.
+        Args:
+            robot (Robot): The robot that runs the statement.
 
         Returns:
             None
         """
 
-        self._add_references()
-
-        self.identifier.interpret()
-        ident = self.robot.stack.pop()
-
         match self.assign:
             case Assign.INC:
-                self.robot.bindings[ident] += 1
+                robot.bindings[self.identifier.slot] += 1
             case Assign.DEC:
-                self.robot.bindings[ident] -= 1
+                robot.bindings[self.identifier.slot] -= 1
             case _:
                 raise Exception("Something went wrong in Assignment")
 
@@ -62,47 +52,58 @@ class Loop(Statement):
 
     Attributes:
         statements (Statements): The set of statements inside the loop.
-        
+
         condition (BoolExp): The condition for the loop to continue looping.
+
+        summary (LoopSummary): Runs the loop without iterating over it, or
+        None if the loop is not summarized.
+
+        invariants (Tuple): The slots of the Invariant expressions whose
+        values are forgotten whenever the loop starts.
     """
 
+    __slots__ = ("interpretables", "condition", "summary", "invariants")
+
     def __init__(self) -> None:
-        """ Sets attributes and references"""
+        """ Sets attributes."""
 
         self.interpretables = []
         self.condition = None
-        self.robot: Robot = None
-   
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to condition, and each statement.
-        
-        Returns:
-            None
-        """
-   
-        self.condition.robot = self.robot
-
-        for interpretable in self.interpretables:
-            interpretable.robot = self.robot
+        self.summary = None
+        self.invariants = ()
 
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Interprets the statements in the loop.
 
         This interprets the statements of the loop over and over again until
-        the condition is false.
+        the condition is false. A summarized loop first skips ahead as far as
+        its summary allows, and only iterates over what is left, if anything.
+        Every iteration counts down the ticks of the robot, and the limits of
+        the run are checked when they run out.
+
+        Args:
+            robot (Robot): The robot that runs the statement.
 
         Returns:
             None
         """
 
-        self._add_references()
+        for slot in self.invariants:
+            robot.invariants[slot] = None
+
+        if self.summary is not None and self.summary.run(robot):
+            return
 
         while True:
+            robot.ticks -= 1
+            if not robot.ticks:
+                robot.ticks = robot.limits.check(robot)
+
             for interpretable in self.interpretables:
-                interpretable.interpret()
+                interpretable.interpret(robot)
 
-            self.condition.interpret()
-            bool_val = self.robot.stack.pop()
+            self.condition.interpret(robot)
+            bool_val = robot.stack.pop()
             if not bool_val:
                 break
 
@@ -110,18 +111,22 @@ class Loop(Statement):
 class Stop(Statement):
     """ Class that signals that the program is done."""
 
-    def __init__(self) -> None:
-        """ Sets robot to be None."""
-        self.robot = None
+    __slots__ = ()
+
+    def interpret(self, robot: Robot) -> None:
+        """ Tells the sink of the robot where the robot stopped.
 
-    def interpret(self) -> None:
-        """ Prints out the current position of the robot.
+        Args:
+            robot (Robot): The robot that runs the statement.
 
         Returns:
             None
         """
 
-        print(f"End position: ({self.robot.position['east']}, {self.robot.position['north']})\n\n")
+        if robot.sink.listening:
+            robot.sink.stop(
+                robot, robot.position["east"], robot.position["north"]
+            )
 
 
 class Turn(Statement):
@@ -131,25 +136,31 @@ class Turn(Statement):
         direction (Direction): Which direction to turn.
     """
 
+    __slots__ = ("direction",)
+
     def __init__(self, direction: Direction) -> None:
         """ Sets attributes."""
 
         self.direction = direction
-        self.robot: Robot = None
 
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Sets the new orientation of the robot.
 
+        Args:
+            robot (Robot): The robot that runs the statement.
+
         Returns:
             None
         """
 
         match self.direction:
             case Direction.CLOCKWISE:
-                self.robot.orientation = self.robot.orientation.succ()
+                robot.heading = (robot.heading + 1) % 4
             case Direction.COUNTERCLOCKWISE:
-                self.robot.orientation = self.robot.orientation.pred()
-        print(f"Direction: {self.robot.orientation}")
+                robot.heading = (robot.heading - 1) % 4
+
+        if robot.sink.listening:
+            robot.sink.turn(robot, ORIENTATIONS[robot.heading])
 
 
 class Step(Statement):
@@ -160,60 +171,52 @@ class Step(Statement):
         be taken.
     """
 
+    __slots__ = ("exp",)
+
     def __init__(self, exp: Expression) -> None:
-        """ Sets attributes and references."""
+        """ Sets attributes."""
 
         self.exp = exp
-        self.robot: Robot = None
-
-    def _add_references(self) -> None:
-        """ Adds a reference of the robot to condition, and each statement.
-        
-        Returns:
-            None
-        """
-   
-        self.exp.robot = self.robot
 
-    def interpret(self) -> None:
+    def interpret(self, robot: Robot) -> None:
         """ Interprets the expression and moves the robot.
 
         First it evaluates the expression, then it checks if the amount of
         steps would put the robot out of bounds, and if it does, then it raises
-        an exception, otherwise it will move.
+        an exception, otherwise it will move and tell the sink of the robot.
+
+        The robot moves along the unit of its heading, so how far it has come
+        in the direction it is heading grows by exactly the number of steps,
+        and that is checked against the edge of the grid in that direction.
+
+        Args:
+            robot (Robot): The robot that runs the statement.
 
         Returns:
             None
         """
 
-        self._add_references()
-
-        self.exp.interpret()
-        exp = self.robot.stack.pop()
-        if type(self.exp) is Identifier:
-            exp = self.robot.bindings[exp]
-
-        self.robot.program.grid.interpret()
-        grid_east = self.robot.stack.pop()
-        grid_north = self.robot.stack.pop()
-
-        print(f"Steps: {exp}")
-
-        match self.robot.orientation:
-            case Orientation.EAST:
-                if self.robot.position["east"] + exp > grid_east:
-                    raise Exception("The bounds of the grid have been overstepped")
-                self.robot.position["east"] += exp
-            case Orientation.SOUTH:
-                if self.robot.position["north"] - exp < 0:
-                    raise Exception("The bounds of the grid have been overstepped")
-                self.robot.position["north"] -= exp
-            case Orientation.WEST:
-                if self.robot.position["east"] - exp < 0:
-                    raise Exception("The bounds of the grid have been overstepped")
-                self.robot.position["east"] -= exp
-            case Orientation.NORTH:
-                if self.robot.position["north"] + exp > grid_north:
-                    raise Exception("The bounds of the grid have been overstepped")
-                self.robot.position["north"] += exp
-
+        self.exp.interpret(robot)
+        exp = robot.stack.pop()
+
+        heading = robot.heading
+        dx, dy = UNITS[heading]
+        position = robot.position
+        east = position["east"]
+        north = position["north"]
+
+        if dx * east + dy * north + exp > robot.edges[heading]:
+            if robot.sink.listening:
+                robot.sink.overstep(
+                    robot, exp, east, north, ORIENTATIONS[heading]
+                )
+            raise Exception("The bounds of the grid have been overstepped")
+
+        position["east"] = east + dx * exp
+        position["north"] = north + dy * exp
+
+        if robot.sink.listening:
+            robot.sink.step(
+                robot, exp, position["east"], position["north"],
+                ORIENTATIONS[heading]
+            )
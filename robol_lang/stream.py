@@ -0,0 +1,220 @@
+from __future__ import annotations
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, NamedTuple
+
+from robol_lang.enums import EventKind, Orientation
+from robol_lang.sinks import Sink
+
+if TYPE_CHECKING:
+    from robol_lang.limits import Limits
+    from robol_lang.machine import Machine
+    from robol_lang.robol import Program, Robot
+
+
+# How many statements the async runner runs between giving the event loop a
+# turn when no events come.
+_BURST = 4096
+
+
+class Event(NamedTuple):
+    """ A single thing a robot did, and where it was after doing it.
+
+    Attributes:
+        kind (EventKind): Which statement made the event.
+
+        east (int): How far east the robot is.
+
+        north (int): How far north the robot is.
+
+        orientation (Orientation): The orientation of the robot.
+
+        steps (int): The number of steps taken, or that would have been
+        taken by EventKind.OVERSTEP, and 0 for any other kind.
+    """
+
+    kind: EventKind
+    east: int
+    north: int
+    orientation: Orientation
+    steps: int = 0
+
+
+class _EventSink(Sink):
+    """ Class that holds on to an event and pauses the machine.
+
+    Every statement makes at most one event, so pausing right after it
+    means the machine stops on every event, and never runs ahead of the
+    consumer. The sink the robot had is still told about everything.
+
+    Attributes:
+        machine (Machine): The machine that runs the program.
+
+        sink (Sink): The sink the robot had.
+
+        event (Event): The event that has not been handed out yet, or None.
+    """
+
+    def __init__(self, machine: Machine, sink: Sink) -> None:
+        """ Sets attributes."""
+
+        self.machine = machine
+        self.sink = sink
+        self.event = None
+
+    def _hold(self, event: Event) -> None:
+        """ Holds on to an event and pauses the machine."""
+
+        self.event = event
+        self.machine.pause()
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Holds on to a start event."""
+
+        self._hold(Event(EventKind.START, east, north, robot.orientation))
+
+        if self.sink.listening:
+            self.sink.start(robot, east, north)
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Holds on to a step event."""
+
+        self._hold(Event(EventKind.STEP, east, north, orientation, steps))
+
+        if self.sink.listening:
+            self.sink.step(robot, steps, east, north, orientation)
+
+    def overstep(self, robot: Robot, steps: int, east: int, north: int,
+                 orientation: Orientation) -> None:
+        """ Holds on to an overstep event."""
+
+        self._hold(Event(EventKind.OVERSTEP, east, north, orientation, steps))
+
+        if self.sink.listening:
+            self.sink.overstep(robot, steps, east, north, orientation)
+
+    def turn(self, robot: Robot, orientation: Orientation) -> None:
+        """ Holds on to a turn event."""
+
+        self._hold(Event(
+            EventKind.TURN, robot.position["east"], robot.position["north"],
+            orientation
+        ))
+
+        if self.sink.listening:
+            self.sink.turn(robot, orientation)
+
+    def stop(self, robot: Robot, east: int, north: int) -> None:
+        """ Holds on to a stop event."""
+
+        self._hold(Event(EventKind.STOP, east, north, robot.orientation))
+
+        if self.sink.listening:
+            self.sink.stop(robot, east, north)
+
+
+def _events(program: Program, limits: Limits, statements: int)\
+        -> Iterator[Event | None]:
+    """ Runs a program on a Machine and hands out each event as it comes.
+
+    Args:
+        program (Program): The program.
+
+        limits (Limits): The limits of the run, or None.
+
+        statements (int): How many statements to run at most without an
+        event before handing out None, or None to never do so.
+
+    Returns:
+        An iterator over the events, with None after every run of
+        statements that made no event.
+    """
+
+    machine = program.machine(limits)
+    robot = program.robot
+    sink = robot.sink
+    events = _EventSink(machine, sink)
+    robot.sink = events
+
+    try:
+        done = False
+
+        while not done:
+            try:
+                done = machine.run(statements)
+            except Exception:
+                # A step that oversteps makes its event before it raises.
+                if events.event is not None:
+                    event, events.event = events.event, None
+                    yield event
+                raise
+
+            if events.event is not None:
+                event, events.event = events.event, None
+                yield event
+            elif not done:
+                yield None
+    finally:
+        robot.sink = sink
+        sink.flush()
+
+
+def run_iter(program: Program, limits: Limits = None) -> Iterator[Event]:
+    """ Runs a program, and yields an event for every Start, Step, Turn and
+    Stop as it runs, and for a Step that oversteps before it raises.
+
+    The program runs on a Machine, so it is run like Engine.TREE whichever
+    engine it has, and it only runs as far as the events that have been
+    asked for. The sink of the robot is still told everything, and is
+    flushed when the iterator is done or closed.
+
+    Args:
+        program (Program): The program.
+
+        limits (Limits): The limits of the run, or None.
+
+    Returns:
+        An iterator over the events.
+    """
+
+    yield from _events(program, limits, None)
+
+
+async def run_async(program: Program, limits: Limits = None,
+                    every: int = 64) -> AsyncIterator[Event]:
+    """ Runs a program like run_iter, but gives other tasks a turn now and
+    then.
+
+    The event loop is given a turn after every so many events, and after
+    every few thousand statements that make no event, so that a loop that
+    never moves the robot does not hold up the other tasks.
+
+    Args:
+        program (Program): The program.
+
+        limits (Limits): The limits of the run, or None.
+
+        every (int): How many events to yield between each turn of the
+        event loop.
+
+    Returns:
+        An async iterator over the events.
+    """
+
+    events = _events(program, limits, _BURST)
+    count = 0
+
+    try:
+        for event in events:
+            if event is None:
+                await asyncio.sleep(0)
+                continue
+
+            yield event
+
+            count += 1
+            if count == every:
+                count = 0
+                await asyncio.sleep(0)
+    finally:
+        events.close()
@@ -0,0 +1,507 @@
+from __future__ import annotations
+from fractions import Fraction
+from math import ceil, floor
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from robol_lang.enums import Assign, BinaryOp, Direction, UNITS
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.statements import Assignment, Loop, Turn, Step
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression
+    from robol_lang.robol import Robot
+
+
+# The largest number of iterations searched for an overstep when a loop never
+# ends on its own.
+_SEARCH_LIMIT = 2**64
+
+Affine = Tuple[int, Dict[int, int]]
+
+
+def _affine(exp: Expression) -> Affine | None:
+    """ Writes an expression as a constant plus a multiple of each slot.
+
+    Args:
+        exp (Expression): The expression.
+
+    Returns:
+        A tuple of the constant and the multiple of each slot, or None if
+        the expression is not affine.
+    """
+
+    match exp:
+        case NumberExp():
+            return exp.val, {}
+        case Identifier():
+            return 0, {exp.slot: 1}
+        case Invariant():
+            return _affine(exp.exp)
+        case ArithmeticExp():
+            left = _affine(exp.left)
+            right = _affine(exp.right)
+
+            if left is None or right is None:
+                return None
+
+            match exp.op:
+                case BinaryOp.PLUS | BinaryOp.MINUS:
+                    sign = 1 if exp.op is BinaryOp.PLUS else -1
+                    coeffs = dict(left[1])
+                    for slot, coeff in right[1].items():
+                        coeffs[slot] = coeffs.get(slot, 0) + sign * coeff
+                    return left[0] + sign * right[0], coeffs
+                case BinaryOp.MULT if not left[1]:
+                    factor, (const, coeffs) = left[0], right
+                case BinaryOp.MULT if not right[1]:
+                    factor, (const, coeffs) = right[0], left
+                case _:
+                    return None
+
+            return factor * const, {
+                slot: factor * coeff for slot, coeff in coeffs.items()
+            }
+
+    return None
+
+
+def _value(affine: Affine, bindings: List, offsets: Dict[int, int])\
+        -> int:
+    """ Evaluates an affine expression.
+
+    Args:
+        affine (Affine): The expression.
+
+        bindings (List): The bindings of the robot.
+
+        offsets (Dict): What to add to each slot before evaluating.
+
+    Returns:
+        The value.
+    """
+
+    const, coeffs = affine
+
+    return const + sum(
+        coeff * (bindings[slot] + offsets.get(slot, 0))
+        for slot, coeff in coeffs.items()
+    )
+
+
+def _slope(affine: Affine, deltas: Dict[int, int]) -> int:
+    """ Finds how much an affine expression changes in one iteration.
+
+    Args:
+        affine (Affine): The expression.
+
+        deltas (Dict): How much each slot changes in one iteration.
+
+    Returns:
+        The change.
+    """
+
+    return sum(
+        coeff * deltas.get(slot, 0) for slot, coeff in affine[1].items()
+    )
+
+
+class LoopSummary:
+    """ Class that runs a counter loop without iterating over it.
+
+    A loop can be summarized when its body only consists of Step, Turn and
+    Assignment, and when the number of steps and the condition are affine in
+    the bindings. Each binding then changes by the same amount in every
+    iteration, so the number of steps of each Step grows linearly with the
+    iteration, and the orientation repeats itself every one, two or four
+    iterations. The position after any number of iterations, and the
+    furthest the robot gets in any direction along the way, can then be
+    worked out in constant time.
+
+    Attributes:
+        steps (List): For each Step, the number of steps as an affine
+        expression, the changes to the bindings made before it in the body,
+        and the turns made before it in the body.
+
+        deltas (Dict): How much each slot changes in one iteration.
+
+        turns (int): How many times the robot turns clockwise in one
+        iteration, modulo 4.
+
+        op (BinaryOp): The comparison of the condition.
+
+        condition (Affine): The left side minus the right side of the
+        condition.
+    """
+
+    def __init__(self, steps: List, deltas: Dict[int, int], turns: int,
+                 op: BinaryOp, condition: Affine) -> None:
+        """ Sets attributes."""
+
+        self.steps = steps
+        self.deltas = deltas
+        self.turns = turns
+        self.op = op
+        self.condition = condition
+        self.period = 1 if turns == 0 else 2 if turns == 2 else 4
+
+    def _iterations(self, bindings: List) -> int | None:
+        """ Finds how many times the loop runs.
+
+        Args:
+            bindings (List): The bindings when the loop starts.
+
+        Returns:
+            The number of iterations, or None if the loop never ends.
+        """
+
+        g0 = _value(self.condition, bindings, {})
+        gk = _slope(self.condition, self.deltas)
+
+        match self.op:
+            case BinaryOp.EQUALS:
+                if g0 + gk != 0:
+                    return 1
+                return None if gk == 0 else 2
+            case BinaryOp.GREATER:
+                g0, gk = -g0, -gk
+
+        # The loop goes on while g0 + gk*k < 0 after k iterations.
+        if g0 + gk >= 0:
+            return 1
+        if gk <= 0:
+            return None
+
+        return (-g0 + gk - 1) // gk
+
+    def _count(self, q: int, m: int) -> Tuple[int, int]:
+        """ Counts the iterations k < m where k is q modulo the period.
+
+        Args:
+            q (int): The remainder.
+
+            m (int): The number of iterations.
+
+        Returns:
+            How many such iterations there are, and the sum of them.
+        """
+
+        if q >= m:
+            return 0, 0
+
+        c = (m - q + self.period - 1) // self.period
+
+        return c, c * q + self.period * c * (c - 1) // 2
+
+    def _position(self, start: Tuple, steps: List, m: int, s: int = -1)\
+            -> Tuple[int, int]:
+        """ Finds the position after m iterations and s Steps more.
+
+        Args:
+            start (Tuple): The east, north and orientation when the loop
+            starts.
+
+            steps (List): The a + b*k steps of each Step in iteration k.
+
+            m (int): The number of whole iterations.
+
+            s (int): The Step of iteration m to stop after, or -1.
+
+        Returns:
+            The east and north position.
+        """
+
+        east, north, orientation = start
+
+        for q in range(self.period):
+            c, total = self._count(q, m)
+            if c == 0:
+                continue
+
+            for (a, b), (_, _, turns) in zip(steps, self.steps):
+                n = a * c + b * total
+                dx, dy = UNITS[(orientation + turns + self.turns * q) % 4]
+                east += n * dx
+                north += n * dy
+
+        for (a, b), (_, _, turns) in zip(steps[:s + 1], self.steps):
+            n = a + b * m
+            dx, dy = UNITS[(orientation + turns + self.turns * m) % 4]
+            east += n * dx
+            north += n * dy
+
+        return east, north
+
+    def _oversteps(self, start: Tuple, steps: List, m: int, grid: Tuple)\
+            -> bool:
+        """ Checks if any Step oversteps the grid in the first m iterations.
+
+        For a given Step, and the iterations with a given remainder modulo
+        the period, the orientation is the same and the position after the
+        Step is a quadratic function of the iteration. Its largest or
+        smallest value is at either end or at the vertex.
+
+        Args:
+            start (Tuple): The east, north and orientation when the loop
+            starts.
+
+            steps (List): The a + b*k steps of each Step in iteration k.
+
+            m (int): The number of iterations.
+
+            grid (Tuple): How far east and north the grid goes.
+
+        Returns:
+            True if the robot oversteps the grid.
+        """
+
+        orientation = start[2]
+
+        for s, (_, _, turns) in enumerate(self.steps):
+            for q in range(self.period):
+                c, _ = self._count(q, m)
+                if c == 0:
+                    continue
+
+                heading = (orientation + turns + self.turns * q) % 4
+                axis = 0 if heading in (0, 2) else 1
+
+                def f(t: int) -> int:
+                    k = q + self.period * t
+                    return self._position(start, steps, k, s)[axis]
+
+                f0, f1, f2 = f(0), f(1), f(2)
+                d1, d2 = f1 - f0, f2 - 2 * f1 + f0
+
+                candidates = {0, c - 1}
+                if d2 != 0:
+                    vertex = Fraction(1, 2) - Fraction(d1, d2)
+                    for t in (floor(vertex), ceil(vertex)):
+                        if 0 <= t < c:
+                            candidates.add(t)
+
+                values = [
+                    f0 + d1 * t + d2 * t * (t - 1) // 2 for t in candidates
+                ]
+
+                match heading:
+                    case 0 | 3 if max(values) > grid[axis]:
+                        return True
+                    case 1 | 2 if min(values) < 0:
+                        return True
+
+        return False
+
+    def run(self, robot: Robot) -> bool:
+        """ Runs as much of the loop as is known to be safe.
+
+        If the loop ends without overstepping the grid, the robot is moved
+        to where it would be after the loop. If it oversteps the grid, the
+        robot is moved to where it would be at the start of the iteration
+        where that happens, so that running the loop from there raises the
+        same exception from the same state as if every iteration had run.
+        The iterations that are skipped are counted down from the ticks of
+        the robot, and the limits of the run are checked at the iterations
+        where they would have been, with the robot where it would be then.
+
+        Args:
+            robot (Robot): The robot that runs the loop.
+
+        Returns:
+            True if the loop is done, and False if the rest of it has to be
+            run the usual way.
+        """
+
+        bindings = robot.bindings
+        start = (
+            robot.position["east"],
+            robot.position["north"],
+            robot.heading,
+        )
+        grid = (robot.grid_east, robot.grid_north)
+
+        steps = [
+            (
+                _value(affine, bindings, offsets),
+                _slope(affine, self.deltas),
+            )
+            for affine, offsets, _ in self.steps
+        ]
+
+        n = self._iterations(bindings)
+
+        if n is not None and not self._oversteps(start, steps, n, grid):
+            self._skip(robot, start, steps, n)
+            return True
+
+        if n is None:
+            # The loop never ends on its own, so look for an overstep.
+            n = 1
+            while not self._oversteps(start, steps, n, grid):
+                n *= 2
+                if n > _SEARCH_LIMIT:
+                    return False
+
+        # Find the first iteration that oversteps the grid.
+        lo, hi = 0, n
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if self._oversteps(start, steps, mid, grid):
+                hi = mid
+            else:
+                lo = mid
+
+        self._skip(robot, start, steps, lo)
+
+        return False
+
+    def _skip(self, robot: Robot, start: Tuple, steps: List, m: int)\
+            -> None:
+        """ Moves the robot past m iterations, and counts them down from
+        its ticks.
+
+        Every time the countdown runs out among the m iterations, the robot
+        is moved to the start of that iteration before the limits of the
+        run are checked, so a limit that is reached stops the run where it
+        would have stopped if every iteration had run.
+
+        Args:
+            robot (Robot): The robot.
+
+            start (Tuple): The east, north and orientation when the loop
+            starts.
+
+            steps (List): The a + b*k steps of each Step in iteration k.
+
+            m (int): The number of iterations.
+
+        Returns:
+            None
+        """
+
+        counted = done = 0
+
+        if robot.limits is not None:
+            while m - counted >= robot.ticks:
+                at = counted + robot.ticks - 1
+                self._advance(robot, start, steps, done, at)
+                done = at
+                robot.ticks = robot.limits.check(robot)
+                counted = at + 1
+
+            robot.ticks -= m - counted
+
+        self._advance(robot, start, steps, done, m)
+
+    def _advance(self, robot: Robot, start: Tuple, steps: List, done: int,
+                 m: int) -> None:
+        """ Moves the robot from where it is after done iterations to where
+        it is after m iterations.
+
+        Args:
+            robot (Robot): The robot.
+
+            start (Tuple): The east, north and orientation when the loop
+            starts.
+
+            steps (List): The a + b*k steps of each Step in iteration k.
+
+            done (int): The number of iterations the robot has been moved
+            past already.
+
+            m (int): The number of iterations.
+
+        Returns:
+            None
+        """
+
+        east, north = self._position(start, steps, m)
+
+        robot.position["east"] = east
+        robot.position["north"] = north
+        robot.heading = (start[2] + self.turns * m) % 4
+
+        for slot, delta in self.deltas.items():
+            robot.bindings[slot] += delta * (m - done)
+
+
+def summarize(loop: Loop) -> LoopSummary | None:
+    """ Creates a LoopSummary of a loop, if the loop can be summarized.
+
+    The identifiers of the loop have to be resolved first.
+
+    Args:
+        loop (Loop): The loop.
+
+    Returns:
+        The LoopSummary, or None if the loop cannot be summarized.
+    """
+
+    offsets: Dict[int, int] = {}
+    turns = 0
+    steps = []
+
+    for interpretable in loop.interpretables:
+        match interpretable:
+            case Assignment():
+                slot = interpretable.identifier.slot
+                delta = 1 if interpretable.assign is Assign.INC else -1
+                offsets[slot] = offsets.get(slot, 0) + delta
+            case Turn():
+                clockwise = interpretable.direction is Direction.CLOCKWISE
+                turns += 1 if clockwise else -1
+            case Step():
+                affine = _affine(interpretable.exp)
+                if affine is None:
+                    return None
+                steps.append((affine, dict(offsets), turns % 4))
+            case _:
+                return None
+
+    condition = loop.condition
+
+    if type(condition) is not BoolExp:
+        return None
+
+    a_exp = condition.a_exp
+    if type(a_exp) is Invariant:
+        a_exp = a_exp.exp
+    if type(a_exp) is not ArithmeticExp:
+        return None
+
+    op = a_exp.op
+
+    if op not in (BinaryOp.LESS, BinaryOp.GREATER, BinaryOp.EQUALS):
+        return None
+
+    left = _affine(a_exp.left)
+    right = _affine(a_exp.right)
+
+    if left is None or right is None:
+        return None
+
+    coeffs = dict(left[1])
+    for slot, coeff in right[1].items():
+        coeffs[slot] = coeffs.get(slot, 0) - coeff
+
+    return LoopSummary(
+        steps, offsets, turns % 4, op, (left[0] - right[0], coeffs)
+    )
+
+
+def summarize_loops(interpretables: List, enabled: bool = True) -> None:
+    """ Gives every loop in a list of statements its LoopSummary.
+
+    Args:
+        interpretables (List): The statements.
+
+        enabled (bool): Whether to summarize the loops, or to remove their
+        summaries.
+
+    Returns:
+        None
+    """
+
+    for interpretable in interpretables:
+        if type(interpretable) is Loop:
+            interpretable.summary = summarize(interpretable) if enabled else None
+            summarize_loops(interpretable.interpretables, enabled)
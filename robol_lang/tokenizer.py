@@ -0,0 +1,180 @@
+from __future__ import annotations
+import mmap
+import os
+import re
+from typing import Iterator, NamedTuple
+
+from robol_lang.enums import TokenKind
+
+
+_PATTERN = r"""
+    (?P<word>(?:[^\s,(\#/]|/(?!\*))+)
+  | (?P<newline>\n)
+  | (?P<comment>\#[^\n]*)
+  | (?P<block>/\*.*?(?:\*/|\Z))
+  | \((?P<group>[^)]*)\)
+  | (?P<unterminated>\()
+"""
+
+_TEXT_RE = re.compile(_PATTERN, re.VERBOSE | re.DOTALL)
+_BYTES_RE = re.compile(_PATTERN.encode(), re.VERBOSE | re.DOTALL)
+
+_NUMBER_RE = re.compile(r"[+-]?\d+")
+
+_KINDS = {
+    "size": TokenKind.KEYWORD,
+    "let": TokenKind.KEYWORD,
+    "start": TokenKind.KEYWORD,
+    "turn": TokenKind.KEYWORD,
+    "clockwise": TokenKind.KEYWORD,
+    "counterclockwise": TokenKind.KEYWORD,
+    "step": TokenKind.KEYWORD,
+    "do": TokenKind.KEYWORD,
+    "while": TokenKind.KEYWORD,
+    "stop": TokenKind.KEYWORD,
+    "+": TokenKind.OPERATOR,
+    "-": TokenKind.OPERATOR,
+    "*": TokenKind.OPERATOR,
+    "<": TokenKind.OPERATOR,
+    ">": TokenKind.OPERATOR,
+    "=": TokenKind.OPERATOR,
+    "{": TokenKind.LBRACE,
+    "}": TokenKind.RBRACE,
+}
+
+
+class Token(NamedTuple):
+    """ A single token and where it was found in the source.
+
+    Attributes:
+        kind (TokenKind): What kind of token this is.
+
+        text (str): The text of the token.
+
+        line (int): The line the token starts on, counting from 1.
+
+        col (int): The column the token starts on, counting from 1.
+    """
+
+    kind: TokenKind
+    text: str
+    line: int
+    col: int
+
+
+def _kind_of(text: str) -> TokenKind:
+    """ Finds the kind of a word token that is not in the table of kinds.
+
+    Args:
+        text (str): The text of the token.
+
+    Returns:
+        The TokenKind of the token.
+    """
+
+    if _NUMBER_RE.fullmatch(text):
+        return TokenKind.NUMBER
+    if len(text) > 2 and text[-2:] in ("++", "--"):
+        return TokenKind.ASSIGNMENT
+
+    return TokenKind.IDENTIFIER
+
+
+def _scan(source, pattern: re.Pattern, newline) -> Iterator[Token]:
+    """ Scans the source in a single pass and yields the tokens in it.
+
+    Whitespace and commas are never matched by the pattern, so the scanner
+    only stops at tokens, newlines and comments.
+
+    Args:
+        source: A str or a bytes-like object to scan.
+
+        pattern (re.Pattern): The token pattern matching the type of source.
+
+        newline: The newline character matching the type of source.
+
+    Returns:
+        A generator of Token instances.
+    """
+
+    decode = not isinstance(source, str)
+    line = 1
+    line_start = 0
+
+    for m in pattern.finditer(source):
+        group = m.lastgroup
+
+        if group == "word":
+            text = m.group(group)
+            if decode:
+                text = text.decode()
+
+            kind = _KINDS.get(text) or _kind_of(text)
+            yield Token(kind, text, line, m.start() - line_start + 1)
+        elif group == "newline":
+            line += 1
+            line_start = m.end()
+        elif group == "unterminated":
+            raise Exception(
+                f"Unterminated parenthesis at line {line}, column "
+                f"{m.start() - line_start + 1}"
+            )
+        else:
+            if group == "group":
+                text = m.group(group)
+                if decode:
+                    text = text.decode()
+                text = text.strip()
+
+                if text != "":
+                    yield Token(
+                        TokenKind.GROUP, text, line, m.start() - line_start + 1
+                    )
+
+            newlines = m.group().count(newline)
+            if newlines:
+                line += newlines
+                line_start = m.start() + m.group().rfind(newline) + 1
+
+
+def tokenize(source) -> Iterator[Token]:
+    """ Tokenizes a robol program.
+
+    The source is scanned once from start to finish, and the tokens are
+    yielded lazily as they are found.
+
+    Args:
+        source: The program as a str, a path to a file containing the program
+        (os.PathLike), or a bytes-like object such as a memory-mapped file.
+
+    Returns:
+        A generator of Token instances.
+    """
+
+    if isinstance(source, os.PathLike):
+        return tokenize_file(source)
+    if isinstance(source, str):
+        return _scan(source, _TEXT_RE, "\n")
+
+    return _scan(source, _BYTES_RE, b"\n")
+
+
+def tokenize_file(path: str | os.PathLike) -> Iterator[Token]:
+    """ Tokenizes the robol program in a file.
+
+    The file is memory-mapped instead of read into memory, so large programs
+    can be tokenized without holding a copy of the whole file.
+
+    Args:
+        path (str | os.PathLike): The path to the file.
+
+    Returns:
+        A generator of Token instances.
+    """
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield from _scan(buffer, _BYTES_RE, b"\n")
@@ -0,0 +1,215 @@
+from __future__ import annotations
+import ast
+import os
+import sys
+from array import array
+from typing import TYPE_CHECKING, Iterator, Tuple
+
+from robol_lang.enums import Orientation
+from robol_lang.sinks import Sink
+
+if TYPE_CHECKING:
+    from robol_lang.robol import Robot
+
+
+# The magic string and version that every .npy file starts with.
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+class Trajectory(Sink):
+    """ Class that records the path of a robot.
+
+    Every point is the east, north and orientation of the robot, and is
+    recorded where the robot starts and after every step. The points are
+    packed three ints at a time into a single array, so a point takes 12
+    bytes with the default typecode, instead of the Python objects a list
+    of dictionaries would take.
+
+    With a capacity, the trajectory is a ring buffer that only keeps the
+    last capacity points, and never grows while the program runs.
+
+    Attributes:
+        capacity (int): How many points to keep, or None to keep them all.
+
+        typecode (str): The typecode of the array. "i" is enough for grids
+        up to 2**31, and "q" is needed for larger grids.
+
+        data (array): The packed points.
+
+        count (int): How many points have been recorded, including the
+        ones that the ring buffer has dropped.
+    """
+
+    def __init__(self, capacity: int = None, typecode: str = "i") -> None:
+        """ Sets attributes."""
+
+        if capacity is not None and capacity < 1:
+            raise Exception("The capacity of a trajectory has to be positive")
+
+        self.capacity = capacity
+        self.typecode = typecode
+        self.data = array(typecode)
+        self.count = 0
+        self._head = 0
+
+        if capacity is not None:
+            self.data.frombytes(bytes(3 * capacity * self.data.itemsize))
+
+    def _record(self, east: int, north: int, orientation: int) -> None:
+        """ Adds a point, overwriting the oldest one if the ring is full."""
+
+        if self.capacity is None:
+            self.data.extend((east, north, orientation))
+        else:
+            i = self._head * 3
+            self.data[i] = east
+            self.data[i + 1] = north
+            self.data[i + 2] = orientation
+            self._head = (self._head + 1) % self.capacity
+
+        self.count += 1
+
+    def start(self, robot: Robot, east: int, north: int) -> None:
+        """ Records where the robot starts."""
+
+        self._record(east, north, robot.heading)
+
+    def step(self, robot: Robot, steps: int, east: int, north: int,
+             orientation: Orientation) -> None:
+        """ Records where the robot is after a step."""
+
+        self._record(east, north, orientation.value)
+
+    def __len__(self) -> int:
+        """ Finds how many points are kept."""
+
+        if self.capacity is None:
+            return self.count
+
+        return min(self.count, self.capacity)
+
+    @property
+    def dropped(self) -> int:
+        """ How many points the ring buffer has dropped."""
+
+        return self.count - len(self)
+
+    def _unwrap(self) -> None:
+        """ Moves the oldest point to the front of a full ring buffer."""
+
+        if self.capacity is not None and self.count > self.capacity\
+                and self._head != 0:
+            i = self._head * 3
+            self.data[:] = self.data[i:] + self.data[:i]
+            self._head = 0
+
+    def __iter__(self) -> Iterator[Tuple[int, int, Orientation]]:
+        """ Iterates over the points kept, from the oldest to the newest."""
+
+        self._unwrap()
+
+        data = self.data
+        for i in range(0, len(self) * 3, 3):
+            yield data[i], data[i + 1], Orientation(data[i + 2])
+
+    def memoryview(self) -> memoryview:
+        """ Exports the points kept without copying them.
+
+        A full ring buffer is put in order first. The array cannot grow
+        while the view is alive, so the view should be released before
+        anything more is recorded.
+
+        Returns:
+            A memoryview with one row of east, north and orientation for
+            each point, from the oldest to the newest. An empty trajectory
+            gives an empty, flat memoryview.
+        """
+
+        self._unwrap()
+
+        view = memoryview(self.data)[:len(self) * 3]
+
+        if not view:
+            # A memoryview cannot have a shape with a zero in it.
+            return view
+
+        return view.cast("B").cast(self.typecode, (len(self), 3))
+
+    def to_numpy(self):
+        """ Exports the points kept as a NumPy array without copying them.
+
+        Returns:
+            An array of shape (points, 3) that shares memory with the
+            trajectory.
+        """
+
+        try:
+            import numpy
+        except ImportError:
+            raise Exception("Exporting a trajectory to NumPy requires numpy")
+
+        return numpy.asarray(self.memoryview()).reshape(len(self), 3)
+
+    def save(self, path: str | os.PathLike) -> None:
+        """ Writes the points kept to a .npy file.
+
+        The file is written without NumPy, and can be read with numpy.load.
+
+        Args:
+            path (str | os.PathLike): Where to write the file.
+
+        Returns:
+            None
+        """
+
+        order = "<" if sys.byteorder == "little" else ">"
+        header = repr({
+            "descr": f"{order}i{self.data.itemsize}",
+            "fortran_order": False,
+            "shape": (len(self), 3),
+        })
+
+        # The header is padded so that the data starts at a multiple of 64.
+        length = len(_NPY_MAGIC) + 2 + len(header) + 1
+        header += " " * (-length % 64) + "\n"
+
+        with open(path, "wb") as f:
+            f.write(_NPY_MAGIC)
+            f.write(len(header).to_bytes(2, "little"))
+            f.write(header.encode("latin1"))
+            f.write(self.memoryview())
+
+
+def load_trajectory(path: str | os.PathLike) -> Trajectory:
+    """ Reads a trajectory from a .npy file written by Trajectory.save.
+
+    Args:
+        path (str | os.PathLike): The path to the file.
+
+    Returns:
+        The trajectory.
+    """
+
+    with open(path, "rb") as f:
+        if f.read(len(_NPY_MAGIC)) != _NPY_MAGIC:
+            raise Exception(f"{os.fspath(path)} is not a trajectory")
+
+        length = int.from_bytes(f.read(2), "little")
+        header = ast.literal_eval(f.read(length).decode("latin1"))
+        data = f.read()
+
+    descr = header["descr"]
+    typecode = {"4": "i", "8": "q"}.get(descr[2:])
+
+    if descr[1] != "i" or typecode is None or header["fortran_order"]:
+        raise Exception(f"{os.fspath(path)} is not a trajectory")
+
+    trajectory = Trajectory(typecode=typecode)
+    trajectory.data.frombytes(data)
+
+    if (descr[0] == "<") != (sys.byteorder == "little"):
+        trajectory.data.byteswap()
+
+    trajectory.count = len(trajectory.data) // 3
+
+    return trajectory
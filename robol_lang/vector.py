@@ -0,0 +1,362 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, List, Sequence
+
+from robol_lang.compiler import compile_expression
+from robol_lang.enums import Assign, BinaryOp, Direction, Orientation
+from robol_lang.expressions import ArithmeticExp, BoolExp, NumberExp, Identifier, Invariant
+from robol_lang.resolver import resolve
+from robol_lang.robol import Robot, Start, Binding
+from robol_lang.statements import Assignment, Loop, Stop, Turn, Step
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from robol_lang.interfaces import Expression, Robol
+    from robol_lang.robol import Program
+
+
+class Lanes:
+    """ Class that holds the state of many robots that run the same program.
+
+    Every robot is a lane, and every attribute that a Robot holds for
+    itself is an array with one element per lane here. The values are
+    64-bit ints, so a program whose values do not fit in 64 bits gives
+    different results than when it is run by a Robot.
+
+    Attributes:
+        count (int): The number of lanes.
+
+        names (List): The identifier of each slot in bindings.
+
+        east (ndarray): How far east each robot is.
+
+        north (ndarray): How far north each robot is.
+
+        orientation (ndarray): The orientation of each robot, as the value
+        of its Orientation.
+
+        bindings (List): The bound values of each slot, one array per slot.
+
+        bound (List): Which lanes each slot has been bound in.
+
+        overstepped (ndarray): Which robots have overstepped the grid. Such
+        a robot stops where it was before the step that would overstep.
+
+        grid_east (int): How far east the grid goes.
+
+        grid_north (int): How far north the grid goes.
+    """
+
+    def __init__(self, count: int, names: List[str], grid_east: int,
+                 grid_north: int) -> None:
+        """ Sets attributes."""
+
+        self.count = count
+        self.names = names
+        self.east = np.zeros(count, dtype=np.int64)
+        self.north = np.zeros(count, dtype=np.int64)
+        self.orientation = np.zeros(count, dtype=np.int64)
+        self.bindings = [np.zeros(count, dtype=np.int64) for _ in names]
+        self.bound = [np.zeros(count, dtype=bool) for _ in names]
+        self.overstepped = np.zeros(count, dtype=bool)
+        self.grid_east = grid_east
+        self.grid_north = grid_north
+
+    def named_bindings(self, lane: int) -> Dict[str, int]:
+        """ Finds the bindings of a lane by identifier.
+
+        Args:
+            lane (int): The lane.
+
+        Returns:
+            A dictionary with the bound value of each bound identifier.
+        """
+
+        return {
+            name: int(values[lane])
+            for name, values, bound in zip(self.names, self.bindings, self.bound)
+            if bound[lane]
+        }
+
+    def robot(self, lane: int) -> Robot:
+        """ Creates a Robot with the state of a lane.
+
+        Args:
+            lane (int): The lane.
+
+        Returns:
+            The Robot.
+        """
+
+        robot = Robot()
+        robot.position["east"] = int(self.east[lane])
+        robot.position["north"] = int(self.north[lane])
+        robot.heading = int(self.orientation[lane])
+        robot.names = list(self.names)
+        robot.bindings = [
+            int(values[lane]) if bound[lane] else None
+            for values, bound in zip(self.bindings, self.bound)
+        ]
+        robot.grid_east = self.grid_east
+        robot.grid_north = self.grid_north
+
+        return robot
+
+
+class _Vectorizer:
+    """ Class that runs the nodes of a program on every lane at once.
+
+    Each statement is given a mask of the lanes it runs in. A lane leaves
+    the mask of a loop when the condition is false for it, and leaves every
+    mask when it oversteps the grid.
+
+    Attributes:
+        lanes (Lanes): The state of the lanes.
+
+        overrides (Dict): The values to bind instead of evaluating the
+        expression, keyed by the id of the Binding.
+
+        start (tuple): The east and north to start at instead of evaluating
+        the expressions of Start, or None.
+    """
+
+    def __init__(self, lanes: Lanes, overrides: Dict, start: tuple) -> None:
+        """ Sets attributes."""
+
+        self.lanes = lanes
+        self.overrides = overrides
+        self.start = start
+
+    def expression(self, exp: Expression):
+        """ Evaluates an expression in every lane.
+
+        Args:
+            exp (Expression): The expression.
+
+        Returns:
+            An array with the value in each lane, or an int if the value is
+            the same in every lane.
+        """
+
+        match exp:
+            case NumberExp():
+                return exp.val
+            case Identifier():
+                return self.lanes.bindings[exp.slot]
+            case BoolExp():
+                return self.expression(exp.a_exp)
+            case Invariant():
+                return self.expression(exp.exp)
+            case ArithmeticExp():
+                left = self.expression(exp.left)
+                right = self.expression(exp.right)
+
+                match exp.op:
+                    case BinaryOp.PLUS:
+                        return left + right
+                    case BinaryOp.MINUS:
+                        return left - right
+                    case BinaryOp.MULT:
+                        return left * right
+                    case BinaryOp.LESS:
+                        return np.less(left, right).astype(np.int64)
+                    case BinaryOp.GREATER:
+                        return np.greater(left, right).astype(np.int64)
+                    case BinaryOp.EQUALS:
+                        return np.equal(left, right).astype(np.int64)
+
+                raise Exception("Something went wrong in ArithmeticExp.")
+
+        raise Exception(f"Cannot vectorize {type(exp).__name__}")
+
+    def _step(self, exp: Expression, mask) -> None:
+        """ Moves the lanes in the mask, unless they overstep the grid."""
+
+        lanes = self.lanes
+        n = self.expression(exp)
+        o = lanes.orientation
+
+        east = mask & (o == Orientation.EAST.value)
+        south = mask & (o == Orientation.SOUTH.value)
+        west = mask & (o == Orientation.WEST.value)
+        north = mask & (o == Orientation.NORTH.value)
+
+        over = (
+            (east & (lanes.east + n > lanes.grid_east))
+            | (south & (lanes.north - n < 0))
+            | (west & (lanes.east - n < 0))
+            | (north & (lanes.north + n > lanes.grid_north))
+        )
+
+        if over.any():
+            lanes.overstepped |= over
+            mask &= ~over
+            east &= ~over
+            south &= ~over
+            west &= ~over
+            north &= ~over
+
+        lanes.east += np.where(east, n, 0) - np.where(west, n, 0)
+        lanes.north += np.where(north, n, 0) - np.where(south, n, 0)
+
+    def statement(self, node: Robol, mask) -> None:
+        """ Runs a statement, Binding or Start in the lanes of a mask.
+
+        Args:
+            node (Robol): The node.
+
+            mask (ndarray): The lanes to run it in. Lanes that overstep the
+            grid are removed from it.
+
+        Returns:
+            None
+        """
+
+        lanes = self.lanes
+
+        match node:
+            case Binding():
+                slot = node.ident.slot
+                values = self.overrides.get(id(node))
+                if values is None:
+                    values = self.expression(node.exp)
+                np.copyto(lanes.bindings[slot], values, where=mask)
+                lanes.bound[slot] |= mask
+            case Start():
+                if self.start is None:
+                    east = self.expression(node.east)
+                    north = self.expression(node.north)
+                else:
+                    east, north = self.start
+                np.copyto(lanes.east, east, where=mask)
+                np.copyto(lanes.north, north, where=mask)
+            case Assignment():
+                delta = 1 if node.assign is Assign.INC else -1
+                lanes.bindings[node.identifier.slot] += np.where(mask, delta, 0)
+            case Loop():
+                looping = mask.copy()
+                while looping.any():
+                    self.block(node.interpretables, looping)
+                    looping &= self.expression(node.condition) != 0
+                mask &= ~lanes.overstepped
+            case Turn():
+                delta = 1 if node.direction is Direction.CLOCKWISE else -1
+                lanes.orientation = np.where(
+                    mask, (lanes.orientation + delta) % 4, lanes.orientation
+                )
+            case Step():
+                self._step(node.exp, mask)
+            case Stop():
+                pass
+            case _:
+                raise Exception(f"Cannot vectorize {type(node).__name__}")
+
+    def block(self, interpretables: List, mask) -> None:
+        """ Runs a list of statements in the lanes of a mask.
+
+        Args:
+            interpretables (List): The statements.
+
+            mask (ndarray): The lanes to run them in.
+
+        Returns:
+            None
+        """
+
+        for interpretable in interpretables:
+            if not mask.any():
+                return
+            self.statement(interpretable, mask)
+
+
+def _first_bindings(interpretables: List, found: Dict) -> None:
+    """ Finds the first Binding of each identifier in program order."""
+
+    for interpretable in interpretables:
+        match interpretable:
+            case Binding():
+                found.setdefault(interpretable.ident.identifier, interpretable)
+            case Loop():
+                _first_bindings(interpretable.interpretables, found)
+
+
+def run_lanes(program: Program, count: int = None, east: Sequence = None,
+              north: Sequence = None, bindings: Dict[str, Sequence] = None)\
+        -> Lanes:
+    """ Runs a program for many robots at once with NumPy.
+
+    Every lane gives the same result as a Robot that runs the program with
+    its own start and bindings, except that a lane that oversteps the grid
+    is marked in overstepped instead of raising an exception. Nothing is
+    told to a sink.
+
+    Args:
+        program (Program): The program.
+
+        count (int): The number of lanes. Defaults to the length of the
+        values given for east, north or bindings.
+
+        east (Sequence): Where each lane starts east, instead of where
+        start says.
+
+        north (Sequence): Where each lane starts north, instead of where
+        start says.
+
+        bindings (Dict): The values that the first let of each identifier
+        binds in each lane, instead of its expression.
+
+    Returns:
+        The Lanes after the program has run.
+    """
+
+    if np is None:
+        raise Exception("The vector engine requires numpy")
+
+    bindings = {} if bindings is None else bindings
+    given = [
+        np.asarray(values, dtype=np.int64)
+        for values in (east, north, *bindings.values())
+        if values is not None
+    ]
+
+    if count is None:
+        sizes = [len(values) for values in given if values.ndim]
+        if not sizes:
+            raise Exception("The number of lanes is not given")
+        count = max(sizes)
+
+    names = resolve(program)
+    grid_east = compile_expression(program.grid.east)([])
+    grid_north = compile_expression(program.grid.north)([])
+
+    firsts = {}
+    _first_bindings(program.robot.interpretables, firsts)
+
+    overrides = {}
+    for name, values in bindings.items():
+        if name not in firsts:
+            raise Exception(f"The identifier {name!r} is never bound")
+        overrides[id(firsts[name])] = np.broadcast_to(
+            np.asarray(values, dtype=np.int64), count
+        )
+
+    start = None
+    if east is not None or north is not None:
+        if east is None or north is None:
+            raise Exception("Both east and north have to be given")
+        start = (
+            np.broadcast_to(np.asarray(east, dtype=np.int64), count),
+            np.broadcast_to(np.asarray(north, dtype=np.int64), count),
+        )
+
+    lanes = Lanes(count, names, grid_east, grid_north)
+    mask = np.ones(count, dtype=bool)
+
+    _Vectorizer(lanes, overrides, start).block(
+        program.robot.interpretables, mask
+    )
+
+    return lanes
@@ -1,8 +1,37 @@
 # Import block
 from typing import List
+import asyncio
+import contextlib
+import gc
+import glob
+import io
+import json
+import marshal
+import os
+import pickle
 import sys
+import tempfile
+from copy import deepcopy
+from types import CodeType
 
 from robol_lang import *
+import benchmark
+from robol_lang import batch
+from robol_lang.batch import collect, run_batch, write_results
+from robol_lang.cache import AST_MAGIC
+from robol_lang.codegen import cache_key
+
+
+def crash(path, program, timeout):
+    """ Runs a program like a worker of a batch, unless it is named crash."""
+
+    if os.path.basename(path) == "crash.robol":
+        os._exit(1)
+
+    return run_program(path, program, timeout)
+
+
+run_program = batch.run_program
 
 class TestCode:
     def __init__(self):
@@ -11,7 +40,7 @@ class TestCode:
     def test1(self):
 
 
-        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot(HumanSink()))
 
         interpretables = []
 
@@ -34,7 +63,7 @@ class TestCode:
 
     def test2(self):
 
-        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot(HumanSink()))
 
         interpretables = []
 
@@ -83,7 +112,7 @@ class TestCode:
 
     def test3(self):
         
-        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot(HumanSink()))
 
         interpretables = []
 
@@ -118,7 +147,7 @@ class TestCode:
 
     def test4(self):
 
-        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot(HumanSink()))
 
         interpretables = []
 
@@ -136,11 +165,1261 @@ class TestCode:
         p.interpret()
 
 
+    def test5(self):
+
+        interpretables = []
+
+        interpretables.append(Binding(Identifier("i"), NumberExp(0)))
+        interpretables.append(Start(NumberExp(2), NumberExp(2)))
+
+        loop = Loop()
+        loop.interpretables.append(Step(NumberExp(1)))
+        loop.interpretables.append(Assignment(Identifier("i"), Assign.INC))
+        loop.condition = BoolExp(ArithmeticExp(BinaryOp.LESS, Identifier("i"), NumberExp(10)))
+        interpretables.append(loop)
+        interpretables.append(Stop())
+
+        # The same statements are run by two robots on different grids.
+        p1: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+        p2: Program = Program(Grid(NumberExp(32), NumberExp(32)), Robot())
+
+        p1.robot.interpretables = interpretables
+        p2.robot.interpretables = interpretables
+
+        p1.interpret()
+        p2.interpret()
+
+        assert p1.robot.position == p2.robot.position == {"east": 12, "north": 2}
+
+
+    def test6(self):
+
+        def program(summarize_loops):
+            p: Program = Program(Grid(NumberExp(1000), NumberExp(1000)), Robot())
+            p.summarize_loops = summarize_loops
+
+            p.robot.interpretables.append(Binding(Identifier("i"), NumberExp(0)))
+            p.robot.interpretables.append(Start(NumberExp(0), NumberExp(0)))
+
+            loop = Loop()
+            loop.interpretables.append(Step(NumberExp(3)))
+            loop.interpretables.append(Turn(Direction.COUNTERCLOCKWISE))
+            loop.interpretables.append(Step(Identifier("i")))
+            loop.interpretables.append(Turn(Direction.CLOCKWISE))
+            loop.interpretables.append(Assignment(Identifier("i"), Assign.INC))
+            loop.condition = BoolExp(ArithmeticExp(BinaryOp.LESS, Identifier("i"), NumberExp(30)))
+            p.robot.interpretables.append(loop)
+            p.robot.interpretables.append(Stop())
+
+            return p
+
+        # A summarized loop ends up in the same place as one that iterates.
+        p1 = program(False)
+        p2 = program(True)
+
+        p1.interpret()
+        p2.interpret()
+
+        assert p1.robot.position == p2.robot.position == {"east": 90, "north": 435}
+        assert p1.robot.named_bindings() == p2.robot.named_bindings() == {"i": 30}
+
+        # The iterations a summary skips still count towards the budget.
+        for engine in (Engine.TREE, Engine.CLOSURE, Engine.BYTECODE):
+            for summarize_loops in (False, True):
+                p = program(summarize_loops)
+                p.engine = engine
+                try:
+                    p.interpret(Limits(iterations=20, check_every=8))
+                except BudgetExceeded as e:
+                    assert e.iterations == 21
+                    assert e.position == {"east": 60, "north": 190}
+                    assert e.bindings == {"i": 20}
+                else:
+                    raise Exception("The budget did not stop the loop")
+
+        # A program that shares its nodes with one that summarizes does not.
+        p1 = program(True)
+        p2 = program(False)
+        p2.robot.interpretables = p1.robot.interpretables
+        p1.interpret()
+
+        steps = [e for e in p2.run_iter() if e.kind is EventKind.STEP]
+        assert len(steps) == 60
+
+
+    def test7(self):
+
+        p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+
+        p.robot.interpretables.append(Binding(Identifier("i"), NumberExp(0)))
+        p.robot.interpretables.append(Start(NumberExp(0), NumberExp(0)))
+
+        # The loop never ends, since i is never incremented.
+        loop = Loop()
+        loop.interpretables.append(Turn(Direction.CLOCKWISE))
+        loop.condition = BoolExp(ArithmeticExp(BinaryOp.LESS, Identifier("i"), NumberExp(10)))
+        p.robot.interpretables.append(loop)
+        p.robot.interpretables.append(Stop())
+
+        try:
+            p.interpret(Limits(iterations=1000))
+        except BudgetExceeded as e:
+            assert e.iterations == 1001
+            assert e.orientation is Orientation.EAST
+            assert e.bindings == {"i": 0}
+        else:
+            raise Exception("The budget did not stop the loop")
+
+        # A run that is cancelled before it starts stops at the first check.
+        limits = Limits(check_every=16)
+        limits.cancel()
+        try:
+            p.interpret(limits)
+        except Cancelled as e:
+            assert e.iterations == 16
+        else:
+            raise Exception("The run was not cancelled")
+
+        try:
+            Limits(10, check_every=0)
+        except Exception as e:
+            assert "checked every" in str(e)
+        else:
+            raise Exception("The limits would never have been checked")
+
+    def test8(self):
+        # Same program as test6, paused and resumed from a snapshot.
+        def program() -> Program:
+            p: Program = Program(Grid(NumberExp(100), NumberExp(500)), Robot())
+
+            p.robot.interpretables.append(Binding(Identifier("i"), NumberExp(0)))
+            p.robot.interpretables.append(Start(NumberExp(0), NumberExp(0)))
+
+            loop = Loop()
+            loop.interpretables.append(Step(NumberExp(3)))
+            loop.interpretables.append(Turn(Direction.COUNTERCLOCKWISE))
+            loop.interpretables.append(Step(Identifier("i")))
+            loop.interpretables.append(Turn(Direction.CLOCKWISE))
+            loop.interpretables.append(Assignment(Identifier("i"), Assign.INC))
+            loop.condition = BoolExp(ArithmeticExp(BinaryOp.LESS, Identifier("i"), NumberExp(30)))
+            p.robot.interpretables.append(loop)
+            p.robot.interpretables.append(Stop())
+
+            return p
+
+        machine = program().machine()
+        assert not machine.run(50)
+        data = machine.snapshot()
+
+        p = program()
+        assert p.restore(data).run()
+        assert p.robot.position == {"east": 90, "north": 435}
+        assert p.robot.named_bindings() == {"i": 30}
+
+    def test9(self):
+        def program() -> Program:
+            p: Program = Program(Grid(NumberExp(64), NumberExp(64)), Robot())
+
+            p.robot.interpretables.append(Start(NumberExp(2), NumberExp(2)))
+            p.robot.interpretables.append(Turn(Direction.COUNTERCLOCKWISE))
+            p.robot.interpretables.append(Step(NumberExp(5)))
+            p.robot.interpretables.append(Stop())
+
+            return p
+
+        expected = [
+            Event(EventKind.START, 2, 2, Orientation.EAST),
+            Event(EventKind.TURN, 2, 2, Orientation.NORTH),
+            Event(EventKind.STEP, 2, 7, Orientation.NORTH, 5),
+            Event(EventKind.STOP, 2, 7, Orientation.NORTH),
+        ]
+
+        # The robot has only moved as far as the events that have been seen.
+        p = program()
+        events = p.run_iter()
+        assert next(events) == expected[0]
+        assert p.robot.orientation is Orientation.EAST
+        assert list(events) == expected[1:]
+
+        async def collect():
+            return [event async for event in program().run_async(every=1)]
+
+        assert asyncio.run(collect()) == expected
+
+    def test10(self):
+        # Same program as test6, on the bytecode engine.
+        def program(engine: Engine) -> Program:
+            p: Program = Program(Grid(NumberExp(100), NumberExp(500)), Robot(), engine)
+
+            p.robot.interpretables.append(Binding(Identifier("i"), NumberExp(0)))
+            p.robot.interpretables.append(Start(NumberExp(0), NumberExp(0)))
+
+            loop = Loop()
+            loop.interpretables.append(Step(NumberExp(3)))
+            loop.interpretables.append(Turn(Direction.COUNTERCLOCKWISE))
+            loop.interpretables.append(Step(Identifier("i")))
+            loop.interpretables.append(Turn(Direction.CLOCKWISE))
+            loop.interpretables.append(Assignment(Identifier("i"), Assign.INC))
+            loop.condition = BoolExp(ArithmeticExp(BinaryOp.LESS, Identifier("i"), NumberExp(30)))
+            p.robot.interpretables.append(loop)
+            p.robot.interpretables.append(Stop())
+
+            return p
+
+        p1 = program(Engine.TREE)
+        p2 = program(Engine.BYTECODE)
+
+        p1.interpret()
+        p2.interpret()
+
+        assert p1.robot.position == p2.robot.position
+        assert p1.robot.orientation is p2.robot.orientation
+        assert p1.robot.named_bindings() == p2.robot.named_bindings()
+
+        # The loop ticks once before its body, and its condition compares
+        # the registers of i and 30 as it jumps back to the body.
+        code = p2.assemble()
+        assert code.ops.typecode == "i"
+        assert Opcode(code.ops[8]) is Opcode.TICK
+        assert ">>     3 STEP" in disassemble(code)
+        assert list(code.ops[-8:-4]) == [Opcode.JUMP_LT.value, 3, 0, code.constant(30)]
+        assert p2.robot.bindings == [30]
+
+        # Loops are only jumps, so they can be nested as deep as need be.
+        depth = 2000
+        source = "\n".join([
+            "size(8*8)",
+            "let i = 0",
+            "start(1,1)",
+            "do { step 1 turn clockwise " * depth,
+            "i++",
+            "} while < i 0 " * depth,
+            "stop",
+        ])
+
+        p: Program = parse(tokenize(source))
+        p.engine = Engine.BYTECODE
+        p.interpret()
+        assert p.robot.position == {"east": 1, "north": 1}
+        assert p.robot.named_bindings() == {"i": 1}
+
+    def test11(self):
+        source = "\n".join([
+            "size(64*64)",
+            "let i = 0",
+            "start(0,0)",
+            "do {",
+            "    step 1",
+            "    i++",
+            "} while < i 10",
+            "stop",
+        ])
+
+        p: Program = parse(tokenize(source), positions=True)
+        profiler = Profiler()
+        p.interpret(profiler=profiler)
+
+        assert p.robot.position == {"east": 10, "north": 0}
+
+        stats = {s.name: s for s in profiler.stats.values()}
+        assert stats["do (4:1)"].count == 1
+        assert stats["do (4:1)"].iterations == 10
+        assert stats["step (5:5)"].count == 10
+        assert stats["step (5:5)"].parent is stats["do (4:1)"]
+        assert stats["stop (8:1)"].count == 1
+        assert "step" in profiler.report()
+
+    def test12(self):
+        source = "\n".join([
+            "size(64*64)",
+            "let i = 0",
+            "start(23,30)",
+            "do {",
+            "    step 2",
+            "    turn clockwise",
+            "    i++",
+            "} while < i 3",
+            "stop",
+        ])
+
+        cache = ProgramCache(maxsize=1)
+        first = cache.parse(source)
+        second = cache.parse(source)
+
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert first.robot is not second.robot
+        assert fingerprint(first) == fingerprint(second)
+
+        second.robot.sink = NullSink()
+        second.interpret()
+        assert second.robot.position == {"east": 23, "north": 28}
+
+        cache.parse("size(8*8) start(0,0) stop")
+        assert len(cache) == 1
+        cache.parse(source)
+        assert cache.misses == 3
+
+        data = encode(first.grid, first.robot.interpretables)
+        grid, interpretables = decode(data)
+        assert len(interpretables) == len(first.robot.interpretables)
+
+    def test13(self):
+        source = "\n".join([
+            "size(128*128)",
+            "let n = 2",
+            "let i = 0",
+            "start(0,0)",
+            "do {",
+            "    let j = 0",
+            "    do {",
+            "        step + * n 3 - j j",
+            "        j++",
+            "    } while < j n",
+            "    n++",
+            "    i++",
+            "} while < i 3",
+            "stop",
+        ])
+
+        plain: Program = parse(tokenize(source))
+        plain.interpret()
+        assert plain.robot.position == {"east": 87, "north": 0}
+
+        p: Program = parse(tokenize(source))
+        p.hoist_invariants = True
+        p.interpret()
+
+        assert p.robot.position == plain.robot.position
+        assert p.robot.named_bindings() == plain.robot.named_bindings()
+
+        # * n 3 does not change in the inner loop, but does in the outer.
+        outer = p.robot.interpretables[3]
+        inner = outer.interpretables[1]
+        assert outer.invariants == ()
+        assert inner.invariants == (0,)
+        assert type(inner.interpretables[0].exp.left) is Invariant
+        assert inner.interpretables[0].exp.left.reads == {"n"}
+
+        p.hoist_invariants = False
+        p.interpret()
+        assert type(inner.interpretables[0].exp.left) is ArithmeticExp
+
+        # Programs from the same cache share their nodes, so one that hoists
+        # must not change the nodes another one is in the middle of running.
+        cache = ProgramCache()
+        paused = cache.parse(source)
+        hoisted = cache.parse(source)
+
+        events = paused.run_iter()
+        next(events)
+        next(events)
+
+        hoisted.hoist_invariants = True
+        hoisted.interpret()
+        assert hoisted.robot.position == plain.robot.position
+
+        list(events)
+        assert paused.robot.position == plain.robot.position
+        assert type(paused.robot.interpretables[3].interpretables[1]
+                    .interpretables[0].exp.left) is ArithmeticExp
+
+    def test14(self):
+        robot = Robot()
+        assert robot.heading == 0 and robot.orientation is Orientation.EAST
+
+        robot.orientation = Orientation.WEST
+        assert robot.heading == 2
+        assert Orientation.NORTH.succ() is Orientation.EAST
+        assert Orientation.EAST.pred() is Orientation.NORTH
+
+        source = "\n".join([
+            "size(10*10)",
+            "start(5,5)",
+            "step 5",
+            "turn clockwise",
+            "step 5",
+            "turn clockwise",
+            "step 10",
+            "turn clockwise",
+            "step 10",
+            "turn clockwise",
+            "stop",
+        ])
+
+        for engine in Engine:
+            p: Program = parse(tokenize(source))
+            p.engine = engine
+            p.interpret()
+
+            assert p.robot.position == {"east": 0, "north": 10}
+            assert p.robot.orientation is Orientation.EAST
+
+            # The step that oversteps is still printed, before it raises.
+            out = io.StringIO()
+            p: Program = parse(tokenize(source.replace("step 10", "step 11")))
+            p.robot.sink = HumanSink(out)
+            p.engine = engine
+            try:
+                p.interpret()
+                assert False
+            except Exception as e:
+                assert "overstepped" in str(e)
+            assert out.getvalue().splitlines()[-1] == "Steps: 11"
+
+
+    def test15(self):
+        source = "\n".join([
+            "size(10*10)",
+            "start(2,2)",
+            "step 3",
+            "turn counterclockwise",
+            "step 2",
+            "turn counterclockwise",
+            "step 3",
+            "turn counterclockwise",
+            "step 2",
+            "turn counterclockwise",
+            "step 3",
+            "stop",
+        ])
+
+        for engine in Engine:
+            p: Program = parse(tokenize(source))
+            coverage = Coverage()
+            p.robot.sink = coverage
+            p.engine = engine
+            p.interpret()
+
+            assert coverage.visited == 10
+            assert coverage.cells == 121
+            assert coverage.total == 14
+            assert coverage.visits(2, 2) == 2
+            assert coverage.visits(4, 2) == 2
+            assert coverage.visits(5, 3) == 1
+            assert coverage.visits(3, 3) == 0
+            assert coverage.bounding_box() == (2, 2, 5, 4)
+            assert len(list(coverage)) == 10
+
+            width, height, pixels = coverage.raster()
+            assert (width, height) == (4, 3)
+            assert pixels == bytearray(b"\xff" * 5 + b"\x00" * 2 + b"\xff" * 5)
+
+        # A lawnmower over most of a large grid is only a few runs.
+        source = "\n".join([
+            "size(100000*100000)",
+            "let i = 0",
+            "start(0,0)",
+            "do {",
+            "    step 99999",
+            "    turn counterclockwise",
+            "    step 1",
+            "    turn counterclockwise",
+            "    step 99999",
+            "    turn clockwise",
+            "    step 1",
+            "    turn clockwise",
+            "    i++",
+            "} while < i 500",
+            "stop",
+        ])
+
+        p: Program = parse(tokenize(source))
+        coverage = Coverage()
+        p.robot.sink = coverage
+        p.interpret()
+
+        assert coverage.visited == 1000 * 100000 + 1
+        assert coverage.bounding_box() == (0, 0, 99999, 1000)
+        assert coverage.raster(1000)[:2] == (100, 2)
+
+    def test16(self):
+        source = "\n".join([
+            "size(64*64)",
+            "let i = 8",
+            "start(1,1)",
+            "do {",
+            "    step i",
+            "} while < i 100",
+            "stop",
+        ])
+
+        # The loop never ends, and its eighth iteration oversteps the grid.
+        p: Program = parse(tokenize(source), positions=True)
+        report = check_bounds(p)
+        assert report.verdict is Verdict.OUT_OF_BOUNDS
+        assert p.positions[report.statement] == (5, 5)
+
+        for engine in Engine:
+            p: Program = parse(tokenize(source))
+            coverage = Coverage()
+            p.robot.sink = coverage
+            p.engine = engine
+            p.prove_bounds = True
+            try:
+                p.interpret()
+                assert False
+            except Exception as e:
+                assert "overstepped" in str(e)
+
+            # The program is rejected before it runs.
+            assert coverage.total == 0
+            assert p.robot.position == {"east": 0, "north": 0}
+
+        source = "\n".join([
+            "size(64*64)",
+            "let i = 0",
+            "start(32,32)",
+            "do {",
+            "    let j = 0",
+            "    do {",
+            "        step 3",
+            "        turn clockwise",
+            "        j++",
+            "    } while < j 4",
+            "    step * i 0",
+            "    i++",
+            "} while < i 100000",
+            "stop",
+        ])
+
+        for engine in Engine:
+            p: Program = parse(tokenize(source))
+            p.engine = engine
+            p.prove_bounds = True
+            p.interpret()
+
+            assert p.bounds.verdict is Verdict.IN_BOUNDS and p.proven
+            assert p.robot.position == {"east": 32, "north": 32}
+
+        # The robot stops short of the edge, but only after more iterations
+        # than the analysis follows exactly, so it cannot tell.
+        source = "\n".join([
+            "size(200*200)",
+            "let i = 0",
+            "start(0,0)",
+            "do {",
+            "    let j = 0",
+            "    do {",
+            "        j++",
+            "    } while < j 2",
+            "    step 1",
+            "    i++",
+            "} while < i 150",
+            "stop",
+        ])
+
+        p: Program = parse(tokenize(source))
+        report = check_bounds(p)
+        assert report.verdict is Verdict.UNKNOWN
+        assert len(report.risky) == 1
+
+        p.prove_bounds = True
+        p.interpret()
+        assert not p.proven
+        assert p.robot.position == {"east": 150, "north": 0}
+
+    def test17(self):
+        try:
+            import numpy
+        except ImportError:
+            print("Skipping test17, which needs NumPy")
+            return
+
+        def source(east: int, north: int, i: int) -> str:
+            return "\n".join([
+                "size(40*40)",
+                f"let i = {i}",
+                f"start({east},{north})",
+                "do {",
+                "    step + i 2",
+                "    turn counterclockwise",
+                "    step 1",
+                "    turn clockwise",
+                "    i++",
+                "} while < i 5",
+                "stop",
+            ])
+
+        east = [0, 10, 20, 30, 0]
+        north = [0, 5, 10, 1, 36]
+        i = [0, 3, -1, 2, 4]
+
+        lanes = run_lanes(
+            parse(tokenize(source(0, 0, 0))), east=east, north=north,
+            bindings={"i": i}
+        )
+
+        # Every lane ends up where a robot that runs on its own does.
+        for lane in range(lanes.count):
+            p: Program = parse(tokenize(source(east[lane], north[lane], i[lane])))
+            try:
+                p.interpret()
+                overstepped = False
+            except Exception as e:
+                assert "overstepped" in str(e)
+                overstepped = True
+
+            robot = lanes.robot(lane)
+            assert bool(lanes.overstepped[lane]) == overstepped
+            assert robot.position == p.robot.position
+            assert robot.orientation is p.robot.orientation
+            assert robot.named_bindings() == p.robot.named_bindings()
+
+        assert list(lanes.overstepped) == [False, False, True, True, False]
+
+    def test18(self):
+        programs = {
+            "a.robol": "size(8*8) let i = 0 start(1,1) do { step 1 i++ } while < i 3 stop",
+            "b.robol": "size(8*8) start(1,1) step 9 stop",
+            "c.robol": "size(8*8) start(1,1) step * stop",
+            "crash.robol": "size(8*8) start(1,1) stop",
+        }
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, source in programs.items():
+                with open(os.path.join(tmp, name), "w") as f:
+                    f.write(source)
+
+            with open(os.path.join(tmp, "manifest.txt"), "w") as f:
+                f.write("# The programs that step\n\nb.robol\na.robol\n")
+
+            paths = sorted(os.path.join(tmp, name) for name in programs)
+            assert collect(tmp) == paths
+            assert collect(os.path.join(tmp, "manifest.txt")) == paths[1::-1]
+            assert collect(os.path.join(glob.escape(tmp), "[ab].robol")) == paths[:2]
+
+            # A worker that crashes only fails the program it was running.
+            batch.run_program = crash
+            try:
+                results = list(run_batch(paths, jobs=2))
+            finally:
+                batch.run_program = run_program
+
+            by_name = {os.path.basename(r["file"]): r for r in results}
+            assert len(results) == len(programs) == len(by_name)
+            assert all(r.keys() == results[0].keys() for r in results)
+
+            assert by_name["a.robol"]["error"] is None
+            assert by_name["a.robol"]["east"] == 4
+            assert by_name["a.robol"]["bindings"] == {"i": 3}
+            assert "overstepped" in by_name["b.robol"]["error"]
+            assert by_name["b.robol"]["east"] == 1
+            assert "column" in by_name["c.robol"]["error"]
+            assert by_name["c.robol"]["east"] is None
+            assert "crashed" in by_name["crash.robol"]["error"]
+            assert by_name["crash.robol"]["bindings"] is None
+
+            out = io.StringIO()
+            assert write_results(iter(results), out) == 3
+            assert [json.loads(line) for line in out.getvalue().splitlines()] == results
+
+    def test19(self):
+        source = "\n".join([
+            "size(64*64)",
+            "let n = 3",
+            "let i = 0",
+            "start(n,2)",
+            "do {",
+            "    step + n * 2 3",
+            "    turn clockwise",
+            "    turn counterclockwise",
+            "    i++",
+            "} while < i n",
+            "turn counterclockwise",
+            "step * n n",
+            "stop",
+        ])
+
+        p: Program = parse(tokenize(source))
+        report = optimize(p)
+
+        # n is read five times, and never changes, while i does.
+        assert report.propagated == {"n": 5}
+        assert report.folded == 3
+        assert report.turns == 2
+
+        loop = p.robot.interpretables[3]
+        assert [type(node) for node in loop.interpretables] == [Step, Assignment]
+        assert type(loop.interpretables[0].exp) is NumberExp
+        assert loop.interpretables[0].exp.val == 9
+
+        # The optimized program ends up where the program does.
+        for engine in Engine:
+            plain: Program = parse(tokenize(source))
+            plain.engine = engine
+            plain.interpret()
+
+            p: Program = parse(tokenize(source))
+            optimize(p)
+            p.engine = engine
+            p.interpret()
+
+            assert p.robot.position == plain.robot.position == {"east": 30, "north": 11}
+            assert p.robot.orientation is plain.robot.orientation is Orientation.NORTH
+            assert p.robot.named_bindings() == plain.robot.named_bindings() == {"n": 3, "i": 3}
+
+        # A program from the cache optimizes a copy of the shared nodes, so
+        # the next program of the same source is as it was parsed.
+        cache = ProgramCache()
+        first = cache.parse(source)
+        assert str(optimize(first)) == str(report)
+
+        second = cache.parse(source)
+        assert len(second.robot.interpretables[3].interpretables) == 4
+        assert str(optimize(second)) == str(report)
+        assert first.robot.interpretables[3] is not second.robot.interpretables[3]
+
+    def test20(self):
+        source = "\n".join([
+            "size(10*10)",
+            "start(1,1)",
+            "step 2",
+            "turn counterclockwise",
+            "step 3",
+            "turn clockwise",
+            "step 1",
+            "stop",
+        ])
+
+        points = [
+            (1, 1, Orientation.EAST),
+            (3, 1, Orientation.EAST),
+            (3, 4, Orientation.NORTH),
+            (4, 4, Orientation.EAST),
+        ]
+
+        for engine in Engine:
+            p: Program = parse(tokenize(source))
+            p.robot.sink = Trajectory()
+            p.engine = engine
+            p.interpret()
+            assert list(p.robot.sink) == points
+
+        # A full ring buffer keeps the last points, in order.
+        trajectory = Trajectory(capacity=3)
+        p: Program = parse(tokenize(source))
+        p.robot.sink = trajectory
+        p.interpret()
+
+        assert len(trajectory) == 3 and trajectory.count == 4
+        assert trajectory.dropped == 1
+        assert list(trajectory) == points[1:]
+        assert len(trajectory.data) == 9
+
+        # The points survive a round trip through a .npy file.
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trajectory.npy")
+            trajectory.save(path)
+            loaded = load_trajectory(path)
+
+        assert list(loaded) == points[1:]
+        assert loaded.count == 3 and loaded.typecode == trajectory.typecode
+
+        # The array cannot grow while a view of it is alive.
+        p: Program = parse(tokenize(source))
+        p.robot.sink = loaded
+        view = loaded.memoryview()
+        assert view.shape == (3, 3) and view.tolist()[0] == [3, 1, 0]
+        try:
+            p.interpret()
+            assert False
+        except BufferError:
+            pass
+        view.release()
+        p.interpret()
+        assert list(loaded) == points[1:] + points
+
+    def test21(self):
+        K = TokenKind
+        path = os.path.join("robol_programs", "loopyloop.robol")
+
+        # The comments at the top are skipped, but still counted as lines.
+        expected = [
+            (K.KEYWORD, 'size', 6, 1),
+            (K.GROUP, '64*64', 6, 5),
+            (K.KEYWORD, 'let', 7, 1),
+            (K.IDENTIFIER, 'i', 7, 5),
+            (K.OPERATOR, '=', 7, 7),
+            (K.NUMBER, '0', 7, 9),
+            (K.KEYWORD, 'start', 8, 1),
+            (K.GROUP, 'i,32', 8, 6),
+            (K.KEYWORD, 'do', 9, 1),
+            (K.LBRACE, '{', 9, 4),
+            (K.KEYWORD, 'let', 10, 5),
+            (K.IDENTIFIER, 'j', 10, 9),
+            (K.OPERATOR, '=', 10, 11),
+            (K.NUMBER, '0', 10, 13),
+            (K.KEYWORD, 'do', 11, 5),
+            (K.LBRACE, '{', 11, 8),
+            (K.KEYWORD, 'step', 12, 9),
+            (K.NUMBER, '1', 12, 14),
+            (K.ASSIGNMENT, 'j++', 13, 9),
+            (K.RBRACE, '}', 14, 5),
+            (K.KEYWORD, 'while', 14, 7),
+            (K.OPERATOR, '<', 14, 13),
+            (K.IDENTIFIER, 'j', 14, 15),
+            (K.NUMBER, '3', 14, 17),
+            (K.KEYWORD, 'turn', 15, 5),
+            (K.KEYWORD, 'counterclockwise', 15, 10),
+            (K.KEYWORD, 'step', 16, 5),
+            (K.IDENTIFIER, 'i', 16, 10),
+            (K.KEYWORD, 'turn', 17, 5),
+            (K.KEYWORD, 'clockwise', 17, 10),
+            (K.ASSIGNMENT, 'i++', 18, 5),
+            (K.RBRACE, '}', 19, 1),
+            (K.KEYWORD, 'while', 19, 3),
+            (K.OPERATOR, '<', 19, 9),
+            (K.IDENTIFIER, 'i', 19, 11),
+            (K.NUMBER, '3', 19, 13),
+            (K.KEYWORD, 'stop', 20, 1),
+        ]
+
+        with open(path) as f:
+            source = f.read()
+
+        assert list(tokenize(source)) == expected
+        assert list(tokenize(source.encode())) == expected
+        assert list(tokenize_file(path)) == expected
+
+        try:
+            list(tokenize("size(64*64)\nlet i = 0\n  start(i,32\nstop"))
+            assert False
+        except Exception as e:
+            assert str(e) == "Unterminated parenthesis at line 3, column 8"
+
+    def test22(self):
+        def error(name: str, old: str, new: str) -> str:
+            with open(os.path.join("robol_programs", name)) as f:
+                source = f.read()
+            assert old in source
+
+            try:
+                parse(tokenize(source.replace(old, new, 1)))
+                assert False
+            except Exception as e:
+                return str(e)
+
+        # The error points at the token where the program goes wrong.
+        assert error("test1.robol", "turn counterclockwise\nstep 15", "turn 15") == \
+            "Expected keyword, got '15' at line 6, column 6"
+        assert error("fun2.robol", "let j = 9", "let j 9") == \
+            "Expected =, got '9' at line 3, column 7"
+        assert error("test1.robol", "turn clockwise\nstep", "{ step") == \
+            "Unexpected token '{' at line 4, column 1"
+        assert error("test1.robol", "step + 17 20\nstop", "step + 17") == \
+            "Unexpected end of program at line 11, column 8"
+
+    def test23(self):
+        # Far deeper than the recursion limit of Python.
+        depth = 2000
+        source = "\n".join([
+            "size(8*8)",
+            "let i = 0",
+            "start(1,1)",
+            "do { " * depth,
+            "i++",
+            "} while < i 0 " * depth,
+            "stop",
+        ])
+
+        p: Program = parse(tokenize(source))
+        p.interpret()
+        assert p.robot.named_bindings() == {"i": 1}
+
+        # An identifier that is read before it is bound is found before the
+        # program runs, so the sink is never told the robot started.
+        source = "\n".join([
+            "size(8*8)",
+            "let i = 0",
+            "start(1,1)",
+            "do {",
+            "    step 1",
+            "    step j",
+            "    i++",
+            "} while < i 3",
+            "stop",
+        ])
+
+        for engine in Engine:
+            out = io.StringIO()
+            p: Program = parse(tokenize(source))
+            p.robot.sink = HumanSink(out)
+            p.engine = engine
+            try:
+                p.interpret()
+                assert False
+            except Exception as e:
+                assert str(e) == "The identifier 'j' is not bound"
+            assert out.getvalue() == ""
+
+    def test24(self):
+        def program(sink: Sink) -> Program:
+            p: Program = parse(tokenize_file(os.path.join("robol_programs", "test4.robol")))
+            p.robot.sink = sink
+            return p
+
+        out = io.StringIO()
+        try:
+            program(HumanSink(out)).interpret()
+            assert False
+        except Exception as e:
+            assert "overstepped" in str(e)
+
+        # The sink is told about the step that oversteps when the program
+        # is streamed too, and so is the consumer, before it raises.
+        streamed = io.StringIO()
+        events = []
+        try:
+            for event in program(HumanSink(streamed)).run_iter():
+                events.append(event)
+            assert False
+        except Exception as e:
+            assert "overstepped" in str(e)
+
+        assert streamed.getvalue() == out.getvalue()
+        assert out.getvalue().splitlines()[-1] == "Steps: 8"
+        assert events[-1] == Event(EventKind.OVERSTEP, 57, 1, Orientation.EAST, 8)
+
+        async def collect():
+            got = []
+            try:
+                async for event in program(NullSink()).run_async(every=1):
+                    got.append(event)
+            except Exception as e:
+                assert "overstepped" in str(e)
+            return got
+
+        assert asyncio.run(collect()) == events
+
+        source = "\n".join([
+            "size(10*10)",
+            "start(1,2)",
+            "step 3",
+            "turn counterclockwise",
+            "step 9",
+            "stop",
+        ])
+
+        expected = [
+            {"event": "start", "east": 1, "north": 2},
+            {"event": "step", "steps": 3, "east": 4, "north": 2, "orientation": "EAST"},
+            {"event": "turn", "orientation": "NORTH"},
+            {"event": "overstep", "steps": 9, "east": 4, "north": 2, "orientation": "NORTH"},
+        ]
+
+        for engine in Engine:
+            out = io.StringIO()
+            p: Program = parse(tokenize(source))
+            p.robot.sink = JsonSink(out, buffer_size=3)
+            p.engine = engine
+            try:
+                p.interpret()
+                assert False
+            except Exception as e:
+                assert "overstepped" in str(e)
+
+            # The lines held back are written when the run ends.
+            assert [json.loads(line) for line in out.getvalue().splitlines()] == expected
+
+    def test25(self):
+        looping = "size(16*16) let i = 0 start(1,1) do { step 2 i++ } while < i 3 stop"
+        turning = "size(16*16) start(1,1) turn counterclockwise step 4 stop"
+
+        def write(path: str, source: str) -> None:
+            with open(path, "w") as f:
+                f.write(source)
+
+        def run(function) -> dict:
+            robot = Robot()
+            function(robot)
+            return robot.position
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "program.robol")
+            write(path, looping)
+
+            # The code object is cached next to the program by default.
+            assert run(load_file(path)) == {"east": 7, "north": 1}
+            bins = glob.glob(os.path.join(tmp, "__robolcache__", "*.bin"))
+            assert len(bins) == 1
+
+            # A hit runs what is on disk without parsing the program, which
+            # shows when the cache holds the code of another program.
+            with open(bins[0], "wb") as f:
+                marshal.dump(compile_to_code(parse(tokenize(turning))), f)
+            assert run(load_file(path)) == {"east": 1, "north": 5}
+
+            # The cache is keyed by the source, so a changed file is parsed.
+            changed = looping.replace("< i 3", "< i 2")
+            write(path, changed)
+            assert run(load_file(path)) == {"east": 5, "north": 1}
+            assert len(glob.glob(os.path.join(tmp, "__robolcache__", "*.bin"))) == 2
+            new = os.path.join(tmp, "__robolcache__", cache_key(changed.encode()) + ".bin")
+
+            # A broken or foreign file is parsed again, and written over.
+            for data in (b"\xe3\x00", marshal.dumps(1)):
+                with open(new, "wb") as f:
+                    f.write(data)
+                assert run(load_file(path)) == {"east": 5, "north": 1}
+                with open(new, "rb") as f:
+                    assert type(marshal.load(f)) is CodeType
+
+            # The cache of parsed programs keeps its files where it is told.
+            cache_dir = os.path.join(tmp, "ast")
+            write(path, looping)
+
+            cache = ProgramCache(persist=True, cache_dir=cache_dir)
+            cache.load(path)
+            assert (cache.disk_hits, cache.misses) == (0, 1)
+            asts = glob.glob(os.path.join(cache_dir, "*.ast"))
+            assert len(asts) == 1
+
+            # A new cache, like one in a new process, reads the file.
+            cache = ProgramCache(persist=True, cache_dir=cache_dir)
+            p: Program = cache.load(path)
+            assert (cache.disk_hits, cache.misses) == (1, 0)
+            p.interpret()
+            assert p.robot.position == {"east": 7, "north": 1}
+
+            # A file that has changed since it was loaded is parsed again.
+            write(path, turning)
+            p: Program = cache.load(path)
+            assert (cache.invalidations, cache.misses) == (1, 1)
+            p.interpret()
+            assert p.robot.position == {"east": 1, "north": 5}
+
+            # A broken file, or one of another version of the format, is
+            # parsed again, and written over.
+            write(path, looping)
+            with open(asts[0], "rb") as f:
+                good = f.read()
+
+            for data in (good[:len(good) // 2], b"ROBOLAST\x00" + good[len(AST_MAGIC):]):
+                with open(asts[0], "wb") as f:
+                    f.write(data)
+
+                cache = ProgramCache(persist=True, cache_dir=cache_dir)
+                p: Program = cache.load(path)
+                assert (cache.disk_hits, cache.misses) == (0, 1)
+                p.interpret()
+                assert p.robot.position == {"east": 7, "north": 1}
+
+                with open(asts[0], "rb") as f:
+                    assert f.read() == good
+
+    def test26(self):
+        # The nodes keep their attributes in __slots__ and nowhere else.
+        for name, (cls, args) in benchmark.samples().items():
+            node = cls(*args)
+            assert not hasattr(node, "__dict__")
+            try:
+                node.robot = Robot()
+                assert False
+            except AttributeError:
+                pass
+
+            # And take less memory than the same attributes in a __dict__.
+            plain = benchmark.unslotted(cls)
+            assert vars(plain(*args)).keys() <= set(cls.__slots__)
+            assert benchmark.measure(lambda: cls(*args), 1000) < \
+                benchmark.measure(lambda: plain(*args), 1000)
+
+        # Copies of the nodes, however they are made, run the same.
+        for path in sorted(glob.glob(os.path.join("robol_programs", "*.robol"))):
+            p: Program = parse(tokenize_file(path))
+
+            grid, interpretables = decode(encode(p.grid, p.robot.interpretables))
+            decoded = Program(grid, Robot())
+            decoded.robot.interpretables = interpretables
+
+            copies = [deepcopy(p), pickle.loads(pickle.dumps(p)), decoded]
+
+            try:
+                p.interpret()
+                error = None
+            except Exception as e:
+                error = str(e)
+
+            for copy in copies:
+                try:
+                    copy.interpret()
+                    assert error is None
+                except Exception as e:
+                    assert str(e) == error
+                assert copy.robot.position == p.robot.position
+                assert copy.robot.orientation is p.robot.orientation
+                assert copy.robot.named_bindings() == p.robot.named_bindings()
+
+    def test27(self):
+        robot = Robot()
+        robot.bindings = [7, -3]
+
+        def ident(name: str) -> Identifier:
+            ident = Identifier(name)
+            ident.slot = "ij".index(name)
+            return ident
+
+        # Every shape of operands the compiler specializes for, and one it
+        # does not, gives what the tree engine gives, for every operator.
+        shapes = [
+            lambda: (ident("i"), NumberExp(2)),
+            lambda: (NumberExp(2), ident("j")),
+            lambda: (ident("i"), ident("j")),
+            lambda: (NumberExp(5), NumberExp(2)),
+            lambda: (ArithmeticExp(BinaryOp.MULT, ident("i"), NumberExp(2)), ident("j")),
+        ]
+
+        for op in BinaryOp:
+            for shape in shapes:
+                exp = ArithmeticExp(op, *shape())
+                exp.interpret(robot)
+                assert compile_expression(exp)(robot.bindings) == robot.stack.pop()
+
+                condition = BoolExp(exp)
+                condition.interpret(robot)
+                assert compile_expression(condition)(robot.bindings) == robot.stack.pop()
+
+        assert robot.bindings == [7, -3]
+
+        # Compiled programs do what the tree engine does, step by step.
+        for path in sorted(glob.glob(os.path.join("robol_programs", "*.robol"))):
+            runs = []
+
+            for engine in (Engine.TREE, Engine.CLOSURE):
+                out = io.StringIO()
+                p: Program = parse(tokenize_file(path))
+                p.robot.sink = HumanSink(out)
+                p.engine = engine
+
+                try:
+                    p.interpret()
+                    error = None
+                except Exception as e:
+                    error = str(e)
+
+                runs.append((
+                    out.getvalue(), error, p.robot.position,
+                    p.robot.orientation, p.robot.named_bindings(),
+                ))
+
+            assert runs[0] == runs[1]
+
+        # A program can be compiled and run again, from where it started.
+        p: Program = parse(tokenize_file(os.path.join("robol_programs", "loopyloop.robol")))
+        p.engine = Engine.CLOSURE
+        for _ in range(2):
+            p.interpret()
+            assert p.robot.position == {"east": 9, "north": 35}
+            assert p.robot.named_bindings() == {"i": 3, "j": 3}
+
+    def test28(self):
+        # A grid that is wider than it is high, where stepping east as far
+        # as the width allows is fine, and stepping as far north is not.
+        source = "\n".join([
+            "size(20*5)",
+            "start(1,1)",
+            "step 19",
+            "turn counterclockwise",
+            "step 4",
+            "stop",
+        ])
+
+        for engine in Engine:
+            p: Program = parse(tokenize(source))
+            p.engine = engine
+            p.interpret()
+
+            assert p.robot.position == {"east": 20, "north": 5}
+            assert (p.robot.grid_east, p.robot.grid_north) == (20, 5)
+
+            # One step too far east, and one too far north.
+            for old, new in (("step 19", "step 20"), ("step 4", "step 5")):
+                p: Program = parse(tokenize(source.replace(old, new)))
+                p.engine = engine
+                try:
+                    p.interpret()
+                    assert False
+                except Exception as e:
+                    assert str(e) == "The bounds of the grid have been overstepped"
+
+        # The machine checks its steps against the same bounds.
+        events = list(parse(tokenize(source)).run_iter())
+        assert (events[-1].east, events[-1].north) == (20, 5)
+
+    def test29(self):
+        def phases(execute: float, best: float) -> dict:
+            return {
+                "parse": {"seconds": 0.001, "best_seconds": 0.001},
+                "execute": {"seconds": execute, "best_seconds": best},
+            }
+
+        baseline = {"counter/tree": phases(1.0, 0.9)}
+
+        def compare(results: dict, rerun: dict = None):
+            runs = []
+
+            def again(key: str) -> dict:
+                runs.append(key)
+                return rerun
+
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                regressions = benchmark.compare(results, baseline, 0.25, again)
+
+            return regressions, runs, out.getvalue()
+
+        # Only the fastest run is compared, so a slow median is not enough,
+        # and neither is a phase too short to time, or a new benchmark.
+        results = {"counter/tree": phases(5.0, 1.2), "wide/tree": phases(9.0, 9.0)}
+        results["counter/tree"]["parse"]["best_seconds"] = 0.01
+        assert compare(results) == (0, [], "")
+
+        # A slow run is run again, and the faster of the two is kept.
+        results = {"counter/tree": phases(2.0, 2.0)}
+        assert compare(results, phases(1.1, 1.1)) == (0, ["counter/tree"], "")
+        assert results["counter/tree"]["execute"]["best_seconds"] == 1.1
+
+        # A phase that is slow twice is a regression.
+        results = {"counter/tree": phases(2.0, 2.0)}
+        regressions, runs, out = compare(results, phases(2.2, 2.1))
+        assert (regressions, runs) == (1, ["counter/tree"])
+        assert out == "REGRESSION counter/tree execute: 1.0000s -> 2.0000s (2.00x)\n"
+
+        # Every phase is run once to warm up before it is timed, and the
+        # garbage collector is back on afterwards.
+        calls = []
+        times, out = benchmark._time(lambda: calls.append(None) or len(calls), 3)
+        assert len(times) == 3 and len(calls) == 4 and out == 4
+        assert gc.isenabled()
+
     def test_all(self):
-        self.test1()
-        self.test2()
-        self.test3()
-        self.test4()
+        """ Runs every test, and reports each one on its own line.
+
+        Test 4 runs a program that walks off the grid, so it passes
+        when it stops with the overstep error.
+
+        Returns:
+            The number of tests that failed.
+        """
+
+        overstep = "The bounds of the grid have been overstepped"
+        failures = 0
+
+        for n in range(1, 30):
+            try:
+                getattr(self, f"test{n}")()
+                error = "did not overstep" if n == 4 else None
+            except Exception as e:
+                expected = n == 4 and str(e) == overstep
+                error = None if expected else f"{type(e).__name__}: {e}"
+
+            if error is None:
+                print(f"test{n} ok")
+            else:
+                print(f"test{n} FAILED {error}")
+                failures += 1
+
+        return failures
 
 
 
@@ -159,8 +1438,59 @@ if __name__ == "__main__":
             tests.test3()
         case "4":
             tests.test4()
+        case "5":
+            tests.test5()
+        case "6":
+            tests.test6()
+        case "7":
+            tests.test7()
+        case "8":
+            tests.test8()
+        case "9":
+            tests.test9()
+        case "10":
+            tests.test10()
+        case "11":
+            tests.test11()
+        case "12":
+            tests.test12()
+        case "13":
+            tests.test13()
+        case "14":
+            tests.test14()
+        case "15":
+            tests.test15()
+        case "16":
+            tests.test16()
+        case "17":
+            tests.test17()
+        case "18":
+            tests.test18()
+        case "19":
+            tests.test19()
+        case "20":
+            tests.test20()
+        case "21":
+            tests.test21()
+        case "22":
+            tests.test22()
+        case "23":
+            tests.test23()
+        case "24":
+            tests.test24()
+        case "25":
+            tests.test25()
+        case "26":
+            tests.test26()
+        case "27":
+            tests.test27()
+        case "28":
+            tests.test28()
+        case "29":
+            tests.test29()
         case "all":
-            tests.test_all()
+            if tests.test_all():
+                sys.exit(1)
         case _:
             raise Exception("Invalid test")
 